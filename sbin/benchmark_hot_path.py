@@ -0,0 +1,438 @@
+#!/usr/bin/env python
+"""
+This script is run from the root project directory and benchmarks the
+functions daphbot_service runs for every recognition update from vision
+(target selection, pet detection, tracking and publishing the primary
+target) against synthetic recognitions.  No robot, central_hub or camera
+is needed.
+
+Recognitions are generated with a fixed random seed for each scenario of
+object count, class mix and bounding box distribution.  For every
+benchmark and scenario the ops/sec, p50 and p99 per call latency and the
+share of a frame's time budget (see --frame-rate) are printed.
+
+Each benchmark is repeated (see --repeats) and the fastest repeat is kept.
+Results are compared to the baseline stored in
+sbin/benchmark_baseline.json for this machine's architecture (x86_64 on CI,
+aarch64 on the Pi) and the script exits with status 1 if the p50 latency of
+any benchmark, relative to a fixed reference workload measured alongside
+it and averaged over the scenarios, regressed by more than --threshold.
+
+The reference workload cancels out differences in hardware, but not in
+the Python or numpy version: it is numpy heavy while some benchmarks are
+pure Python.  So each baseline records the versions it was measured with
+and, when they don't match this machine's, the comparison is skipped.
+CI writes its results, in the baseline file's format, with
+--results-file so that a baseline measured on CI can be committed.
+
+Usage:
+    # compare to the stored baseline
+    python sbin/benchmark_hot_path.py
+
+    # store the results as the new baseline for this machine
+    python sbin/benchmark_hot_path.py --update-baseline
+
+    # also write the results as a baseline to another file
+    python sbin/benchmark_hot_path.py --results-file logs/benchmark_baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+# BB_ENV=test stubs out sound and video recording requests to vision
+os.environ.setdefault("BB_ENV", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from basic_bot.commons.hub_state import HubState  # noqa: E402
+
+from commons import messages  # noqa: E402
+from commons import track_target as tt  # noqa: E402
+from commons.data import find_primary_target, is_pet  # noqa: E402
+from commons.detection_voter import DetectionVoter  # noqa: E402
+from commons.target_tracker import TargetTracker  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+SEED = 42
+# distinct recognition updates generated per scenario; the benchmarks
+# cycle through them
+UPDATES_PER_SCENARIO = 200
+
+CLASS_MIXES = {
+    "pets": ["cat", "dog"],
+    "mixed": ["cat", "dog", "person", "chair", "couch", "tv"],
+    "people": ["person"],
+}
+OBJECT_COUNTS = [1, 5, 20]
+BBOX_DISTRIBUTIONS = ["uniform", "clustered"]
+
+
+def random_bounding_box(rand, distribution):
+    if distribution == "clustered":
+        # objects crowd the center of the frame, like a pet on a couch
+        center_x = rand.gauss(FRAME_WIDTH / 2, FRAME_WIDTH / 10)
+        center_y = rand.gauss(FRAME_HEIGHT / 2, FRAME_HEIGHT / 10)
+    else:
+        center_x = rand.uniform(0, FRAME_WIDTH)
+        center_y = rand.uniform(0, FRAME_HEIGHT)
+    width = rand.uniform(20, FRAME_WIDTH / 2)
+    height = rand.uniform(20, FRAME_HEIGHT / 2)
+    return [
+        max(0, int(center_x - width / 2)),
+        max(0, int(center_y - height / 2)),
+        min(FRAME_WIDTH, int(center_x + width / 2)),
+        min(FRAME_HEIGHT, int(center_y + height / 2)),
+    ]
+
+
+def generate_recognitions(count, classes, distribution, updates, seed=SEED):
+    """
+    Returns a list of `updates` recognition lists.  Objects drift a few
+    pixels between updates, like a slowly moving scene, so tracking has
+    something to associate.
+    """
+    rand = random.Random(seed)
+    objects = [
+        {
+            "classification": rand.choice(classes),
+            "confidence": round(rand.uniform(0.3, 1.0), 2),
+            "bounding_box": random_bounding_box(rand, distribution),
+        }
+        for _ in range(count)
+    ]
+    frames = []
+    for _ in range(updates):
+        for obj in objects:
+            dx = rand.randint(-5, 5)
+            dy = rand.randint(-3, 3)
+            left, top, right, bottom = obj["bounding_box"]
+            obj["bounding_box"] = [left + dx, top + dy, right + dx, bottom + dy]
+        frames.append(
+            [dict(obj, bounding_box=list(obj["bounding_box"])) for obj in objects]
+        )
+    return frames
+
+
+class StandInServoScheduler:
+    def set_goal(self, pan, tilt, requested_at=None):
+        pass
+
+
+class StandInWebsocket:
+    async def send(self, message):
+        pass
+
+
+def time_calls(fn, frames, iterations):
+    """Returns per call latencies in seconds for calling fn(frame)."""
+    # warm up caches and lazy initialization
+    for frame in frames[:10]:
+        fn(frame)
+    latencies = []
+    for i in range(iterations):
+        frame = frames[i % len(frames)]
+        started_at = time.perf_counter()
+        fn(frame)
+        latencies.append(time.perf_counter() - started_at)
+    return latencies
+
+
+async def time_async_calls(fn, frames, iterations):
+    for frame in frames[:10]:
+        await fn(frame)
+    latencies = []
+    for i in range(iterations):
+        frame = frames[i % len(frames)]
+        started_at = time.perf_counter()
+        await fn(frame)
+        latencies.append(time.perf_counter() - started_at)
+    return latencies
+
+
+def bench_find_primary_target(frames, iterations):
+    previous = {"target": None}
+
+    def run(recognitions):
+        previous["target"] = find_primary_target(
+            {"recognition": recognitions}, previous["target"]
+        )
+
+    return time_calls(run, frames, iterations)
+
+
+def bench_is_pet(frames, iterations):
+    def run(recognitions):
+        for recognition in recognitions:
+            is_pet(recognition)
+
+    return time_calls(run, frames, iterations)
+
+
+def bench_target_tracker(frames, iterations):
+    tracker = TargetTracker()
+    return time_calls(tracker.update, frames, iterations)
+
+
+def bench_detection_voter(frames, iterations):
+    voter = DetectionVoter()
+    return time_calls(voter.update, frames, iterations)
+
+
+def bench_track_target(frames, iterations):
+    hub_state = HubState({"servo_actual_angles": {"pan": 90, "tilt": 90}})
+    servo_scheduler = StandInServoScheduler()
+
+    async def run(recognitions):
+        # defeat the tracking rate limit so every call makes a decision
+        tt.last_track_request_time = 0
+        await tt.track_target(servo_scheduler, hub_state, recognitions[0])
+
+    return asyncio.run(time_async_calls(run, frames, iterations))
+
+
+def bench_send_primary_target(frames, iterations):
+    websocket = StandInWebsocket()
+
+    async def run(recognitions):
+        messages.send_primary_target(websocket, recognitions[0])
+
+    return asyncio.run(time_async_calls(run, frames, iterations))
+
+
+def reference_workload(recognitions):
+    """
+    Fixed mix of dict access and small NumPy array math, similar to the
+    hot path, that never changes.  Benchmarks are compared to the baseline
+    relative to this so that differences in CPU speed and load between
+    runs (e.g. shared CI runners) cancel out.
+    """
+    boxes = np.array([r["bounding_box"] for r in recognitions], dtype=float)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    confidences = np.array([r["confidence"] for r in recognitions])
+    return int(np.argmax(areas * confidences))
+
+
+BENCHMARKS = {
+    "find_primary_target": bench_find_primary_target,
+    "is_pet": bench_is_pet,
+    "target_tracker": bench_target_tracker,
+    "detection_voter": bench_detection_voter,
+    "track_target": bench_track_target,
+    "send_primary_target": bench_send_primary_target,
+}
+
+
+def percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(percent / 100 * len(sorted_values)))
+    return sorted_values[index]
+
+
+def best_p50(runs):
+    return min(percentile(sorted(latencies), 50) for latencies in runs)
+
+
+def summarize(runs, frame_rate, reference_p50):
+    """
+    Summarizes the run with the lowest p50.  Like timeit, the fastest of
+    several repeats is the least disturbed by whatever else the machine
+    was doing, which keeps baseline comparisons stable.
+    """
+    runs = [sorted(latencies) for latencies in runs]
+    latencies = min(runs, key=lambda latencies: percentile(latencies, 50))
+    p50 = percentile(latencies, 50)
+    return {
+        "ops_per_second": round(len(latencies) / sum(latencies)),
+        "p50_us": round(p50 * 1e6, 2),
+        "p99_us": round(percentile(latencies, 99) * 1e6, 2),
+        "frame_budget_percent": round(p50 * frame_rate * 100, 3),
+        "reference_ratio": round(p50 / reference_p50, 3),
+    }
+
+
+def run_benchmarks(iterations, repeats, frame_rate, only=None):
+    results = {}
+    for count in OBJECT_COUNTS:
+        for mix, classes in CLASS_MIXES.items():
+            for distribution in BBOX_DISTRIBUTIONS:
+                scenario = f"{count}_{mix}_{distribution}"
+                frames = generate_recognitions(
+                    count, classes, distribution, UPDATES_PER_SCENARIO
+                )
+                for name, bench in BENCHMARKS.items():
+                    if only and name not in only:
+                        continue
+                    # measured alongside each benchmark to follow changes
+                    # in machine load during the run
+                    reference_p50 = best_p50(
+                        time_calls(reference_workload, frames, iterations)
+                        for _ in range(repeats)
+                    )
+                    runs = [bench(frames, iterations) for _ in range(repeats)]
+                    results[f"{name}/{scenario}"] = summarize(
+                        runs, frame_rate, reference_p50
+                    )
+    return results
+
+
+def environment():
+    """Versions, major.minor, that the benchmarks' relative speed depends on."""
+    return {
+        "python": ".".join(platform.python_version_tuple()[:2]),
+        "numpy": ".".join(np.__version__.split(".")[:2]),
+    }
+
+
+def load_baselines():
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE) as f:
+        return json.load(f)
+
+
+def write_baselines(path, baselines):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Returns the benchmarks whose slowdown vs the baseline, as the geometric
+    mean over all scenarios, is more than threshold.  Single scenarios are
+    too noisy on shared machines to fail on.
+    """
+    changes = {}
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected:
+            name = key.split("/")[0]
+            changes.setdefault(name, []).append(
+                np.log(result["reference_ratio"] / expected["reference_ratio"])
+            )
+
+    regressions = []
+    for name, log_changes in changes.items():
+        slowdown = float(np.exp(np.mean(log_changes))) - 1
+        if slowdown > threshold:
+            regressions.append(
+                f"{name}: {slowdown:+.0%} over {len(log_changes)} scenarios"
+            )
+    return regressions
+
+
+def print_results(results, baseline):
+    print(
+        f"{'benchmark/scenario':<52} {'ops/sec':>10} {'p50 us':>9} "
+        f"{'p99 us':>9} {'frame %':>8} {'vs base':>8}"
+    )
+    for key, result in results.items():
+        expected = baseline.get(key)
+        change = (
+            f"{(result['reference_ratio'] / expected['reference_ratio'] - 1) * 100:+.0f}%"
+            if expected
+            else "-"
+        )
+        print(
+            f"{key:<52} {result['ops_per_second']:>10} {result['p50_us']:>9} "
+            f"{result['p99_us']:>9} {result['frame_budget_percent']:>8} {change:>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=1000,
+        help="calls timed per benchmark, scenario and repeat (default: 1000)",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="times each benchmark is repeated, fastest is kept (default: 3)",
+    )
+    parser.add_argument(
+        "--frame-rate",
+        type=float,
+        default=24,
+        help="recognition updates per second used for the frame budget (default: 24)",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="allowed slowdown vs the baseline, 0.25 = 25%% (default: 0.25)",
+    )
+    parser.add_argument(
+        "--only", nargs="*", choices=list(BENCHMARKS), help="benchmarks to run"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="store the results as the baseline for this machine",
+    )
+    parser.add_argument(
+        "--results-file",
+        help="also write the results, as a baseline for this machine, to this file",
+    )
+    args = parser.parse_args()
+
+    machine = platform.machine()
+    env = environment()
+    baselines = load_baselines()
+    baseline = baselines.get(machine, {})
+    baseline_env = baseline.get("environment")
+    if baseline_env != env:
+        # measured with another python or numpy; not comparable
+        baseline = {}
+
+    results = run_benchmarks(
+        args.iterations, args.repeats, args.frame_rate, args.only
+    )
+    print(f"machine: {machine}, python: {env['python']}, numpy: {env['numpy']}")
+    print_results(results, baseline)
+
+    if args.results_file:
+        write_baselines(args.results_file, {machine: {**results, "environment": env}})
+        print(f"results written to {args.results_file}")
+
+    if args.update_baseline:
+        baselines[machine] = {**baseline, **results, "environment": env}
+        write_baselines(BASELINE_FILE, baselines)
+        print(f"baseline for {machine} written to {BASELINE_FILE}")
+        return
+
+    if not baseline:
+        if machine in baselines:
+            print(
+                f"baseline for {machine} was measured with {baseline_env}, not "
+                f"{env}; skipping the comparison"
+            )
+        else:
+            print(
+                f"no baseline for {machine}, run with --update-baseline to create one"
+            )
+        return
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regressions beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nno regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
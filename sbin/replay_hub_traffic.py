@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+This script is run from the root project directory and replays hub traffic
+recorded by daphbot_service (see D2_DAPHBOT_RECORD_FILE in
+src/commons/constants.py) through daphbot_service's handlers without the
+robot or central_hub running.
+
+Each recorded message is fed to `daphbot_service.handle_state_update` with
+a stand-in websocket that counts what would have been sent to central_hub,
+so target selection, tracking and the behaviors run exactly as they would
+live.  At the end a report of throughput, messages sent and the hot path
+latency metrics is printed.
+
+Usage:
+    # replay at the recorded speed
+    python sbin/replay_hub_traffic.py recording.jsonl.gz
+
+    # replay as fast as daphbot_service can process each recognition
+    python sbin/replay_hub_traffic.py --fast recording.jsonl.gz
+
+    # simulate a slow central_hub
+    python sbin/replay_hub_traffic.py --send-latency 0.05 recording.jsonl.gz
+
+Note that time based behavior (tracking rate limits, servo scheduling,
+dance durations) still runs in real time when replaying with --fast.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+# BB_ENV=test stubs out sound and video recording requests to vision
+os.environ.setdefault("BB_ENV", "test")
+# replayed sessions aren't real; don't append them to the robot's file
+os.environ["D2_RECORDING_SESSIONS_FILE"] = ""
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import daphbot_service  # noqa: E402
+from commons.hub_recording import read_hub_traffic  # noqa: E402
+from commons.metrics import metrics  # noqa: E402
+
+
+class StandInWebsocket:
+    """Counts, by hub state key, what daphbot_service sends to central_hub."""
+
+    def __init__(self, send_latency=0.0):
+        self.send_latency = send_latency
+        self.message_count = 0
+        self.sent_counts = {}
+
+    async def send(self, message):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        self.message_count += 1
+        for key in json.loads(message).get("data", {}):
+            self.sent_counts[key] = self.sent_counts.get(key, 0) + 1
+
+
+async def wait_for_mailbox():
+    while daphbot_service.recognition_mailbox.has_item:
+        await asyncio.sleep(0)
+
+
+async def replay(path, fast=False, speed=1.0, send_latency=0.0):
+    header, messages = read_hub_traffic(path)
+    websocket = StandInWebsocket(send_latency)
+    daphbot_service.handle_connect(websocket)
+
+    message_count = 0
+    started_at = time.time()
+    for t, msg_type, msg_data in messages:
+        if fast:
+            # let the consumer take each recognition so that none are
+            # coalesced away by the mailbox
+            await wait_for_mailbox()
+        else:
+            delay = started_at + t / speed - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        daphbot_service.handle_state_update(websocket, msg_type, msg_data)
+        # like HubStateMonitor, apply the changes after the callback
+        daphbot_service.hub_state.state.update(msg_data)
+        message_count += 1
+
+    await wait_for_mailbox()
+    # let the last recognition finish processing
+    await asyncio.sleep(0.01)
+    elapsed = time.time() - started_at
+
+    return {
+        "recording_started_at": header["started_at"],
+        "messages": message_count,
+        "elapsed_seconds": round(elapsed, 3),
+        "messages_per_second": round(message_count / elapsed, 1) if elapsed else 0,
+        "recognition_mailbox": daphbot_service.recognition_mailbox.get_stats(),
+        "messages_to_hub": websocket.message_count,
+        "sent_to_hub": websocket.sent_counts,
+        "target_switches": daphbot_service.target_tracker.switch_count,
+        "latency": metrics.snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("recording", help="file recorded by daphbot_service")
+    parser.add_argument(
+        "--fast", action="store_true", help="replay as fast as possible"
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="playback speed multiplier when not --fast (default: 1.0)",
+    )
+    parser.add_argument(
+        "--send-latency",
+        type=float,
+        default=0.0,
+        help="seconds each send to the stand-in hub takes (default: 0)",
+    )
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        replay(args.recording, args.fast, args.speed, args.send_latency)
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""
+This script is run from the root project directory and simulates
+telepresence audio playback (commons/audio_stream_player.py and
+commons/audio_mixer.py) on a virtual clock.  No sound hardware, browser
+or WebRTC connection is needed, so it runs in CI.
+
+For each scenario, synthetic WebRTC frames (20ms of a 440Hz tone) are
+sent on the browser's clock, delayed by simulated network jitter and
+stalls, and passed to AudioStreamPlayer.queue_audio_frame() as they
+"arrive", while the mixer's callback is called every block on the
+output device's clock.  The two clocks differ by the scenario's drift.
+Random delays use a fixed seed per scenario, so results are
+deterministic.
+
+For every scenario, the underruns, overruns, audio latency percentiles
+(from commons/metrics.py) and how much the latency changed from the
+middle to the end of the run are printed.  The script exits with status 1
+if any scenario exceeds its limits.
+
+Usage:
+    python sbin/simulate_audio_playback.py
+
+    # simulate an hour long telepresence session
+    python sbin/simulate_audio_playback.py --seconds 3600 --only drift_fast
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+from collections import namedtuple
+
+import av
+import numpy as np
+
+# BB_ENV=test stubs out the sound device
+os.environ.setdefault("BB_ENV", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.audio_mixer import AudioMixer, LATENCY  # noqa: E402
+from commons.audio_stream_player import AudioStreamPlayer  # noqa: E402
+from commons.metrics import metrics  # noqa: E402
+
+SEED = 42
+DEVICE_SAMPLE_RATE = 48000
+FRAME_SECONDS = 0.02
+TONE_HZ = 440
+# buffered audio is averaged over this many seconds in the middle and at
+# the end of a run; the difference is how much latency is still changing
+# once the jitter buffer has settled
+WINDOW_SECONDS = 10
+
+SCENARIOS = {
+    # name: browser's sample rate and layout, clock drift relative to the
+    # device (parts per million), network delay jitter (std dev, seconds),
+    # chance per frame of a stall and its length (seconds), and limits
+    # (max_underruns, max_latency_change_ms)
+    "steady": dict(rate=48000, layout="stereo", max_underruns=0),
+    "jitter": dict(rate=48000, layout="stereo", jitter=0.005, max_underruns=0),
+    # latency jumps after each stall, so its change isn't limited
+    "stalls": dict(
+        rate=48000,
+        layout="stereo",
+        jitter=0.002,
+        stall=0.005,
+        stall_seconds=0.1,
+        max_latency_change_ms=None,
+    ),
+    "drift_fast": dict(
+        rate=48000, layout="stereo", drift_ppm=300, jitter=0.002, max_underruns=0
+    ),
+    "drift_slow": dict(
+        rate=48000, layout="stereo", drift_ppm=-300, jitter=0.002, max_underruns=0
+    ),
+    "mono_44k": dict(rate=44100, layout="mono", drift_ppm=100, max_underruns=0),
+}
+# limits for every scenario, unless the scenario overrides them.  Within
+# the jitter buffer's deadband (+/-10ms) latency drifts freely, so it may
+# change by up to 20ms; uncompensated drift of 300ppm changes it by 45ms
+# over the second half of a default run.
+MAX_OVERRUNS = 0
+MAX_LATENCY_CHANGE_MS = 25.0
+
+TimeInfo = namedtuple("TimeInfo", ["currentTime", "outputBufferDacTime"])
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def tone_frames(rate, layout, count):
+    """`count` consecutive 20ms av.AudioFrames of a tone"""
+    channels = 2 if layout == "stereo" else 1
+    samples_per_frame = int(rate * FRAME_SECONDS)
+    t = np.arange(samples_per_frame * count) / rate
+    tone = (np.sin(2 * np.pi * TONE_HZ * t) * 8000).astype(np.int16)
+    for i in range(count):
+        samples = tone[i * samples_per_frame : (i + 1) * samples_per_frame]
+        packed = np.repeat(samples[:, None], channels, axis=1).reshape(1, -1)
+        frame = av.AudioFrame.from_ndarray(packed, format="s16", layout=layout)
+        frame.sample_rate = rate
+        yield frame
+
+
+def arrival_times(scenario, count, rand):
+    """time, on the device's clock, each frame reaches queue_audio_frame"""
+    frame_seconds = FRAME_SECONDS / (1 + scenario.get("drift_ppm", 0) / 1e6)
+    arrived_at = 0.0
+    for i in range(count):
+        delay = abs(rand.gauss(0, scenario.get("jitter", 0)))
+        if rand.random() < scenario.get("stall", 0):
+            delay += scenario["stall_seconds"]
+        # frames arrive in order; a late frame holds up the ones after it
+        arrived_at = max(arrived_at, i * frame_seconds + delay)
+        yield arrived_at
+
+
+def simulate(name, scenario, seconds):
+    clock = VirtualClock()
+    mixer = AudioMixer(sample_rate=DEVICE_SAMPLE_RATE)
+    player = AudioStreamPlayer(mixer, clock=clock)
+    rand = random.Random(f"{SEED}-{name}")
+    count = int(seconds / FRAME_SECONDS)
+    frames = tone_frames(scenario["rate"], scenario["layout"], count)
+    arrivals = arrival_times(scenario, count, rand)
+
+    outdata = np.zeros((mixer.blocksize, mixer.channels), dtype=np.int16)
+    block_seconds = mixer.blocksize / mixer.sample_rate
+    next_callback_at = 0.0
+    next_arrival_at = next(arrivals)
+    started = False
+    # buffered seconds sampled at each callback, for the latency change
+    buffered = []
+    metrics.snapshot(reset=True)
+
+    # until the last frame arrives; the browser's clock may be ahead of
+    # or behind the device's
+    while next_arrival_at is not None:
+        if next_arrival_at <= next_callback_at:
+            clock.now = next_arrival_at
+            frame = next(frames)
+            if not started:
+                # sets up the resampler and starts playing on the mixer
+                asyncio.run(player.setup_audio_stream(frame))
+                started = True
+            player.queue_audio_frame(frame)
+            next_arrival_at = next(arrivals, None)
+        else:
+            clock.now = next_callback_at
+            time_info = TimeInfo(clock.now, clock.now + LATENCY)
+            if started:
+                buffered.append(player.ring.available() / mixer.sample_rate)
+            mixer.callback(outdata, mixer.blocksize, time_info, None)
+            next_callback_at += block_seconds
+
+    per_window = int(WINDOW_SECONDS / block_seconds)
+    middle = buffered[len(buffered) // 2 :][:per_window]
+    late = buffered[-per_window:]
+    stats = player.get_stats()
+    latency = metrics.snapshot(reset=True)
+    return {
+        "underruns": stats["underruns"],
+        "overruns": stats["overruns"],
+        "overrun_frames": stats["overrun_frames"],
+        "correction": stats["correction"],
+        "playout_latency": latency.get("audio_playout_latency"),
+        "frame_interval": latency.get("audio_frame_interval"),
+        "mix": latency.get("audio_mix"),
+        "latency_change_ms": round((np.mean(late) - np.mean(middle)) * 1000, 3),
+    }
+
+
+def check(name, scenario, result):
+    """Returns a list of the limits the result exceeds"""
+    failures = []
+    max_underruns = scenario.get("max_underruns")
+    if max_underruns is not None and result["underruns"] > max_underruns:
+        failures.append(f"{result['underruns']} underruns > {max_underruns}")
+    if result["overruns"] > MAX_OVERRUNS:
+        failures.append(f"{result['overruns']} overruns > {MAX_OVERRUNS}")
+    max_change = scenario.get("max_latency_change_ms", MAX_LATENCY_CHANGE_MS)
+    if max_change is not None and abs(result["latency_change_ms"]) > max_change:
+        failures.append(
+            f"latency changed {result['latency_change_ms']}ms > {max_change}ms"
+        )
+    return [f"{name}: {failure}" for failure in failures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--seconds",
+        type=float,
+        default=300,
+        help="simulated seconds of audio per scenario",
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=list(SCENARIOS),
+        help="only simulate these scenarios",
+    )
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+    for name in args.only or SCENARIOS:
+        scenario = SCENARIOS[name]
+        result = results[name] = simulate(name, scenario, args.seconds)
+        failures += check(name, scenario, result)
+        latency = result["playout_latency"] or {}
+        print(
+            f"{name:12} underruns={result['underruns']:<4}"
+            f" overruns={result['overruns']:<4}"
+            f" latency p50={latency.get('p50_ms')}ms"
+            f" p99={latency.get('p99_ms')}ms"
+            f" change={result['latency_change_ms']}ms"
+            f" correction={result['correction']}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    for failure in failures:
+        print(f"FAILED {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
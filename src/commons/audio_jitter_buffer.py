@@ -0,0 +1,123 @@
+"""
+Jitter buffer for streamed audio that compensates for clock drift.
+
+The browser's sound clock and the Pi's sound card never run at exactly
+the same rate.  Even 100ppm of drift over- or under-fills a buffer by
+360ms an hour, so a plain ring buffer eventually overruns (dropping
+audio) or underruns (glitching), and latency wanders in between.
+
+JitterBuffer wraps an AudioRingBuffer.  On each write it updates a
+smoothed measure of how full the ring is and, in proportion to how far
+that is outside DEADBAND_SECONDS of the target fill (the ring's prefill),
+resamples the frame by a tiny ratio, at most MAX_CORRECTION (0.5%,
+inaudible), so the ring drains or fills back toward the target.
+Resampling is linear interpolation that carries its phase and the
+previous frame's last sample across frames, so there are no
+discontinuities at frame boundaries.
+
+All of the work happens on the writer's side (the event loop); the
+audio callback just reads the ring.
+"""
+import numpy as np
+
+from commons.audio_ring_buffer import AudioRingBuffer
+
+# largest speed up / slow down applied to compensate for drift
+MAX_CORRECTION = 0.005
+# a fill error is corrected over about this many seconds
+CORRECTION_SECONDS = 10.0
+# time constant of the smoothed fill level
+FILL_SMOOTHING_SECONDS = 1.0
+# fill errors smaller than this aren't corrected, so matched clocks pass
+# samples through untouched instead of hunting around the target
+DEADBAND_SECONDS = 0.01
+
+
+class JitterBuffer:
+    def __init__(self, ring: AudioRingBuffer, sample_rate, max_correction=None):
+        """
+        Args:
+            ring: buffer that the audio callback reads from; its prefill is
+                the target fill level
+            sample_rate: of the samples written
+            max_correction: overrides MAX_CORRECTION; 0 disables drift
+                compensation
+        """
+        self.ring = ring
+        self.sample_rate = sample_rate
+        self.max_correction = (
+            MAX_CORRECTION if max_correction is None else max_correction
+        )
+        self.target = ring.prefill
+
+        # smoothed number of frames in the ring; None until primed
+        self.fill = None
+        # input frames consumed per output frame
+        self.ratio = 1.0
+        # position of the next output frame, in frames after the last
+        # frame written; 1.0 is the next frame's first sample
+        self.phase = 1.0
+        self.last = np.zeros((1, ring.channels), dtype=np.int16)
+
+    def write(self, samples):
+        """
+        Adjust samples, shape (frames, channels), for drift and write them
+        to the ring.  Returns the number of frames written.
+        """
+        if len(samples) == 0:
+            return 0
+        self.update_ratio(len(samples))
+        return self.ring.write(self.varispeed(samples))
+
+    def update_ratio(self, frames):
+        if not self.ring.primed:
+            # not playing yet (or just underran); the ring is filling up
+            self.fill = None
+            self.ratio = 1.0
+            return
+
+        available = self.ring.available()
+        if self.fill is None:
+            self.fill = float(available)
+        else:
+            alpha = min(1.0, frames / (FILL_SMOOTHING_SECONDS * self.sample_rate))
+            self.fill += alpha * (available - self.fill)
+
+        error = self.fill - self.target
+        deadband = DEADBAND_SECONDS * self.sample_rate
+        if abs(error) <= deadband:
+            error = 0.0
+        else:
+            error -= deadband if error > 0 else -deadband
+        correction = error / (CORRECTION_SECONDS * self.sample_rate)
+        correction = max(-self.max_correction, min(self.max_correction, correction))
+        # too full -> consume input faster (ratio > 1) -> fewer frames out
+        self.ratio = 1.0 + correction
+
+    def varispeed(self, samples):
+        frames = len(samples)
+        if self.ratio == 1.0 and self.phase == 1.0:
+            self.last = samples[-1:]
+            return samples
+
+        # x[0] is the last sample of the previous frame, x[1] is samples[0]
+        x = np.concatenate([self.last, samples])
+        count = max(0, int((frames - self.phase) // self.ratio) + 1)
+        positions = self.phase + np.arange(count) * self.ratio
+        index = np.arange(frames + 1)
+        out = np.empty((count, samples.shape[1]), dtype=np.int16)
+        for channel in range(samples.shape[1]):
+            out[:, channel] = np.rint(np.interp(positions, index, x[:, channel]))
+
+        # x[frames] is x[0] of the next frame
+        self.phase += count * self.ratio - frames
+        self.last = samples[-1:]
+        return out
+
+    def get_stats(self):
+        return {
+            **self.ring.get_stats(),
+            "target": self.target,
+            "fill": round(self.fill) if self.fill is not None else None,
+            "correction": round(self.ratio - 1.0, 6),
+        }
@@ -0,0 +1,325 @@
+"""
+One long-lived output stream that mixes every sound a process plays.
+
+Opening a sounddevice stream per sound (sd.play) costs device open
+latency on every cue, and separate streams fight over the output device
+so sounds can't overlap.  Instead, each process has one AudioMixer,
+`mixer`, that owns a single sd.OutputStream.  Its callback sums every
+active MixerSource into the output block with NumPy:
+
+    BufferSource       - a preloaded int16 buffer, e.g. a reaction cue from
+                         the SoundBank in commons/sound.py
+    AudioStreamPlayer  - telepresence audio from WebRTC (see
+                         commons/audio_stream_player.py)
+
+Future sources, like text to speech, subclass MixerSource and implement
+read().
+
+Each source has a gain, can duck (attenuate by D2_AUDIO_DUCK_GAIN) the
+other sources while it plays, and can be cancelled at any time.  Gain
+changes, including cancel, are ramped across one block so they don't
+click.
+
+The callback runs on PortAudio's thread; sources are added and removed
+under a lock that is only held to swap the source list, never while
+mixing.  The time each callback takes is recorded as "audio_mix" in
+commons/metrics.py.
+"""
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from basic_bot.commons import log, constants as c
+from commons import constants as d2c
+from commons.metrics import metrics
+
+# sounddevice won't work in CI/CD pipeline where there is no audio hardware
+if c.BB_ENV != "test":
+    import sounddevice as sd
+
+    if c.BB_LOG_DEBUG:
+        default_output_device_info = sd.query_devices(sd.default.device[1], "output")
+        log.debug(f"audio_mixer: Default output device: {default_output_device_info}")
+else:
+    log.info("Running in BB_ENV='test', stubbing out sounddevice for audio_mixer")
+
+    class SoundDeviceMock:
+        def query_devices(self, *args, **kwargs):
+            raise RuntimeError("no sound device")
+
+        class OutputStream:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def start(self):
+                pass
+
+            def stop(self):
+                pass
+
+            def close(self):
+                pass
+
+    sd = SoundDeviceMock()
+
+
+CHANNELS = 2
+BLOCKSIZE = 1024  # frames per callback
+LATENCY = 0.01  # seconds
+# when the output device's default sample rate can't be queried
+FALLBACK_SAMPLE_RATE = 48000
+
+
+def device_sample_rate():
+    """Default sample rate of the output device."""
+    try:
+        return int(sd.query_devices(kind="output")["default_samplerate"])
+    except Exception:
+        return FALLBACK_SAMPLE_RATE
+
+
+class MixerSource:
+    """
+    Something the mixer plays.  Subclasses implement read().
+    """
+
+    def __init__(self, gain=1.0, ducks_others=False, name="source"):
+        """
+        Args:
+            gain: linear gain applied to the source's samples
+            ducks_others: while this source is playing, the mixer
+                attenuates all sources that don't duck others
+        """
+        self.gain = gain
+        self.ducks_others = ducks_others
+        self.name = name
+        # set by cancel(); the mixer fades the source out and removes it
+        self.cancelled = False
+        # set by the source when it has nothing more to play
+        self.done = False
+        # gain the mixer applied at the end of the last block
+        self.applied_gain = None
+        self.finished = threading.Event()
+
+    def read(self, frames):
+        """
+        Returns up to `frames` samples as an array of shape (n, channels)
+        with 1 or CHANNELS channels, or None if there is nothing to play
+        right now.  Called on the audio thread; must not block.
+        """
+        raise NotImplementedError
+
+    def cancel(self):
+        """Stop playing.  Safe to call from any thread."""
+        self.cancelled = True
+
+    def wait(self, timeout=None):
+        """Block until the mixer has finished playing the source."""
+        return self.finished.wait(timeout)
+
+    async def wait_async(self, timeout=None, poll_seconds=0.05):
+        """
+        Like wait() but on the event loop, which it doesn't block.  Returns
+        False if the source didn't finish within timeout seconds.
+        """
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        while not self.finished.is_set():
+            if timeout is not None and loop.time() - started_at >= timeout:
+                return False
+            await asyncio.sleep(poll_seconds)
+        return True
+
+
+class BufferSource(MixerSource):
+    """Plays a preloaded int16 buffer of shape (frames, channels) once."""
+
+    def __init__(self, samples, **kwargs):
+        super().__init__(**kwargs)
+        self.samples = samples
+        self.position = 0
+
+    def read(self, frames):
+        start = self.position
+        self.position = min(start + frames, len(self.samples))
+        if self.position >= len(self.samples):
+            self.done = True
+        return self.samples[start : self.position]
+
+
+class AudioMixer:
+    def __init__(
+        self,
+        sample_rate=d2c.D2_AUDIO_SAMPLE_RATE,
+        channels=CHANNELS,
+        blocksize=BLOCKSIZE,
+        duck_gain=d2c.D2_AUDIO_DUCK_GAIN,
+    ):
+        # the device's native rate, unless configured, so that PortAudio
+        # doesn't resample
+        self.sample_rate = sample_rate or device_sample_rate()
+        self.channels = channels
+        self.blocksize = blocksize
+        self.duck_gain = duck_gain
+
+        self.sources = []
+        self.lock = threading.Lock()
+        self.stream = None
+        # preallocated so that mixing a block doesn't allocate
+        self.mix_buffer = np.zeros((blocksize, channels), dtype=np.float32)
+        self.scratch = np.zeros((blocksize, channels), dtype=np.float32)
+
+        # seconds from the current callback until its block is heard
+        self.output_latency = 0.0
+
+        self.callback_count = 0
+        self.status_count = 0
+        self.source_errors = 0
+        self.sources_played = 0
+
+    def start(self):
+        """Open and start the output stream if it isn't already."""
+        with self.lock:
+            if self.stream is not None:
+                return
+            try:
+                self.stream = sd.OutputStream(
+                    samplerate=self.sample_rate,
+                    channels=self.channels,
+                    dtype=np.int16,
+                    callback=self.callback,
+                    blocksize=self.blocksize,
+                    latency=LATENCY,
+                )
+                self.stream.start()
+                log.info(
+                    f"audio mixer started: {self.sample_rate}Hz, "
+                    f"{self.channels} channels"
+                )
+            except Exception as e:
+                self.stream = None
+                log.error(f"Error starting audio mixer: {e}")
+
+    def stop(self):
+        with self.lock:
+            stream, self.stream = self.stream, None
+        if stream is not None:
+            stream.stop()
+            stream.close()
+        for source in self.sources:
+            source.cancel()
+        self.remove(self.sources)
+
+    def add(self, source):
+        """Start playing source.  Returns source."""
+        source.cancelled = False
+        source.done = False
+        source.applied_gain = None
+        source.finished.clear()
+        with self.lock:
+            # a source re-added while it fades out is restarted, not doubled
+            self.sources = [*(s for s in self.sources if s is not source), source]
+        self.sources_played += 1
+        self.start()
+        return source
+
+    def play(self, samples, gain=1.0, ducks_others=False, name="buffer"):
+        """Play a preloaded int16 buffer.  Returns the BufferSource."""
+        source = self.add(
+            BufferSource(samples, gain=gain, ducks_others=ducks_others, name=name)
+        )
+        if self.stream is None:
+            # the stream failed to start, e.g. there is no output device, so
+            # nothing will play the buffer; finish it rather than leave
+            # anything waiting on it
+            source.done = True
+            self.remove([source])
+        return source
+
+    def remove(self, sources):
+        with self.lock:
+            self.sources = [s for s in self.sources if s not in sources]
+        for source in sources:
+            source.finished.set()
+
+    def callback(self, outdata, frames, time_info, status):
+        """sounddevice callback; sums the sources into outdata."""
+        started_at = time.time()
+        self.callback_count += 1
+        if time_info is not None:
+            self.output_latency = max(
+                0.0, time_info.outputBufferDacTime - time_info.currentTime
+            )
+        if status:
+            self.status_count += 1
+            log.debug(f"Audio mixer callback status: {status}")
+
+        if frames > len(self.mix_buffer):
+            self.mix_buffer = np.zeros((frames, self.channels), dtype=np.float32)
+            self.scratch = np.zeros((frames, self.channels), dtype=np.float32)
+        mix = self.mix_buffer[:frames]
+        mix.fill(0)
+
+        sources = self.sources
+        ducking = any(s.ducks_others and not s.cancelled for s in sources)
+        finished = []
+        for source in sources:
+            try:
+                self.mix_source(mix, source, frames, ducking)
+            except Exception as e:
+                self.source_errors += 1
+                log.error(f"Error mixing {source.name}: {e}")
+                source.cancel()
+                source.applied_gain = 0.0
+            if source.done or (source.cancelled and source.applied_gain == 0):
+                finished.append(source)
+
+        np.clip(mix, -32768, 32767, out=mix)
+        np.copyto(outdata, mix, casting="unsafe")
+        if finished:
+            self.remove(finished)
+        metrics.record("audio_mix", time.time() - started_at)
+
+    def mix_source(self, mix, source, frames, ducking):
+        if source.cancelled:
+            gain = 0.0
+        elif ducking and not source.ducks_others:
+            gain = source.gain * self.duck_gain
+        else:
+            gain = source.gain
+
+        previous = gain if source.applied_gain is None else source.applied_gain
+        if previous == 0 and gain == 0:
+            source.applied_gain = 0.0
+            return
+
+        samples = source.read(frames)
+        if samples is None or len(samples) == 0:
+            # nothing audible to ramp
+            source.applied_gain = gain
+            return
+        n = len(samples)
+        scaled = self.scratch[:n]
+        if previous == gain:
+            np.multiply(samples, np.float32(gain), out=scaled)
+        else:
+            # ramp from the last block's gain to avoid a click
+            ramp = np.linspace(previous, gain, n, dtype=np.float32)
+            np.multiply(samples, ramp[:, None], out=scaled)
+        mix[:n] += scaled
+        source.applied_gain = gain
+
+    def get_stats(self):
+        return {
+            "sources": len(self.sources),
+            "sources_played": self.sources_played,
+            "callbacks": self.callback_count,
+            "status_errors": self.status_count,
+            "source_errors": self.source_errors,
+        }
+
+
+# one mixer per process; it opens the output device on first use
+mixer = AudioMixer()
@@ -0,0 +1,109 @@
+"""
+Preallocated, sample accurate ring buffer for streamed audio.
+
+One producer (the event loop, writing decoded WebRTC frames) and one
+consumer (the audio callback, reading exactly the frames it was asked
+for) share a fixed int16 array.  Each side only advances its own index,
+write_index or read_index, and does so after copying its samples, so no
+lock is needed.  The indices count frames written/read since the buffer
+was created and only ever increase; their difference is the number of
+frames buffered.
+
+Reads and writes are split across the end of the array as needed, so
+frame boundaries on the write side have nothing to do with block
+boundaries on the read side.
+
+    underruns - reads that were short and padded with silence.  After an
+                underrun, reading waits for `prefill` frames to be
+                buffered again before resuming, rather than stuttering
+                one partial block at a time.
+    overruns  - writes that didn't fit; the frames that didn't fit are
+                dropped (overrun_frames).
+"""
+import numpy as np
+
+
+class AudioRingBuffer:
+    def __init__(self, capacity, channels, prefill=0):
+        """
+        Args:
+            capacity: max frames buffered
+            channels: samples per frame
+            prefill: frames that must be buffered before reading starts,
+                and restarts after an underrun
+        """
+        self.buffer = np.zeros((capacity, channels), dtype=np.int16)
+        self.capacity = capacity
+        self.channels = channels
+        self.prefill = min(prefill, capacity)
+
+        # only written by the producer
+        self.write_index = 0
+        self.overruns = 0
+        self.overrun_frames = 0
+
+        # only written by the consumer
+        self.read_index = 0
+        self.primed = False
+        self.underruns = 0
+
+    def available(self):
+        """Frames buffered and not yet read."""
+        return self.write_index - self.read_index
+
+    def write(self, samples):
+        """
+        Copy samples, shape (frames, channels), into the buffer.  Returns
+        the number of frames written.
+        """
+        frames = min(len(samples), self.capacity - self.available())
+        if frames < len(samples):
+            self.overruns += 1
+            self.overrun_frames += len(samples) - frames
+
+        start = self.write_index % self.capacity
+        first = min(frames, self.capacity - start)
+        self.buffer[start : start + first] = samples[:first]
+        self.buffer[: frames - first] = samples[first:frames]
+        self.write_index += frames
+        return frames
+
+    def read_into(self, out):
+        """
+        Fill out, shape (frames, channels), with the next frames, padding
+        with silence if not enough are buffered.  Returns the number of
+        frames read.
+        """
+        available = self.available()
+        if not self.primed:
+            if available < max(self.prefill, 1):
+                out.fill(0)
+                return 0
+            self.primed = True
+
+        frames = min(len(out), available)
+        start = self.read_index % self.capacity
+        first = min(frames, self.capacity - start)
+        out[:first] = self.buffer[start : start + first]
+        out[first:frames] = self.buffer[: frames - first]
+        self.read_index += frames
+
+        if frames < len(out):
+            out[frames:].fill(0)
+            self.underruns += 1
+            self.primed = False
+        return frames
+
+    def skip(self, frames):
+        """Consumer only: discard up to `frames` of the oldest frames."""
+        frames = min(frames, self.available())
+        self.read_index += frames
+        return frames
+
+    def get_stats(self):
+        return {
+            "buffered": self.available(),
+            "underruns": self.underruns,
+            "overruns": self.overruns,
+            "overrun_frames": self.overrun_frames,
+        }
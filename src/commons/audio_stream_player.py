@@ -1,139 +1,150 @@
-import queue
-import numpy as np
-
-from basic_bot.commons import log, constants as c
-
-# sounddevice won't work in CI/CD pipeline where there is no audio hardware
-if c.BB_ENV != "test":
-    import sounddevice as sd
-
-    if c.BB_LOG_DEBUG:
-        default_output_device_info = sd.query_devices(sd.default.device[1], "output")
-        log.debug(
-            f"audio_stream_player: Default output device: {default_output_device_info}"
-        )
-else:
-    log.info("Running in BB_ENV='test', stubbing out sounddevice for audio_stream_player")
-
-    class SoundDeviceMock:
-        class OutputStream:
-            def __init__(self, *args, **kwargs):
-                pass
-
-            def start(self):
-                pass
-
-            def stop(self):
-                pass
-
-            def close(self):
-                pass
-
-    sd = SoundDeviceMock()
-
+import time
 
-class AudioStreamPlayer:
+import av
+import numpy as np
 
-    def __init__(self):
-        # Audio playback setup
-        self.audio_queue = queue.Queue(maxsize=5)  # Small buffer for low latency
-        self.audio_stream = None
-        self.audio_thread = None
+from basic_bot.commons import log
+
+from commons.audio_jitter_buffer import JitterBuffer
+from commons.audio_mixer import MixerSource, mixer as default_mixer
+from commons.audio_ring_buffer import AudioRingBuffer
+from commons.metrics import metrics
+
+# max audio buffered; frames arriving while the buffer is full are dropped
+BUFFER_SECONDS = 0.25
+# audio buffered before playback starts (and restarts after an underrun),
+# in addition to one mixer block.  Covers WebRTC's 20ms frames arriving
+# a little late.
+PREFILL_SECONDS = 0.02
+
+
+class AudioStreamPlayer(MixerSource):
+    """
+    Plays telepresence audio received over WebRTC as a source on the
+    process's audio mixer (see commons/audio_mixer.py).
+
+    Decoded frames are converted once, on the event loop, to the mixer's
+    sample rate and channel layout by an av.AudioResampler, then written
+    through a JitterBuffer (which compensates for drift between the
+    browser's and the sound card's clocks) to an AudioRingBuffer.  The
+    mixer's callback reads exactly the samples it needs from the ring,
+    across frame boundaries, into a preallocated block.
+
+    Recorded in commons/metrics.py:
+
+        audio_frame_interval  - time between frames arriving (network jitter)
+        audio_playout_latency - at each block, how long the next sample has
+                                been buffered plus the output device's
+                                latency
+    """
+
+    def __init__(self, mixer=None, clock=time.time):
+        """
+        Args:
+            mixer: AudioMixer to play on; defaults to the process's mixer
+            clock: returns the current time in seconds; the playback
+                simulator (sbin/simulate_audio_playback.py) passes a
+                virtual clock
+        """
+        super().__init__(name="webrtc_audio")
+        self.mixer = mixer or default_mixer
+        self.clock = clock
+        self.last_frame_at = None
+        self.frames_received = 0
+        self.frame_errors = 0
+        self.max_buffered = 0
+        self.resampler = None
+        self.jitter_buffer = None
+        self.ring = None
+        self.block = None
+        self.playing = False
 
     async def setup_audio_stream(self, first_frame):
-        """Setup sounddevice audio stream based on first audio frame."""
+        """Start playing on the mixer based on the first audio frame."""
         try:
-            # Get audio properties from the frame
-            sample_rate = first_frame.sample_rate
-            channels = (
-                len(first_frame.layout.channels)
-                if hasattr(first_frame, "layout")
-                else 1
+            sample_rate = self.mixer.sample_rate
+            channels = self.mixer.channels
+            log.info(
+                f"Setting up audio stream: {first_frame.sample_rate}Hz "
+                f"{first_frame.layout.name} converted to {sample_rate}Hz, "
+                f"{channels} channels"
             )
 
-            log.info(f"Setting up audio stream: {sample_rate}Hz, {channels} channels")
-
-            # Create audio stream with callback
-            self.audio_stream = sd.OutputStream(
-                samplerate=sample_rate,
-                channels=channels,
-                dtype=np.int16,
-                callback=self._audio_callback,
-                blocksize=1024,  # Small buffer for low latency
-                latency=0.01,  # Very low latency (10ms)
+            # convert to what the mixer plays, whatever the browser sends
+            self.resampler = av.AudioResampler(
+                format="s16",
+                layout="stereo" if channels == 2 else "mono",
+                rate=sample_rate,
             )
-
-            self.audio_stream.start()
+            self.ring = AudioRingBuffer(
+                int(BUFFER_SECONDS * sample_rate),
+                channels,
+                prefill=self.mixer.blocksize + int(PREFILL_SECONDS * sample_rate),
+            )
+            self.jitter_buffer = JitterBuffer(self.ring, sample_rate)
+            self.last_frame_at = None
+            self.max_buffered = 0
+            self.block = np.zeros((self.mixer.blocksize, channels), dtype=np.int16)
+            self.mixer.add(self)
+            self.playing = True
             log.info("Audio stream started successfully")
 
         except Exception as e:
             log.error(f"Error setting up audio stream: {e}")
 
-    def _audio_callback(self, outdata, frames, time, status):
-        """Callback function for sounddevice audio stream."""
-        if status:
-            log.debug(f"Audio callback status: {status}")
-
-        try:
-            # Get audio data from queue
-            audio_data = self.audio_queue.get_nowait()
-
-            # Ensure data fits in output buffer - reshape for stereo output
-            if len(audio_data) <= len(outdata) * 2:
-                # Reshape interleaved stereo data to (samples, 2)
-                stereo_samples = len(audio_data) // 2
-                stereo_data = audio_data[: stereo_samples * 2].reshape(-1, 2)
-                outdata[:stereo_samples] = stereo_data
-                # Pad with zeros if needed
-                if stereo_samples < len(outdata):
-                    outdata[stereo_samples:] = 0
-            else:
-                # Truncate if too long - take only what fits in output buffer
-                needed_samples = len(outdata) * 2
-                outdata[:] = audio_data[:needed_samples].reshape(-1, 2)
-
-        except queue.Empty:
-            # No audio data available, output silence
-            outdata.fill(0)
-        except Exception as e:
-            log.error(f"Error in audio callback: {e}")
-            outdata.fill(0)
+    def read(self, frames):
+        """Called by the mixer's callback for each block."""
+        ring = self.ring
+        if ring is None:
+            return None
+        if frames > len(self.block):
+            self.block = np.zeros((frames, ring.channels), dtype=np.int16)
+        block = self.block[:frames]
+        buffered = ring.available()
+        if buffered > self.max_buffered:
+            self.max_buffered = buffered
+        # pads with silence on underrun
+        if ring.read_into(block):
+            metrics.record(
+                "audio_playout_latency",
+                buffered / self.mixer.sample_rate + self.mixer.output_latency,
+            )
+        return block
 
     def queue_audio_frame(self, frame):
-        """Convert and queue audio frame for playback."""
+        """Convert and buffer audio frame for playback."""
+        if self.resampler is None or self.jitter_buffer is None:
+            return
+        now = self.clock()
+        if self.last_frame_at is not None:
+            metrics.record("audio_frame_interval", now - self.last_frame_at)
+        self.last_frame_at = now
+        self.frames_received += 1
         try:
-            # Convert WebRTC frame to numpy array
-            audio_data = np.frombuffer(frame.to_ndarray().tobytes(), dtype=np.int16)
-
-            # Add to queue (drop old frames if queue is full)
-            try:
-                self.audio_queue.put_nowait(audio_data)
-            except queue.Full:
-                # Remove oldest frame and add new one
-                try:
-                    self.audio_queue.get_nowait()
-                    self.audio_queue.put_nowait(audio_data)
-                except queue.Empty:
-                    pass
+            for converted in self.resampler.resample(frame):
+                # packed (interleaved) int16 -> (frames, channels)
+                audio_data = converted.to_ndarray().reshape(-1, self.ring.channels)
+                self.jitter_buffer.write(audio_data)
 
         except Exception as e:
+            self.frame_errors += 1
             log.error(f"Error queuing audio frame: {e}")
 
+    def get_stats(self):
+        return {
+            "frames_received": self.frames_received,
+            "frame_errors": self.frame_errors,
+            "max_buffered": self.max_buffered,
+            **(self.jitter_buffer.get_stats() if self.jitter_buffer else {}),
+        }
+
     def cleanup_audio_stream(self):
-        """Clean up audio stream resources."""
+        """Stop playing on the mixer and discard buffered audio."""
         try:
-            if self.audio_stream:
-                self.audio_stream.stop()
-                self.audio_stream.close()
-                self.audio_stream = None
-                log.info("Audio stream cleaned up")
-
-            # Clear audio queue
-            while not self.audio_queue.empty():
-                try:
-                    self.audio_queue.get_nowait()
-                except queue.Empty:
-                    break
+            if self.playing:
+                self.cancel()
+                self.playing = False
+                log.info(f"Audio stream cleaned up: {self.get_stats()}")
 
         except Exception as e:
             log.error(f"Error cleaning up audio stream: {e}")
@@ -0,0 +1,274 @@
+"""
+Behavior engine for daphbot_service.
+
+All of daphbot's behaviors (tracking a target, reacting to a pet with a
+dance and re-centering the camera when nothing has been seen for a while)
+run as cancellable asyncio tasks on the HubStateMonitor's event loop.  No
+threads are created and no state is shared outside of this class.
+
+Time based transitions (auto-centering, the end of the cooldown and
+patrols) are driven by timers (see commons/timers.py), so they happen
+when due even if vision stops publishing, and checking for them costs
+nothing per recognition update.
+
+The engine moves between these states:
+
+    IDLE       - no target; the camera is (or is about to be) centered
+    TRACKING   - a target is in view and the camera is following it
+    REACTING   - a pet was detected and the dance is running
+    COOLDOWN   - the dance finished; tracking continues but a new dance
+                 will not start until the cooldown expires
+    PATROLLING - idle for D2_PATROL_INTERVAL_SECONDS; the camera is
+                 sweeping the room
+"""
+import asyncio
+import time
+from enum import Enum
+
+from basic_bot.commons import log
+
+from commons import constants as d2c
+from commons.dance import dance
+from commons.data import is_pet
+from commons.timers import Timer
+from commons.track_target import track_target
+
+# if we haven't seen a primary target in this many seconds, center the camera
+AUTO_CENTER_TIMEOUT_SECONDS = 20
+# how long after a dance completes before another dance can start
+COOLDOWN_SECONDS = 1
+# a patrol points the camera at each of these pan angles, in order, for
+# PATROL_DWELL_SECONDS and then re-centers
+PATROL_PAN_ANGLES = [45, 135]
+PATROL_TILT_ANGLE = 90
+PATROL_DWELL_SECONDS = 3
+
+
+class BehaviorState(str, Enum):
+    IDLE = "idle"
+    TRACKING = "tracking"
+    REACTING = "reacting"
+    COOLDOWN = "cooldown"
+    PATROLLING = "patrolling"
+
+
+class BehaviorEngine:
+    def __init__(
+        self,
+        hub_state,
+        servo_scheduler,
+        on_target_acquired=None,
+        patrol_interval=d2c.D2_PATROL_INTERVAL_SECONDS,
+        detection_voter=None,
+    ):
+        """
+        Args:
+            hub_state: the service's HubState instance
+            servo_scheduler: the ServoScheduler that all servo moves go to
+            on_target_acquired: optional function called (on the event loop)
+                each time a target is acted on, e.g. to start recording video
+            patrol_interval: seconds of IDLE before patrolling; 0 disables
+            detection_voter: optional DetectionVoter, reset in manual mode so
+                that votes don't carry over to auto mode
+        """
+        self.hub_state = hub_state
+        self.servo_scheduler = servo_scheduler
+        self.on_target_acquired = on_target_acquired
+        self.patrol_interval = patrol_interval
+        self.detection_voter = detection_voter
+
+        self.state = BehaviorState.IDLE
+        self.websocket = None
+        self.last_target = None
+        self.last_target_at = 0.0
+        self.confirmed_labels = None
+        self.received_at = None
+
+        self.dance_task = None
+        self.track_task = None
+        self.center_task = None
+        self.patrol_task = None
+
+        self.auto_center_timer = Timer(self.auto_center_due, "auto center")
+        self.cooldown_timer = Timer(self.end_cooldown, "cooldown")
+        self.patrol_timer = Timer(self.patrol_due, "patrol")
+
+    def start(self):
+        """Called from the event loop once it is running."""
+        if self.state == BehaviorState.IDLE:
+            self.arm_patrol()
+
+    def handle_target(
+        self, websocket, primary_target, confirmed_labels=None, received_at=None
+    ):
+        """
+        Called from the event loop with the primary target (or None) of each
+        recognition update.  Never blocks; all work is done in tasks.
+
+        confirmed_labels is the set of labels that have been seen for long
+        enough to react to (see commons/detection_voter.py).  A pet primary
+        target only starts a dance if its label is confirmed.  None skips
+        the check.
+
+        received_at is the time.time() the recognition was received and is
+        passed along for latency metrics.
+        """
+        self.websocket = websocket
+        self.last_target = primary_target
+        self.confirmed_labels = confirmed_labels
+        self.received_at = received_at
+
+        if self.hub_state.state.get("daphbot_mode") == "manual":
+            if self.state != BehaviorState.IDLE:
+                self.stop()
+                # manual control moves the servos without the scheduler
+                self.servo_scheduler.reset()
+            if self.detection_voter:
+                self.detection_voter.reset()
+            return
+
+        if self.state in (
+            BehaviorState.IDLE,
+            BehaviorState.TRACKING,
+            BehaviorState.PATROLLING,
+        ):
+            if primary_target and self.should_react(primary_target):
+                self.start_reacting()
+                return
+
+        if self.state == BehaviorState.REACTING:
+            return
+
+        if primary_target:
+            self.last_target_at = time.time()
+            self.cancel_task(self.center_task)
+            if self.state in (BehaviorState.IDLE, BehaviorState.PATROLLING):
+                self.cancel_task(self.patrol_task)
+                self.set_state(BehaviorState.TRACKING)
+                self.arm_auto_center()
+            self.start_tracking(primary_target)
+            if self.on_target_acquired:
+                self.on_target_acquired(primary_target)
+
+    def should_react(self, primary_target):
+        return is_pet(primary_target) and (
+            self.confirmed_labels is None
+            or primary_target["classification"] in self.confirmed_labels
+        )
+
+    def stop(self):
+        """Cancel every running behavior and return to IDLE."""
+        for task in (
+            self.dance_task,
+            self.track_task,
+            self.center_task,
+            self.patrol_task,
+        ):
+            self.cancel_task(task)
+        self.auto_center_timer.cancel()
+        self.cooldown_timer.cancel()
+        if self.state != BehaviorState.IDLE:
+            self.set_state(BehaviorState.IDLE)
+        self.arm_patrol()
+
+    def set_state(self, new_state):
+        log.info(f"behavior state: {self.state.value} -> {new_state.value}")
+        self.state = new_state
+
+    def start_tracking(self, primary_target):
+        # track_target is rate limited; if the previous request is still
+        # running there is no point in stacking another
+        if self.track_task and not self.track_task.done():
+            return
+        self.track_task = self.create_task(
+            track_target(
+                self.servo_scheduler, self.hub_state, primary_target, self.received_at
+            )
+        )
+
+    def start_reacting(self):
+        self.cancel_task(self.track_task)
+        self.cancel_task(self.center_task)
+        self.cancel_task(self.patrol_task)
+        self.last_target_at = time.time()
+        self.arm_auto_center()
+        if self.on_target_acquired:
+            self.on_target_acquired(self.last_target)
+        self.set_state(BehaviorState.REACTING)
+        self.dance_task = self.create_task(self.react())
+
+    async def react(self):
+        await dance()
+        self.set_state(BehaviorState.COOLDOWN)
+        self.cooldown_timer.start(COOLDOWN_SECONDS)
+
+    def end_cooldown(self):
+        self.set_state(BehaviorState.TRACKING)
+        # we may have missed some recognition updates while dancing, so act
+        # on the most recent target we were given
+        self.handle_target(self.websocket, self.last_target, self.confirmed_labels)
+
+    def arm_auto_center(self):
+        if not self.auto_center_timer.pending:
+            self.auto_center_timer.start_at(
+                self.last_target_at + AUTO_CENTER_TIMEOUT_SECONDS
+            )
+
+    def auto_center_due(self):
+        # the timer isn't re-armed each time a target is seen; if one has
+        # been seen since it was armed, wait for the new deadline
+        due_at = self.last_target_at + AUTO_CENTER_TIMEOUT_SECONDS
+        if time.time() < due_at:
+            self.auto_center_timer.start_at(due_at)
+        elif self.state == BehaviorState.TRACKING:
+            self.start_centering()
+        elif self.state in (BehaviorState.REACTING, BehaviorState.COOLDOWN):
+            # center once the reaction is over
+            self.auto_center_timer.start(COOLDOWN_SECONDS)
+
+    def start_centering(self):
+        if self.center_task and not self.center_task.done():
+            return
+        self.center_task = self.create_task(self.center())
+
+    async def center(self):
+        log.info("no primary target detected, centering servo angles")
+        self.servo_scheduler.set_goal(90, 90)
+        self.set_state(BehaviorState.IDLE)
+        self.arm_patrol()
+
+    def arm_patrol(self):
+        if self.patrol_interval > 0:
+            self.patrol_timer.start(self.patrol_interval)
+
+    def patrol_due(self):
+        if self.state != BehaviorState.IDLE:
+            # centering re-arms the patrol once the current behavior is done
+            return
+        if self.hub_state.state.get("daphbot_mode") == "manual":
+            self.arm_patrol()
+            return
+        self.set_state(BehaviorState.PATROLLING)
+        self.patrol_task = self.create_task(self.patrol())
+
+    async def patrol(self):
+        log.info("nothing seen for a while, patrolling")
+        for pan in PATROL_PAN_ANGLES:
+            self.servo_scheduler.set_goal(pan, PATROL_TILT_ANGLE)
+            await asyncio.sleep(PATROL_DWELL_SECONDS)
+        self.start_centering()
+
+    def create_task(self, coro):
+        task = asyncio.create_task(coro)
+        task.add_done_callback(self.log_task_exception)
+        return task
+
+    @staticmethod
+    def cancel_task(task):
+        if task and not task.done():
+            task.cancel()
+
+    @staticmethod
+    def log_task_exception(task):
+        if not task.cancelled() and task.exception():
+            log.error(f"behavior task failed: {task.exception()!r}")
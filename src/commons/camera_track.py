@@ -0,0 +1,300 @@
+"""
+The robot's camera as a WebRTC video track, for browsers that want to see
+what the robot sees without the bandwidth and CPU that an MJPEG stream
+costs per viewer.
+
+CameraStream reads frames from a source (D2_OUI_CAMERA_SOURCE: the vision
+service's MJPEG stream, a video file or a synthetic test pattern), scales
+them to D2_OUI_CAMERA_WIDTH x D2_OUI_CAMERA_HEIGHT and encodes them, once,
+with libx264 at D2_OUI_CAMERA_FPS and D2_OUI_CAMERA_BITRATE.  Each browser
+gets a CameraTrack whose recv() returns the shared av.Packets, which
+aiortc packetizes without encoding again, so the cost of streaming stays
+flat as viewers are added.  Reading, scaling and encoding run on a worker
+thread, and only while at least one browser is subscribed.
+
+Because every browser gets the same stream, a browser can't start
+watching, or recover from falling behind, at an arbitrary packet.  A
+new subscriber, or one that falls more than QUEUE_SECONDS behind, skips
+packets until the next keyframe and asks the stream for one.  Keyframes
+are also sent every KEYFRAME_SECONDS to recover from packet loss.
+
+The peer connection must negotiate H264 for the track (see
+commons/webrtc_server.py).
+"""
+import asyncio
+import collections
+import fractions
+from concurrent.futures import ThreadPoolExecutor
+
+import av
+import numpy as np
+from aiortc import MediaStreamTrack
+from aiortc.mediastreams import MediaStreamError
+
+from basic_bot.commons import log
+from commons.constants import (
+    D2_OUI_CAMERA_BITRATE,
+    D2_OUI_CAMERA_FPS,
+    D2_OUI_CAMERA_HEIGHT,
+    D2_OUI_CAMERA_SOURCE,
+    D2_OUI_CAMERA_WIDTH,
+)
+
+# RTP clock rate of video
+VIDEO_CLOCK_RATE = 90000
+KEYFRAME_SECONDS = 2
+# packets queued for a browser before it skips to the next keyframe
+QUEUE_SECONDS = 1
+# wait before reopening a source that failed, e.g. vision isn't running
+RETRY_SECONDS = 5
+
+
+class SyntheticSource:
+    """Moving test pattern; stands in for the camera in tests."""
+
+    live = False
+
+    def __init__(self, width, height):
+        self.image = np.zeros((height, width, 3), dtype=np.uint8)
+        self.image[:, :, 2] = np.linspace(0, 255, width, dtype=np.uint8)
+        self.frame_count = 0
+
+    def read(self):
+        image = self.image.copy()
+        x = (self.frame_count * 8) % image.shape[1]
+        image[:, x : x + 8] = 255
+        self.frame_count += 1
+        return av.VideoFrame.from_ndarray(image, format="rgb24")
+
+    def close(self):
+        pass
+
+
+class ContainerSource:
+    """
+    Frames from anything av can open: an MJPEG stream over http, like the
+    vision service's, which is live, or a video file, which is looped.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.live = url.startswith("http")
+        self.container = av.open(url, format="mpjpeg" if self.live else None)
+        self.frames = self.container.decode(video=0)
+
+    def read(self):
+        try:
+            return next(self.frames)
+        except StopIteration:
+            if self.live:
+                raise EOFError(f"{self.url} ended")
+            self.container.seek(0)
+            self.frames = self.container.decode(video=0)
+            return next(self.frames)
+
+    def close(self):
+        self.container.close()
+
+
+def open_source(source, width, height):
+    if source == "synthetic":
+        return SyntheticSource(width, height)
+    return ContainerSource(source)
+
+
+class CameraTrack(MediaStreamTrack):
+    """One browser's view of a CameraStream; recv() returns av.Packets."""
+
+    kind = "video"
+
+    def __init__(self, stream, max_queued):
+        super().__init__()
+        self.stream = stream
+        self.max_queued = max_queued
+        self.packets = collections.deque()
+        self.packet_ready = asyncio.Event()
+        self.waiting_for_keyframe = True
+
+    def put(self, packet):
+        """Called by the stream, on the event loop, for each packet."""
+        if len(self.packets) >= self.max_queued:
+            # too far behind to catch up; start again at a keyframe
+            self.stream.skipped_packets += len(self.packets)
+            self.packets.clear()
+            self.waiting_for_keyframe = True
+            self.stream.request_keyframe()
+        if self.waiting_for_keyframe:
+            if not packet.is_keyframe:
+                self.stream.skipped_packets += 1
+                return
+            self.waiting_for_keyframe = False
+        self.packets.append(packet)
+        self.packet_ready.set()
+
+    async def recv(self):
+        while not self.packets:
+            if self.readyState != "live":
+                raise MediaStreamError
+            self.packet_ready.clear()
+            await self.packet_ready.wait()
+        return self.packets.popleft()
+
+    def stop(self):
+        if self.readyState == "live":
+            self.stream.unsubscribe(self)
+        super().stop()
+        # wake up recv() so that it raises MediaStreamError
+        self.packets.clear()
+        self.packet_ready.set()
+
+
+class CameraStream:
+    def __init__(
+        self,
+        source=D2_OUI_CAMERA_SOURCE,
+        width=D2_OUI_CAMERA_WIDTH,
+        height=D2_OUI_CAMERA_HEIGHT,
+        fps=D2_OUI_CAMERA_FPS,
+        bitrate=D2_OUI_CAMERA_BITRATE,
+    ):
+        """
+        Args:
+            source: see D2_OUI_CAMERA_SOURCE
+            width, height: of the encoded video
+            fps: max frame rate of the encoded video
+            bitrate: target bits per second
+        """
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.bitrate = bitrate
+        self.tracks = set()
+        self.task = None
+        # reads, scales and encodes, one thing at a time, off the event loop
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="camera")
+        self.codec = None
+        self.keyframe_requested = False
+        self.started_at = None
+
+        self.frames_encoded = 0
+        self.bytes_encoded = 0
+        self.keyframes = 0
+        self.source_errors = 0
+        # by viewers that were behind or waiting for a keyframe
+        self.skipped_packets = 0
+
+    def subscribe(self):
+        """A new track of the stream; encoding starts with the first."""
+        track = CameraTrack(self, max_queued=max(1, self.fps * QUEUE_SECONDS))
+        self.tracks.add(track)
+        self.request_keyframe()
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+        return track
+
+    def unsubscribe(self, track):
+        """Called by CameraTrack.stop(); encoding stops with the last."""
+        self.tracks.discard(track)
+        if not self.tracks and self.task:
+            self.task.cancel()
+            self.task = None
+
+    def close(self):
+        for track in list(self.tracks):
+            track.stop()
+        self.executor.shutdown(wait=False)
+
+    def request_keyframe(self):
+        self.keyframe_requested = True
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        frame_seconds = 1.0 / self.fps
+        if self.started_at is None:
+            self.started_at = loop.time()
+        while True:
+            source = None
+            try:
+                source = await loop.run_in_executor(
+                    self.executor, open_source, self.source, self.width, self.height
+                )
+                log.info(f"camera stream started: {self.source}")
+                self.codec = None
+                next_frame_at = None
+                while True:
+                    frame = await loop.run_in_executor(self.executor, source.read)
+                    now = loop.time()
+                    if next_frame_at is None:
+                        next_frame_at = now
+                    if source.live:
+                        # the vision service's frame rate may be higher
+                        if now < next_frame_at - frame_seconds / 2:
+                            continue
+                    elif now < next_frame_at:
+                        await asyncio.sleep(next_frame_at - now)
+                        now = next_frame_at
+                    next_frame_at = max(next_frame_at, now - frame_seconds)
+                    next_frame_at += frame_seconds
+
+                    pts = round((now - self.started_at) * VIDEO_CLOCK_RATE)
+                    packets = await loop.run_in_executor(
+                        self.executor, self.encode, frame, pts
+                    )
+                    for packet in packets:
+                        for track in list(self.tracks):
+                            track.put(packet)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.source_errors += 1
+                log.error(f"camera stream error from {self.source}: {e}")
+                await asyncio.sleep(RETRY_SECONDS)
+            finally:
+                if source:
+                    # after any read still in progress on the worker thread
+                    self.executor.submit(source.close)
+
+    def encode(self, frame, pts):
+        """On a worker thread: scale and encode frame; returns av.Packets."""
+        if self.codec is None:
+            self.codec = self.create_codec()
+        frame = frame.reformat(self.width, self.height, format="yuv420p")
+        frame.pts = pts
+        frame.time_base = self.codec.time_base
+        if self.keyframe_requested:
+            self.keyframe_requested = False
+            frame.pict_type = av.video.frame.PictureType.I
+        packets = self.codec.encode(frame)
+        for packet in packets:
+            self.frames_encoded += 1
+            self.bytes_encoded += packet.size
+            if packet.is_keyframe:
+                self.keyframes += 1
+        return packets
+
+    def create_codec(self):
+        # the same settings as aiortc's own H264 encoder, which browsers
+        # can all decode
+        codec = av.CodecContext.create("libx264", "w")
+        codec.width = self.width
+        codec.height = self.height
+        codec.bit_rate = self.bitrate
+        codec.pix_fmt = "yuv420p"
+        codec.framerate = fractions.Fraction(self.fps, 1)
+        codec.time_base = fractions.Fraction(1, VIDEO_CLOCK_RATE)
+        codec.gop_size = self.fps * KEYFRAME_SECONDS
+        codec.options = {"level": "31", "tune": "zerolatency"}
+        codec.profile = "Baseline"
+        return codec
+
+    def get_stats(self):
+        return {
+            "viewers": len(self.tracks),
+            "frames_encoded": self.frames_encoded,
+            "bytes_encoded": self.bytes_encoded,
+            "keyframes": self.keyframes,
+            "source_errors": self.source_errors,
+            "skipped_packets": self.skipped_packets,
+        }
@@ -4,7 +4,7 @@ Constants for daphbot-due project
 This module defines constants that can be overridden via environment variables.
 """
 
-from basic_bot.commons.env import env_int, env_string
+from basic_bot.commons.env import env_float, env_int, env_string
 
 # WebRTC Signaling Server Configuration
 D2_OUI_WEBRTC_PORT = env_int("D2_OUI_WEBRTC_PORT", 5201)
@@ -36,3 +36,430 @@ Frame rate for rendering the onboard UI display.
 
 Default: 30 FPS
 """
+
+D2_OUI_MIC_DEVICE = env_string("D2_OUI_MIC_DEVICE", "")
+"""
+Input device (sounddevice name or index) whose audio onboard_ui sends to
+the browser during telepresence, so the remote user can hear the room.
+Set to "none" to not send robot audio.
+
+Default: "" (the default input device, e.g. the USB lavalier mic)
+"""
+
+D2_OUI_WEBRTC_MAX_SESSIONS = env_int("D2_OUI_WEBRTC_MAX_SESSIONS", 4)
+"""
+Maximum number of browsers connected to the WebRTC signaling server at
+once.  Further connections are sent an error and closed.
+
+Default: 4
+"""
+
+D2_OUI_WEBRTC_ACTIVE_SESSION = env_string("D2_OUI_WEBRTC_ACTIVE_SESSION", "latest")
+"""
+Which connected browser's video is shown on the robot's display and
+audio played on its speaker; every browser hears the robot's microphone.
+
+    "latest" - the browser that most recently connected (sent an offer)
+               takes over the display and speaker
+    "first"  - the browser that connected first keeps them until it
+               disconnects
+
+When the active browser disconnects, the display and speaker pass to
+the next browser according to the same policy.
+
+Default: "latest"
+"""
+
+D2_OUI_CAMERA_SOURCE = env_string(
+    "D2_OUI_CAMERA_SOURCE", "http://localhost:5801/video_feed"
+)
+"""
+Where onboard_ui gets the robot camera video that it sends to browsers
+that ask for it (see commons/camera_track.py):
+
+    an http(s) URL - an MJPEG stream, by default the vision service's
+    a file path    - a video file, played in a loop
+    "synthetic"    - a moving test pattern
+    "none"         - don't send robot camera video
+
+Default: "http://localhost:5801/video_feed"
+"""
+
+D2_OUI_CAMERA_WIDTH = env_int("D2_OUI_CAMERA_WIDTH", 640)
+"""
+Width, in pixels, of the robot camera video sent to browsers.
+
+Default: 640
+"""
+
+D2_OUI_CAMERA_HEIGHT = env_int("D2_OUI_CAMERA_HEIGHT", 480)
+"""
+Height, in pixels, of the robot camera video sent to browsers.
+
+Default: 480
+"""
+
+D2_OUI_CAMERA_FPS = env_int("D2_OUI_CAMERA_FPS", 15)
+"""
+Frame rate of the robot camera video sent to browsers.
+
+Default: 15
+"""
+
+D2_OUI_CAMERA_BITRATE = env_int("D2_OUI_CAMERA_BITRATE", 1000000)
+"""
+Target bitrate, in bits per second, of the robot camera video.  The video
+is encoded once and the same stream is sent to every browser.
+
+Default: 1000000 (1 Mbps)
+"""
+
+# Primary target scoring (see commons/target_scoring.py)
+D2_TARGET_AREA_WEIGHT = env_float("D2_TARGET_AREA_WEIGHT", 1.0)
+"""
+Weight of a detection's bounding box area, as a fraction of the frame area,
+in the primary target score.
+
+Default: 1.0
+"""
+
+D2_TARGET_CONFIDENCE_WEIGHT = env_float("D2_TARGET_CONFIDENCE_WEIGHT", 0.2)
+"""
+Weight of a detection's confidence (0 - 1) in the primary target score.
+
+Default: 0.2
+"""
+
+D2_TARGET_CENTER_WEIGHT = env_float("D2_TARGET_CENTER_WEIGHT", 0.1)
+"""
+Weight of how close a detection's center is to the center of the frame
+(1 at the center, 0 in a corner) in the primary target score.
+
+Default: 0.1
+"""
+
+D2_TARGET_PERSISTENCE_WEIGHT = env_float("D2_TARGET_PERSISTENCE_WEIGHT", 0.3)
+"""
+Weight of a detection's overlap with the previous primary target in the
+primary target score.  Higher values make the primary target "stickier".
+
+Default: 0.3
+"""
+
+D2_TARGET_CLASS_WEIGHTS = env_string(
+    "D2_TARGET_CLASS_WEIGHTS", "cat:1.0,dog:1.0,person:0.8"
+)
+"""
+Comma separated `classification:weight` pairs.  The primary target score of
+a detection is multiplied by the weight of its classification.  Detections
+of classifications not listed here are never chosen as the primary target.
+
+Default: "cat:1.0,dog:1.0,person:0.8"
+"""
+
+# Multi-object tracking (see commons/target_tracker.py)
+D2_TRACKER_IOU_THRESHOLD = env_float("D2_TRACKER_IOU_THRESHOLD", 0.3)
+"""
+Minimum IoU between a detection and a track's predicted bounding box for
+the detection to be associated with the track.
+
+Default: 0.3
+"""
+
+D2_TRACKER_MAX_MISSES = env_int("D2_TRACKER_MAX_MISSES", 5)
+"""
+Number of consecutive recognition updates a track can go unmatched before
+it is dropped.  A dropped target that reappears gets a new track_id.  Until
+it's dropped, an unmatched primary target stays the primary target at its
+predicted position.
+
+Default: 5
+"""
+
+D2_TRACKER_MIN_HITS = env_int("D2_TRACKER_MIN_HITS", 1)
+"""
+Number of detections a track needs before it can become the primary target.
+
+Default: 1
+"""
+
+D2_TARGET_SWITCH_MARGIN = env_float("D2_TARGET_SWITCH_MARGIN", 0.1)
+"""
+How much higher (see D2_TARGET_*_WEIGHT) another track must score than the
+current primary target before the primary target switches to it.
+
+Default: 0.1
+"""
+
+D2_TARGET_SWITCH_FRAMES = env_int("D2_TARGET_SWITCH_FRAMES", 3)
+"""
+Number of consecutive recognition updates another track must outscore the
+current primary target by D2_TARGET_SWITCH_MARGIN before switching to it.
+
+Default: 3
+"""
+
+# Predictive tracking (see commons/track_target.py)
+D2_SERVO_LATENCY_SECONDS = env_float("D2_SERVO_LATENCY_SECONDS", 0.15)
+"""
+Initial estimate of the time from sending servo_angles to the servos
+reporting that angle in servo_actual_angles.  The estimate is updated from
+measurements while tracking.
+
+Default: 0.15
+"""
+
+D2_VISION_LATENCY_SECONDS = env_float("D2_VISION_LATENCY_SECONDS", 0.1)
+"""
+Initial estimate of how old a recognition is when daphbot receives it.  The
+estimate is updated from the measured interval between recognition updates.
+
+Default: 0.1
+"""
+
+D2_MAX_LEAD_SECONDS = env_float("D2_MAX_LEAD_SECONDS", 0.5)
+"""
+Maximum time ahead that tracking will predict a moving target's position.
+
+Default: 0.5
+"""
+
+# Pan / tilt tracking controller (see commons/pan_tilt_controller.py)
+D2_TRACK_KP = env_float("D2_TRACK_KP", 0.9)
+"""
+Proportional gain of the pan / tilt tracking controller.  1.0 moves all the
+way to the predicted target angle in one move.
+
+Default: 0.9
+"""
+
+D2_TRACK_KI = env_float("D2_TRACK_KI", 0.1)
+"""
+Integral gain (per second) of the pan / tilt tracking controller.
+
+Default: 0.1
+"""
+
+D2_TRACK_KD = env_float("D2_TRACK_KD", 0.02)
+"""
+Derivative gain (seconds) of the pan / tilt tracking controller.
+
+Default: 0.02
+"""
+
+D2_TRACK_DEADBAND_DEGREES = env_float("D2_TRACK_DEADBAND_DEGREES", 1.5)
+"""
+The tracking controller does not move the servos while the target is
+within this many degrees of center.
+
+Default: 1.5
+"""
+
+D2_TRACK_INTEGRAL_LIMIT = env_float("D2_TRACK_INTEGRAL_LIMIT", 10.0)
+"""
+Anti-windup limit, in degree-seconds, of the tracking controller's
+integral term.
+
+Default: 10.0
+"""
+
+D2_TRACK_MAX_STEP_DEGREES = env_float("D2_TRACK_MAX_STEP_DEGREES", 30.0)
+"""
+Largest single move, in degrees, that the tracking controller will command.
+
+Default: 30.0
+"""
+
+# Servo command scheduling (see commons/servo_scheduler.py)
+D2_SERVO_CONTROL_HZ = env_int("D2_SERVO_CONTROL_HZ", 20)
+"""
+Rate at which the servo scheduler may send servo_angles to central_hub.
+This is the maximum servo command rate regardless of how many behaviors
+are requesting moves.
+
+Default: 20
+"""
+
+D2_SERVO_MAX_SLEW_DPS = env_float("D2_SERVO_MAX_SLEW_DPS", 300.0)
+"""
+Maximum rate, in degrees per second, that the servo scheduler will move
+the pan / tilt setpoint toward the goal.
+
+Default: 300.0
+"""
+
+# Pet reaction debouncing (see commons/detection_voter.py)
+D2_REACTION_VOTES = env_int("D2_REACTION_VOTES", 3)
+"""
+Number of the last D2_REACTION_WINDOW_FRAMES recognition updates that must
+include a pet before daphbot reacts to it.
+
+Default: 3
+"""
+
+D2_REACTION_WINDOW_FRAMES = env_int("D2_REACTION_WINDOW_FRAMES", 5)
+"""
+Number of recent recognition updates considered by D2_REACTION_VOTES.
+
+Default: 5
+"""
+
+D2_REACTION_CONFIDENCE_INTEGRAL = env_float("D2_REACTION_CONFIDENCE_INTEGRAL", 0.0)
+"""
+Alternative to voting: daphbot also reacts to a pet once the sum of its
+confidence * seconds seen over the last D2_REACTION_CONFIDENCE_WINDOW_SECONDS
+reaches this value.  For example, 0.4 is a pet seen at 0.8 confidence for
+half a second.  0 disables the confidence integral.
+
+Default: 0.0
+"""
+
+D2_REACTION_CONFIDENCE_WINDOW_SECONDS = env_float(
+    "D2_REACTION_CONFIDENCE_WINDOW_SECONDS", 1.0
+)
+"""
+Time window of D2_REACTION_CONFIDENCE_INTEGRAL.
+
+Default: 1.0
+"""
+
+# Metrics (see commons/metrics.py)
+D2_METRICS_PUBLISH_SECONDS = env_float("D2_METRICS_PUBLISH_SECONDS", 5.0)
+"""
+How often, in seconds, daphbot_service and onboard_ui publish latency
+percentiles and counters to the `daphbot_metrics` and
+`onboard_ui_metrics` hub state keys.  Each publish covers the samples
+recorded since the previous one.
+
+Default: 5.0
+"""
+
+# Hub traffic recording (see commons/hub_recording.py)
+D2_DAPHBOT_RECORD_FILE = env_string("D2_DAPHBOT_RECORD_FILE", "")
+"""
+When set, daphbot_service records the recognition, servo_actual_angles and
+daphbot_mode updates it receives to this file (gzipped JSON lines) for
+offline replay with sbin/replay_hub_traffic.py.
+
+Default: "" (not recording)
+"""
+
+# primary_target publishing (see commons/messages.py)
+D2_PRIMARY_TARGET_BBOX_QUANTUM = env_float("D2_PRIMARY_TARGET_BBOX_QUANTUM", 4.0)
+"""
+primary_target is only re-published to central_hub for the same object
+when an edge of its bounding box has moved at least this many pixels
+from the last published bounding box (or for one of the reasons below).
+Filters out the frame to frame jitter of the detector.
+
+Default: 4.0
+"""
+
+D2_PRIMARY_TARGET_CONFIDENCE_DELTA = env_float(
+    "D2_PRIMARY_TARGET_CONFIDENCE_DELTA", 0.1
+)
+"""
+primary_target is re-published when its confidence has changed by at
+least this much since it was last published.
+
+Default: 0.1
+"""
+
+D2_PRIMARY_TARGET_MAX_STALENESS_SECONDS = env_float(
+    "D2_PRIMARY_TARGET_MAX_STALENESS_SECONDS", 1.0
+)
+"""
+While there is a primary target, it is re-published at least this often
+so that its age and velocity stay reasonably fresh for subscribers.
+
+Default: 1.0
+"""
+
+# Behaviors (see commons/behavior.py)
+D2_PATROL_INTERVAL_SECONDS = env_float("D2_PATROL_INTERVAL_SECONDS", 0.0)
+"""
+When daphbot has been idle (camera centered, nothing seen) for this many
+seconds in auto mode, it patrols: the camera sweeps left and right and
+then re-centers.  0 disables patrolling.
+
+Default: 0.0 (disabled)
+"""
+
+# Outbound hub updates (see commons/hub_outbox.py)
+D2_HUB_OUTBOX_MAX_DELAY_SECONDS = env_float("D2_HUB_OUTBOX_MAX_DELAY_SECONDS", 0.05)
+"""
+How long, in seconds, updates of display only keys (primary_target,
+daphbot_metrics, recording_session) may wait to be merged into the same
+hub message as the next servo_angles update.  servo_angles itself is never
+delayed.  The default is one servo scheduler tick at 20Hz.
+
+Default: 0.05
+"""
+
+# Recording sessions (see commons/recording_session.py)
+D2_RECORDING_SEGMENT_SECONDS = env_float("D2_RECORDING_SEGMENT_SECONDS", 10.0)
+"""
+Duration, in seconds, of each record video request sent to the vision
+service.  While a target stays in view, segments are requested back to
+back for one continuous recording session.
+
+Default: 10.0
+"""
+
+D2_RECORDING_TAIL_SECONDS = env_float("D2_RECORDING_TAIL_SECONDS", 5.0)
+"""
+At the end of each segment, a recording session is chained into another
+segment if a target was seen within this many seconds; otherwise the
+session is closed.
+
+Default: 5.0
+"""
+
+D2_RECORDING_MAX_SESSION_SECONDS = env_float("D2_RECORDING_MAX_SESSION_SECONDS", 600.0)
+"""
+Recording sessions are closed after this many seconds even if the target
+is still in view.  The next sighting starts a new session.
+
+Default: 600.0
+"""
+
+D2_RECORDING_SESSIONS_FILE = env_string(
+    "D2_RECORDING_SESSIONS_FILE", "./logs/recording_sessions.jsonl"
+)
+"""
+daphbot_service appends the metadata (start, end, classes seen, segment
+count) of each closed recording session to this file as a JSON line.
+Set to "" to disable.
+
+Default: "./logs/recording_sessions.jsonl"
+"""
+
+# Sounds (see commons/sound.py)
+D2_SOUND_CACHE_DIR = env_string("D2_SOUND_CACHE_DIR", "./.sound_cache")
+"""
+Directory where the sound files in ./media, decoded to PCM at the audio
+mixer's sample rate, are cached so that restarts don't need to decode
+them again.  Set to "" to always decode at startup.
+
+Default: "./.sound_cache"
+"""
+
+# Audio output (see commons/audio_mixer.py)
+D2_AUDIO_SAMPLE_RATE = env_int("D2_AUDIO_SAMPLE_RATE", 0)
+"""
+Sample rate of the audio mixer's output stream.  Reaction sounds are
+decoded, and telepresence audio is resampled, to this rate.  0 uses the
+output device's default sample rate so that no further resampling
+happens in PortAudio or the driver.
+
+Default: 0
+"""
+
+D2_AUDIO_DUCK_GAIN = env_float("D2_AUDIO_DUCK_GAIN", 0.3)
+"""
+While a sound that ducks others is playing (e.g. a reaction cue), the
+audio mixer multiplies the gain of every other sound (e.g. telepresence
+audio) by this.
+
+Default: 0.3
+"""
@@ -1,25 +1,31 @@
-import time
+import asyncio
 
 from basic_bot.commons import log, constants as c
 from commons import sound
+from commons.audio_mixer import mixer
 
+# the message is waited on for its length plus this, in case the mixer
+# stalls while playing it
+MESSAGE_MARGIN_SECONDS = 1.0
 
-def dance():
+
+# This coroutine is run as a task by the BehaviorEngine when a pet is
+# detected.  It plays the "off" or "down" message
+async def dance():
+    log.info("Starting dance")
     if c.BB_ENV == "test":
         # when we are running in test mode, we don't want to wait
         # for the dance to finish for each test of recognition
         # input.  Also, we don't have access to motors, LEDs, etc.
-        time.sleep(0.5)
+        await asyncio.sleep(0.5)
     else:
-        # play the "off" or "down" message
-        sound.play_off_message()
-        time.sleep(1)
-
-
-# This is a thread function that is started by handle_state_update
-# when a pet is detected.  It plays the "off" or "down" message+++
-def dance_thread(dance_complete_callback):
-    log.info("Starting dance_thread")
-    dance()
-    dance_complete_callback()
-    log.info("Exiting dance_thread")
+        # the sound bank preloaded the message, so this just hands it to
+        # the mixer; the dance lasts as long as the message
+        message = sound.play_off_message()
+        try:
+            seconds = len(message.samples) / mixer.sample_rate
+            await message.wait_async(seconds + MESSAGE_MARGIN_SECONDS)
+        except asyncio.CancelledError:
+            message.cancel()
+            raise
+    log.info("Dance complete")
@@ -1,31 +1,21 @@
-from basic_bot.commons import log
+from commons.target_scoring import TargetScorer
 
 PET_LABELS = ["dog", "cat"]
-TARGET_LABELS = [*PET_LABELS, "person"]
 
+target_scorer = TargetScorer()
 
-def find_primary_target(state_data):
-    prime_target = None
-    if "recognition" in state_data:
-        for recog in state_data["recognition"]:
-            if recog["classification"] in TARGET_LABELS:
-                if prime_target is None:
-                    prime_target = recog
-                else:
-                    log.debug(f"comparing {recog=} {prime_target=}")
-                    target_bb = prime_target["bounding_box"]
-                    target_area = (target_bb[1] - target_bb[0]) * (
-                        target_bb[3] - target_bb[2]
-                    )
 
-                    recog_bb = recog["bounding_box"]
-                    recog_area = (recog_bb[1] - recog_bb[0]) * (
-                        recog_bb[3] - recog_bb[2]
-                    )
-                    log.debug(f"recog_area={recog_area} target_area={target_area}")
-                    if recog_area > target_area:
-                        prime_target = recog
+def find_primary_target(state_data, previous_target=None):
+    """
+    Returns the highest scoring recognized object in state_data["recognition"]
+    or None.  See commons/target_scoring.py for how objects are scored.
+    """
+    if "recognition" not in state_data:
+        return None
 
+    prime_target, _ranked = target_scorer.rank(
+        state_data["recognition"], previous_target
+    )
     return prime_target
 
 
@@ -0,0 +1,101 @@
+"""
+Temporal filter that debounces reactions to single frame false positives.
+
+For each label (e.g. "cat", "dog") the voter keeps a ring buffer of
+whether the label was recognized in each of the last `window_frames`
+recognition updates along with a running count, so checking for "N of the
+last M frames" costs O(1) per update no matter how large M is.
+
+Optionally, a label is also confirmed once the integral of its confidence
+over the last `integral_window` seconds reaches `integral_threshold`.  The
+integral is a running sum over a deque of samples, each sample added and
+removed once, so it is also O(1) per update (amortized).
+"""
+import time
+from collections import deque
+
+import numpy as np
+
+from commons import constants as d2c
+from commons.data import PET_LABELS
+
+# longest gap between updates (seconds) that counts toward the integral
+MAX_INTEGRAL_STEP = 0.5
+
+
+class DetectionVoter:
+    def __init__(
+        self,
+        labels=PET_LABELS,
+        votes=d2c.D2_REACTION_VOTES,
+        window_frames=d2c.D2_REACTION_WINDOW_FRAMES,
+        integral_threshold=d2c.D2_REACTION_CONFIDENCE_INTEGRAL,
+        integral_window=d2c.D2_REACTION_CONFIDENCE_WINDOW_SECONDS,
+    ):
+        self.labels = list(labels)
+        self.label_indexes = {label: i for i, label in enumerate(self.labels)}
+        self.votes = votes
+        self.integral_threshold = integral_threshold
+        self.integral_window = integral_window
+
+        count = len(self.labels)
+        self.history = np.zeros((count, window_frames), dtype=bool)
+        self.counts = np.zeros(count, dtype=int)
+        self.index = 0
+
+        # scratch buffers reused each update
+        self.present = np.zeros(count, dtype=bool)
+        self.confidences = np.zeros(count)
+
+        self.integral_samples = [deque() for _ in self.labels]
+        self.integrals = np.zeros(count)
+        self.last_update_at = None
+
+    def update(self, recognitions, now=None):
+        """
+        Add a recognition update.  Returns the set of labels that are
+        currently confirmed.
+        """
+        now = time.time() if now is None else now
+        self.present[:] = False
+        self.confidences[:] = 0
+        for recognition in recognitions:
+            i = self.label_indexes.get(recognition["classification"])
+            if i is not None:
+                self.present[i] = True
+                self.confidences[i] = max(
+                    self.confidences[i], recognition.get("confidence", 0)
+                )
+
+        # N of M votes
+        self.counts -= self.history[:, self.index]
+        self.history[:, self.index] = self.present
+        self.counts += self.present
+        self.index = (self.index + 1) % self.history.shape[1]
+        confirmed = self.counts >= self.votes
+
+        if self.integral_threshold > 0:
+            self.update_integrals(now)
+            confirmed |= self.integrals >= self.integral_threshold
+        self.last_update_at = now
+
+        return {self.labels[i] for i in np.flatnonzero(confirmed)}
+
+    def update_integrals(self, now):
+        dt = 0.0 if self.last_update_at is None else now - self.last_update_at
+        dt = min(dt, MAX_INTEGRAL_STEP)
+        for i, samples in enumerate(self.integral_samples):
+            if self.present[i] and dt > 0:
+                area = self.confidences[i] * dt
+                samples.append((now, area))
+                self.integrals[i] += area
+            while samples and now - samples[0][0] > self.integral_window:
+                self.integrals[i] -= samples.popleft()[1]
+
+    def reset(self):
+        self.history[:] = False
+        self.counts[:] = 0
+        for samples in self.integral_samples:
+            samples.clear()
+        self.integrals[:] = 0
+        self.last_update_at = None
@@ -0,0 +1,164 @@
+"""
+Single writer outbound queue for hub state updates.
+
+Everything a service sends to central_hub goes through one HubOutbox, and
+one writer task owns the websocket.  Producers (the recognition task, the
+servo scheduler, the metrics publisher, ...) only `put()` a key and value;
+they never await the websocket, so sends can't interleave and a slow hub
+can't back up tasks.
+
+Updates for different keys that are pending at the same time are merged
+into a single `updateState` message.  By default an update is sent right
+away (along with anything else put in the same event loop tick).  Keys
+given a max delay may wait up to that long to ride along with the next
+update, e.g. `primary_target` waits for the next `servo_angles` from the
+servo scheduler so tracking sends one message instead of two, without
+delaying the servos.
+
+Each key has a drop policy:
+
+    LATEST - (default) only the newest pending value is kept; a value
+             replaced before it was sent is counted as dropped.  Correct
+             for hub state since central_hub only keeps the latest value.
+    QUEUE  - every value is sent, in order, one per message, e.g. events
+             that subscribers shouldn't miss.  At most `max_queue` values
+             are held; on overflow the oldest is dropped.
+
+Backpressure: the writer awaits each send before taking the next batch,
+so while the hub is slow, updates coalesce in the outbox instead of
+queueing on the websocket.  The outbox never holds more than one value
+per LATEST key plus `max_queue` per QUEUE key.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+from basic_bot.commons import log, messages
+
+from commons.metrics import metrics
+
+LATEST = "latest"
+QUEUE = "queue"
+
+
+class HubOutbox:
+    def __init__(self, policies=None, max_delays=None, max_queue=10, send=None):
+        """
+        Args:
+            policies: optional {key: LATEST or QUEUE}; unlisted keys are LATEST
+            max_delays: optional {key: seconds} an update of the key may wait
+                to be merged with another update; unlisted keys are sent
+                right away
+            send: async function(websocket, data) that sends an updateState;
+                defaults to basic_bot's messages.send_update_state
+        """
+        self.policies = policies or {}
+        self.max_queue = max_queue
+        self.max_delays = max_delays or {}
+        self.send = send or messages.send_update_state
+
+        self.websocket = None
+        # key -> (value, put_at) for LATEST keys
+        self.pending = {}
+        # key -> deque of (value, put_at) for QUEUE keys
+        self.queues = {}
+
+        self.task = None
+        # created on first use so that it is bound to the writer's loop
+        self.event: Optional[asyncio.Event] = None
+
+        self.messages_sent = 0
+        self.updates_sent = 0
+        self.max_depth = 0
+        self.dropped = {}
+
+    def put(self, websocket, key, value):
+        """
+        Queue `{key: value}` to be sent to central_hub on websocket.  Never
+        blocks.  Must be called from the event loop.
+        """
+        if websocket is not self.websocket:
+            # (re)connected; updates for the old connection are moot
+            self.websocket = websocket
+            self.pending.clear()
+            self.queues.clear()
+
+        now = time.time()
+        if self.policies.get(key, LATEST) == QUEUE:
+            queue = self.queues.setdefault(key, deque())
+            if len(queue) >= self.max_queue:
+                queue.popleft()
+                self.count_drop(key)
+            queue.append((value, now))
+        else:
+            if key in self.pending:
+                self.count_drop(key)
+            self.pending[key] = (value, now)
+
+        self.max_depth = max(self.max_depth, self.depth())
+        self.get_event().set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def depth(self):
+        """Number of values waiting to be sent."""
+        return len(self.pending) + sum(len(queue) for queue in self.queues.values())
+
+    def take(self):
+        """Returns (data, oldest_put_at) for the next message."""
+        batch = list(self.pending.items())
+        self.pending.clear()
+        for key, queue in self.queues.items():
+            if queue:
+                batch.append((key, queue.popleft()))
+        data = {key: value for key, (value, _put_at) in batch}
+        return data, min(put_at for _key, (_value, put_at) in batch)
+
+    def next_send_at(self):
+        """time.time() that the most urgent waiting update is due"""
+        waiting = [(key, put_at) for key, (_value, put_at) in self.pending.items()]
+        waiting += [(key, queue[0][1]) for key, queue in self.queues.items() if queue]
+        return min(put_at + self.max_delays.get(key, 0) for key, put_at in waiting)
+
+    async def run(self):
+        event = self.get_event()
+        while True:
+            event.clear()
+            delay = self.next_send_at() - time.time() if self.depth() else None
+            if delay is None or delay > 0:
+                # wait for another update or for the waiting ones to be due
+                try:
+                    await asyncio.wait_for(event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # let updates made in the same tick join this message
+            await asyncio.sleep(0)
+            websocket = self.websocket
+            data, oldest_put_at = self.take()
+            try:
+                await self.send(websocket, data)
+                self.messages_sent += 1
+                self.updates_sent += len(data)
+            except Exception as e:
+                log.error(f"error sending {list(data)} to central hub: {e}")
+            metrics.record("hub_outbox_wait", time.time() - oldest_put_at)
+
+    def count_drop(self, key):
+        self.dropped[key] = self.dropped.get(key, 0) + 1
+
+    def get_event(self):
+        if self.event is None:
+            self.event = asyncio.Event()
+        return self.event
+
+    def get_stats(self):
+        return {
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "messages_sent": self.messages_sent,
+            "updates_sent": self.updates_sent,
+            "dropped": dict(self.dropped),
+        }
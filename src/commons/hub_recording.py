@@ -0,0 +1,101 @@
+"""
+Compact on-disk recording of the hub state traffic a service receives.
+
+Recordings are gzipped JSON lines.  The first line is a header and each
+following line is one received message:
+```
+{"version": 1, "started_at": 1718000000.123, "keys": ["recognition", ...]}
+[0.0412, "stateUpdate", {"recognition": [...]}]
+[0.0829, "stateUpdate", {"servo_actual_angles": {"pan": 90, "tilt": 92}}]
+```
+where the first element is seconds since `started_at`.  Only the keys
+being recorded are kept from each message.
+
+See sbin/replay_hub_traffic.py for replaying a recording.
+"""
+import gzip
+import json
+import threading
+import time
+
+from basic_bot.commons import log
+
+RECORDING_VERSION = 1
+# flush to disk every this many messages, or seconds, so a crash loses little
+FLUSH_INTERVAL = 100
+FLUSH_SECONDS = 5
+
+
+class HubTrafficRecorder:
+    def __init__(self, path, keys):
+        self.path = path
+        self.keys = list(keys)
+        self.started_at = time.time()
+        self.message_count = 0
+        self.flushed_at = self.started_at
+        # close() may be called from a signal handler or atexit while the
+        # hub monitor thread is recording
+        self.lock = threading.Lock()
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+        self.write(
+            {
+                "version": RECORDING_VERSION,
+                "started_at": self.started_at,
+                "keys": self.keys,
+            }
+        )
+        log.info(f"recording hub traffic {self.keys} to {path}")
+
+    def record(self, msg_type, msg_data):
+        data = {k: v for k, v in msg_data.items() if k in self.keys}
+        if not data:
+            return
+        now = time.time()
+        with self.lock:
+            if self.file.closed:
+                return
+            self.write([round(now - self.started_at, 4), msg_type, data])
+            self.message_count += 1
+            if (
+                self.message_count % FLUSH_INTERVAL == 0
+                or now - self.flushed_at >= FLUSH_SECONDS
+            ):
+                self.file.flush()
+                self.flushed_at = now
+
+    def write(self, line):
+        self.file.write(json.dumps(line, separators=(",", ":")))
+        self.file.write("\n")
+
+    def close(self):
+        """Writes the gzip end marker; safe to call more than once."""
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+                log.info(f"recorded {self.message_count} messages to {self.path}")
+
+
+def read_hub_traffic(path):
+    """
+    Returns (header, messages) for a recording where messages is a generator
+    of (seconds_since_start, msg_type, msg_data).
+
+    A recording whose service was killed before closing it has no gzip end
+    marker; the messages up to the last flush are returned.
+    """
+    file = gzip.open(path, "rt", encoding="utf-8")
+    header = json.loads(file.readline())
+    if header.get("version") != RECORDING_VERSION:
+        raise ValueError(f"unsupported hub traffic recording version: {header}")
+
+    def messages():
+        with file:
+            try:
+                for line in file:
+                    if line.strip():
+                        t, msg_type, msg_data = json.loads(line)
+                        yield t, msg_type, msg_data
+            except EOFError:
+                log.info(f"{path} ended without an end marker; not closed?")
+
+    return header, messages()
@@ -0,0 +1,59 @@
+"""
+Latest-wins mailbox for handing messages from a producer to a single
+asyncio consumer.
+
+The mailbox holds at most one item.  Putting a new item while the previous
+one has not yet been consumed replaces it and counts the old one as
+dropped, so a slow consumer always works on the newest data and the
+backlog (and latency) can never grow beyond one item.
+"""
+import asyncio
+from typing import Any, Optional
+
+
+class LatestMailbox:
+    def __init__(self):
+        self.item: Any = None
+        self.has_item = False
+
+        # total number of items put / replaced before they were consumed
+        self.received_count = 0
+        self.dropped_count = 0
+
+        # created on first use so that it is bound to the consumer's loop
+        self.event: Optional[asyncio.Event] = None
+
+    def put(self, item):
+        """
+        Put an item in the mailbox, replacing any unconsumed item.  Must
+        be called from the consumer's event loop thread.
+        """
+        if self.has_item:
+            self.dropped_count += 1
+        self.item = item
+        self.has_item = True
+        self.received_count += 1
+        self.get_event().set()
+
+    async def get(self):
+        """Wait for and return the newest item."""
+        event = self.get_event()
+        while not self.has_item:
+            event.clear()
+            await event.wait()
+
+        item = self.item
+        self.item = None
+        self.has_item = False
+        return item
+
+    def get_event(self):
+        if self.event is None:
+            self.event = asyncio.Event()
+        return self.event
+
+    def get_stats(self):
+        return {
+            "received": self.received_count,
+            "dropped": self.dropped_count,
+        }
@@ -1,23 +1,110 @@
-from basic_bot.commons import messages
+"""
+Updates daphbot_service (and onboard_ui) send to central_hub.
+
+The send_* functions don't send directly; they put the update in the
+process' hub_outbox (see commons/hub_outbox.py) whose single writer task
+merges and sends them.  They never block and can be called from any code
+on the event loop.
+"""
+import time
+
+from commons import constants as d2c
+from commons.hub_outbox import HubOutbox, QUEUE
+
+# recording session open / close events are each sent; every other key
+# only needs its latest value sent.  servo_angles is sent right away and
+# the other keys, which are only displayed, wait a little to go with it.
+hub_outbox = HubOutbox(
+    policies={"recording_session": QUEUE},
+    max_delays={
+        key: d2c.D2_HUB_OUTBOX_MAX_DELAY_SECONDS
+        for key in [
+            "primary_target",
+            "daphbot_metrics",
+            "onboard_ui_metrics",
+            "recording_session",
+        ]
+    },
+)
 
 last_primary_target_sent = None
+last_primary_target_sent_at = 0.0
+primary_target_stats = {"sent": 0, "suppressed": 0}
 
 
-async def send_primary_target(websocket, primary_target, force=False):
+def is_primary_target_change(previous, primary_target):
     """
-    Send the primary target to the central hub if it has changed.
+    True if primary_target differs meaningfully from the previously sent
+    one: a different object (classification / track_id), a bounding box
+    edge that moved at least D2_PRIMARY_TARGET_BBOX_QUANTUM pixels or a
+    confidence that changed by at least D2_PRIMARY_TARGET_CONFIDENCE_DELTA.
+    Age, velocity and pixel jitter alone are not changes.
     """
-    global last_primary_target_sent
-    if not force and primary_target == last_primary_target_sent:
+    if previous is None or primary_target is None:
+        return previous is not primary_target
+    if previous["classification"] != primary_target["classification"] or (
+        previous.get("track_id") != primary_target.get("track_id")
+    ):
+        return True
+    quantum = d2c.D2_PRIMARY_TARGET_BBOX_QUANTUM
+    for sent, edge in zip(previous["bounding_box"], primary_target["bounding_box"]):
+        if abs(edge - sent) >= quantum:
+            return True
+    return (
+        # confidence is optional, as in TargetScorer
+        abs(primary_target.get("confidence", 0) - previous.get("confidence", 0))
+        >= d2c.D2_PRIMARY_TARGET_CONFIDENCE_DELTA
+    )
+
+
+def send_primary_target(websocket, primary_target, force=False):
+    """
+    Send the primary target to the central hub if it has changed
+    meaningfully (see is_primary_target_change) or, while there is a
+    target, if nothing has been sent for D2_PRIMARY_TARGET_MAX_STALENESS_SECONDS.
+    """
+    global last_primary_target_sent, last_primary_target_sent_at
+    now = time.time()
+    if not (
+        force
+        or is_primary_target_change(last_primary_target_sent, primary_target)
+        or (
+            primary_target is not None
+            and now - last_primary_target_sent_at
+            >= d2c.D2_PRIMARY_TARGET_MAX_STALENESS_SECONDS
+        )
+    ):
+        primary_target_stats["suppressed"] += 1
         return
     last_primary_target_sent = primary_target
-    await messages.send_update_state(websocket, {"primary_target": primary_target})
+    last_primary_target_sent_at = now
+    primary_target_stats["sent"] += 1
+    hub_outbox.put(websocket, "primary_target", primary_target)
 
 
-async def send_servo_angles(websocket, x_angle, y_angle):
+def send_servo_angles(websocket, x_angle, y_angle):
     """
     Send the servo angles to the central hub.
     """
-    await messages.send_update_state(
-        websocket, {"servo_angles": {"pan": x_angle, "tilt": y_angle}}
-    )
+    hub_outbox.put(websocket, "servo_angles", {"pan": x_angle, "tilt": y_angle})
+
+
+def send_daphbot_metrics(websocket, metrics):
+    """
+    Send daphbot_service metrics to the central hub.
+    """
+    hub_outbox.put(websocket, "daphbot_metrics", metrics)
+
+
+def send_onboard_ui_metrics(websocket, metrics):
+    """
+    Send onboard_ui metrics, e.g. telepresence audio, to the central hub.
+    """
+    hub_outbox.put(websocket, "onboard_ui_metrics", metrics)
+
+
+def send_recording_session(websocket, session):
+    """
+    Send the current (or just closed) recording session to the central hub.
+    """
+    hub_outbox.put(websocket, "recording_session", session)
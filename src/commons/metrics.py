@@ -0,0 +1,102 @@
+"""
+Fixed memory latency histograms for hot path instrumentation.
+
+Each histogram has a fixed set of log spaced buckets (20 per decade from
+10us to 10s) so recording a sample is a bisect and an increment, memory
+never grows and percentiles are accurate to about 12%.
+
+Usage:
+```python
+from commons.metrics import metrics
+
+started_at = time.time()
+...
+metrics.record("selection", time.time() - started_at)
+...
+await messages.send_update_state(websocket, {"daphbot_metrics": metrics.snapshot()})
+```
+"""
+import bisect
+
+import numpy as np
+
+MIN_SECONDS = 1e-5
+MAX_SECONDS = 10.0
+BUCKETS_PER_DECADE = 20
+
+
+class LatencyHistogram:
+    edges = list(
+        np.logspace(
+            np.log10(MIN_SECONDS),
+            np.log10(MAX_SECONDS),
+            int(np.log10(MAX_SECONDS / MIN_SECONDS) * BUCKETS_PER_DECADE) + 1,
+        )
+    )
+
+    def __init__(self):
+        # counts[i] is the number of samples <= edges[i]; the last bucket
+        # is everything larger than MAX_SECONDS
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        self.counts[:] = 0
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(self.edges, seconds)] += 1
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent):
+        """Returns the upper bound, in seconds, of the given percentile."""
+        if self.count == 0:
+            return 0.0
+        rank = percent / 100 * self.count
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        if index >= len(self.edges):
+            return self.max
+        return min(self.edges[index], self.max)
+
+    def snapshot(self):
+        """Summary in milliseconds"""
+        return {
+            "count": self.count,
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p95_ms": round(self.percentile(95) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        # samples are recorded from other threads, e.g. the audio callback,
+        # which must never wait on the event loop, so there is no lock:
+        # snapshot() iterates a copy of the dict and resets by replacing it
+        self.histograms = {}
+
+    def record(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def snapshot(self, reset=False):
+        """
+        Returns {name: {count, p50_ms, p95_ms, p99_ms, max_ms}} for each
+        histogram and optionally starts a new window.
+        """
+        histograms = list(self.histograms.items())
+        if reset:
+            # a sample recorded into an old histogram while this runs may
+            # be missed; the new ones are allocated here, not in record()
+            self.histograms = {name: LatencyHistogram() for name, _h in histograms}
+        return {name: histogram.snapshot() for name, histogram in histograms}
+
+
+# process wide metrics
+metrics = Metrics()
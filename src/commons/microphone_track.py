@@ -0,0 +1,177 @@
+"""
+The robot's microphone as an aiortc audio track, so that the remote user
+of two way telepresence can hear the room.
+
+Audio is captured by a sounddevice InputStream whose callback, on
+PortAudio's thread, copies each block into a preallocated
+AudioRingBuffer (commons/audio_ring_buffer.py).  Nothing blocks the
+event loop: recv() awaits an asyncio.Event that the callback sets, via
+call_soon_threadsafe, only when recv() is waiting and a packet's worth
+of audio is buffered.
+
+Packets are 20ms of 48kHz mono, Opus' native rate and packet time, and
+are read from the ring directly into the buffer of one of a small pool
+of reused av.AudioFrames, so no audio buffers are allocated per packet.
+If recv() falls behind (e.g. the event loop was busy), the oldest
+buffered audio beyond MAX_LATENCY_SECONDS is skipped rather than sent
+late.
+"""
+import asyncio
+import fractions
+
+import av
+import numpy as np
+from aiortc import MediaStreamTrack
+from aiortc.mediastreams import MediaStreamError
+
+from basic_bot.commons import log, constants as c
+from commons.audio_ring_buffer import AudioRingBuffer
+
+# sounddevice won't work in CI/CD pipeline where there is no audio hardware
+if c.BB_ENV != "test":
+    import sounddevice as sd
+else:
+    log.info("Running in BB_ENV='test', stubbing out sounddevice for microphone")
+
+    class SoundDeviceMock:
+        class InputStream:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def start(self):
+                pass
+
+            def stop(self):
+                pass
+
+            def close(self):
+                pass
+
+    sd = SoundDeviceMock()
+
+
+SAMPLE_RATE = 48000
+CHANNELS = 1
+PACKET_SECONDS = 0.02
+BUFFER_SECONDS = 0.5
+MAX_LATENCY_SECONDS = 0.1
+# the track is relayed to every connected browser (see
+# commons/webrtc_server.py), and each sender encodes a frame on a worker
+# thread while the relay reads the next ones; a frame is reused after
+# FRAME_POOL_SIZE packets (80ms), long after its encode has finished
+FRAME_POOL_SIZE = 4
+
+
+class MicrophoneTrack(MediaStreamTrack):
+    kind = "audio"
+
+    def __init__(self, device=None):
+        """
+        Opens and starts capturing from the input device.
+
+        Args:
+            device: sounddevice input device name or index; None for the
+                default input device
+        """
+        super().__init__()
+        self.samples_per_packet = int(SAMPLE_RATE * PACKET_SECONDS)
+        self.max_latency_frames = int(SAMPLE_RATE * MAX_LATENCY_SECONDS)
+        self.ring = AudioRingBuffer(
+            int(SAMPLE_RATE * BUFFER_SECONDS), CHANNELS, prefill=self.samples_per_packet
+        )
+
+        self.frames = []
+        self.frame_samples = []
+        for _ in range(FRAME_POOL_SIZE):
+            frame = av.AudioFrame(
+                format="s16", layout="mono", samples=self.samples_per_packet
+            )
+            frame.sample_rate = SAMPLE_RATE
+            frame.time_base = fractions.Fraction(1, SAMPLE_RATE)
+            self.frames.append(frame)
+            # writable view of the frame's own buffer
+            samples = np.frombuffer(frame.planes[0], dtype=np.int16)
+            self.frame_samples.append(
+                samples[: self.samples_per_packet * CHANNELS].reshape(-1, CHANNELS)
+            )
+        self.frame_index = 0
+        self.pts = 0
+
+        # bound to the event loop on the first recv()
+        self.loop = None
+        self.data_ready = None
+        self.waiting = False
+
+        self.packets_sent = 0
+        self.skipped_frames = 0
+        self.status_count = 0
+
+        self.stream = sd.InputStream(
+            samplerate=SAMPLE_RATE,
+            channels=CHANNELS,
+            dtype=np.int16,
+            blocksize=self.samples_per_packet,
+            latency="low",
+            device=device,
+            callback=self.callback,
+        )
+        self.stream.start()
+        log.info(f"microphone track started: {device or 'default input device'}")
+
+    def callback(self, indata, frames, time_info, status):
+        """sounddevice callback, on PortAudio's thread"""
+        if status:
+            self.status_count += 1
+        self.ring.write(indata)
+        if self.waiting and self.ring.available() >= self.samples_per_packet:
+            self.waiting = False
+            self.loop.call_soon_threadsafe(self.data_ready.set)
+
+    async def recv(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+            self.data_ready = asyncio.Event()
+
+        ring = self.ring
+        while ring.available() < self.samples_per_packet:
+            self.data_ready.clear()
+            self.waiting = True
+            # the callback may have written since the check above
+            if ring.available() >= self.samples_per_packet:
+                self.waiting = False
+                break
+            await self.data_ready.wait()
+            if self.readyState != "live":
+                raise MediaStreamError
+
+        excess = ring.available() - self.max_latency_frames
+        if excess > 0:
+            self.skipped_frames += ring.skip(excess)
+
+        self.frame_index = (self.frame_index + 1) % FRAME_POOL_SIZE
+        ring.read_into(self.frame_samples[self.frame_index])
+        frame = self.frames[self.frame_index]
+        frame.pts = self.pts
+        self.pts += self.samples_per_packet
+        self.packets_sent += 1
+        return frame
+
+    def stop(self):
+        if self.readyState == "live":
+            self.stream.stop()
+            self.stream.close()
+            log.info(f"microphone track stopped: {self.get_stats()}")
+        super().stop()
+        # wake up recv() so that it raises MediaStreamError
+        if self.data_ready is not None:
+            self.data_ready.set()
+
+    def get_stats(self):
+        return {
+            "packets_sent": self.packets_sent,
+            "skipped_frames": self.skipped_frames,
+            "status_errors": self.status_count,
+            "overruns": self.ring.overruns,
+        }
@@ -0,0 +1,81 @@
+"""
+Closed loop pan / tilt controller used to center the primary target.
+
+Each axis is a PID controller working in degrees.  The error is how far
+the (predicted) target is from the center of the view and the output is
+how far to move the servo.  Errors inside the deadband produce no move and
+don't accumulate in the integral term.  The integral term is clamped and
+is not accumulated while the output is saturated (anti-windup).
+"""
+from commons import constants as d2c
+
+
+class PIDController:
+    def __init__(
+        self,
+        kp=d2c.D2_TRACK_KP,
+        ki=d2c.D2_TRACK_KI,
+        kd=d2c.D2_TRACK_KD,
+        deadband=d2c.D2_TRACK_DEADBAND_DEGREES,
+        integral_limit=d2c.D2_TRACK_INTEGRAL_LIMIT,
+        output_limit=d2c.D2_TRACK_MAX_STEP_DEGREES,
+    ):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.deadband = deadband
+        self.integral_limit = integral_limit
+        self.output_limit = output_limit
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.last_error = None
+
+    def update(self, error, dt):
+        """Returns the output (degrees to move) for error (degrees)."""
+        if abs(error) <= self.deadband:
+            self.last_error = error
+            return 0.0
+
+        derivative = 0.0
+        if self.last_error is not None and dt > 0:
+            derivative = (error - self.last_error) / dt
+        self.last_error = error
+
+        integral = self.integral + error * dt
+        integral = max(-self.integral_limit, min(self.integral_limit, integral))
+
+        output = self.kp * error + self.ki * integral + self.kd * derivative
+        clamped = max(-self.output_limit, min(self.output_limit, output))
+        # only integrate while not saturated, otherwise the integral keeps
+        # growing and overshoots once the target is reached
+        if clamped == output:
+            self.integral = integral
+        return clamped
+
+
+class PanTiltController:
+    def __init__(self, **pid_kwargs):
+        self.pan = PIDController(**pid_kwargs)
+        self.tilt = PIDController(**pid_kwargs)
+        self.last_update_at = None
+        self.track_id = None
+
+    def reset(self):
+        self.pan.reset()
+        self.tilt.reset()
+        self.last_update_at = None
+
+    def update(self, pan_error, tilt_error, now, track_id=None):
+        """
+        Returns the (pan, tilt) degrees to move for the given errors in
+        degrees.  Switching to another track resets the controller.
+        """
+        if track_id != self.track_id:
+            self.reset()
+            self.track_id = track_id
+
+        dt = 0.0 if self.last_update_at is None else now - self.last_update_at
+        self.last_update_at = now
+        return self.pan.update(pan_error, dt), self.tilt.update(tilt_error, dt)
@@ -0,0 +1,154 @@
+"""
+Recording sessions for video of the targets daphbot sees.
+
+The vision service only records fixed length videos (`record_video`
+requests).  Instead of one request per sighting, a session is opened the
+first time a target is seen and kept open while targets stay in view.
+Segments are requested back to back, each one at the end of the previous
+one, so a cat that stays for two minutes is one session of contiguous
+segments instead of many 10 second videos with gaps between them.
+
+At the end of each segment the session is either chained into another
+segment, if a target was seen within the last `tail_seconds`, or closed.
+Sessions are also closed after `max_session_seconds`.
+
+Session metadata looks like:
+```
+{
+    "started_at": 1718000000.12,
+    "ended_at": 1718000030.12,    # None while open
+    "classes": ["cat", "person"], # in the order first seen
+    "segments": 3,
+}
+```
+"""
+import asyncio
+import json
+import os
+import time
+
+from basic_bot.commons import log
+
+from commons import constants as d2c
+
+
+class RecordingSessionManager:
+    def __init__(
+        self,
+        send_request,
+        segment_seconds=d2c.D2_RECORDING_SEGMENT_SECONDS,
+        tail_seconds=d2c.D2_RECORDING_TAIL_SECONDS,
+        max_session_seconds=d2c.D2_RECORDING_MAX_SESSION_SECONDS,
+        sessions_file=None,
+        on_change=None,
+    ):
+        """
+        Args:
+            send_request: blocking function called with a duration in seconds
+                to have the vision service record a video; it is called
+                from the event loop's default executor
+            sessions_file: optional path to append closed sessions to as
+                JSON lines
+            on_change: optional function called (on the event loop) with a
+                copy of the session metadata when a session is opened, sees
+                a new class or is closed
+        """
+        self.send_request = send_request
+        self.segment_seconds = segment_seconds
+        self.tail_seconds = tail_seconds
+        self.max_session_seconds = max_session_seconds
+        self.sessions_file = sessions_file
+        self.on_change = on_change
+
+        self.session = None
+        self.last_seen_at = 0.0
+        self.segment_ends_at = 0.0
+        self.task = None
+
+        self.session_count = 0
+        self.segment_count = 0
+
+    def target_seen(self, target, now=None):
+        """
+        Called from the event loop each time a target is acted on.  Opens
+        a session if one isn't open; otherwise just notes the sighting.
+        """
+        self.last_seen_at = time.time() if now is None else now
+        if self.session is None:
+            self.open()
+
+        classification = target["classification"] if target else None
+        if classification and classification not in self.session["classes"]:
+            self.session["classes"].append(classification)
+            self.notify()
+
+    def open(self):
+        self.session = {
+            "started_at": self.last_seen_at,
+            "ended_at": None,
+            "classes": [],
+            "segments": 0,
+        }
+        self.session_count += 1
+        self.segment_ends_at = self.last_seen_at
+        log.info("recording session opened")
+        self.task = asyncio.create_task(self.run())
+        self.notify()
+
+    async def run(self):
+        session = self.session
+        try:
+            while True:
+                await self.request_segment()
+                # sleep until the end of the segment rather than for its
+                # duration so that time spent sending doesn't add up
+                await asyncio.sleep(max(0, self.segment_ends_at - time.time()))
+                if not self.should_chain():
+                    break
+        finally:
+            self.close(session)
+
+    async def request_segment(self):
+        self.segment_ends_at += self.segment_seconds
+        self.session["segments"] += 1
+        self.segment_count += 1
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.send_request, self.segment_seconds
+            )
+        except Exception as e:
+            log.error(f"error requesting video recording: {e}")
+
+    def should_chain(self):
+        return (
+            self.segment_ends_at - self.last_seen_at <= self.tail_seconds
+            and self.session["segments"] * self.segment_seconds
+            < self.max_session_seconds
+        )
+
+    def close(self, session):
+        session["ended_at"] = min(self.segment_ends_at, time.time())
+        self.session = None
+        log.info(f"recording session closed: {session}")
+        self.save(session)
+        self.notify(session)
+
+    def save(self, session):
+        if not self.sessions_file:
+            return
+        try:
+            directory = os.path.dirname(self.sessions_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.sessions_file, "a") as f:
+                f.write(json.dumps(session) + "\n")
+        except OSError as e:
+            log.error(f"error saving recording session: {e}")
+
+    def notify(self, session=None):
+        session = session or self.session
+        if self.on_change and session:
+            self.on_change(dict(session, classes=list(session["classes"])))
+
+    def get_stats(self):
+        return {"sessions": self.session_count, "segments": self.segment_count}
@@ -0,0 +1,136 @@
+"""
+Fixed rate servo command scheduler.
+
+The scheduler owns the pan / tilt setpoint.  Behaviors (tracking,
+auto-centering, dances, ...) only set a goal with `set_goal()`; a single
+task moves the setpoint toward the goal at D2_SERVO_CONTROL_HZ, limiting
+how far it can move each tick to D2_SERVO_MAX_SLEW_DPS and clamping it to
+the servo ranges in the servo_config hub state.  servo_angles is only sent
+to central_hub when the (rounded) setpoint changes.
+"""
+import asyncio
+import time
+
+from basic_bot.commons import log
+from commons import constants as d2c
+from commons.messages import send_servo_angles
+from commons.metrics import metrics
+
+# servo_angles are rounded to this many decimal places before comparing
+ANGLE_PRECISION = 1
+
+DEFAULT_MIN_ANGLE = 0
+DEFAULT_MOTOR_RANGE = 180
+
+
+class ServoScheduler:
+    def __init__(
+        self,
+        hub_state,
+        control_hz=d2c.D2_SERVO_CONTROL_HZ,
+        max_slew_dps=d2c.D2_SERVO_MAX_SLEW_DPS,
+        on_send=None,
+    ):
+        """
+        Args:
+            hub_state: the service's HubState; used for servo_config and
+                servo_actual_angles
+            on_send: optional function called with (pan, tilt) each time
+                servo_angles is sent
+        """
+        self.hub_state = hub_state
+        self.interval = 1 / control_hz
+        self.max_step = max_slew_dps / control_hz
+        self.on_send = on_send
+
+        self.websocket = None
+        self.goal = None
+        # time.time() of the recognition that led to the current goal
+        self.goal_requested_at = None
+        self.setpoint = None
+        self.sent_count = 0
+        self.task = None
+
+    def set_goal(self, pan, tilt, requested_at=None):
+        """
+        Request the servos to move to pan, tilt.  Replaces any previous goal.
+        Must be called from the event loop.
+
+        requested_at is the time.time() of the event (e.g. recognition) that
+        led to this goal; it is used to measure end to end latency.
+        """
+        self.goal_requested_at = requested_at
+        self.goal = (
+            self.clamp("pan", pan),
+            self.clamp("tilt", tilt),
+        )
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def reset(self):
+        """
+        Forget the goal and setpoint, e.g. when something else (manual mode)
+        has been moving the servos.
+        """
+        self.goal = None
+        self.goal_requested_at = None
+        self.setpoint = None
+
+    def servo_limits(self, name):
+        """Returns (min_angle, max_angle) of the named servo."""
+        servo_config = self.hub_state.state.get("servo_config") or {}
+        servos = (
+            servo_config.get("servos", [])
+            if isinstance(servo_config, dict)
+            else servo_config
+        )
+        for servo in servos:
+            if servo.get("name") == name:
+                max_angle = servo.get(
+                    "max_angle", servo.get("motor_range", DEFAULT_MOTOR_RANGE)
+                )
+                return servo.get("min_angle", DEFAULT_MIN_ANGLE), max_angle
+        return DEFAULT_MIN_ANGLE, DEFAULT_MOTOR_RANGE
+
+    def clamp(self, name, angle):
+        min_angle, max_angle = self.servo_limits(name)
+        return max(min_angle, min(max_angle, angle))
+
+    def next_setpoint(self):
+        if self.setpoint is None:
+            actual = self.hub_state.state.get("servo_actual_angles")
+            if not actual:
+                # nothing to slew from; go straight to the goal
+                return self.goal
+            self.setpoint = (actual["pan"], actual["tilt"])
+
+        return tuple(
+            current + max(-self.max_step, min(self.max_step, goal - current))
+            for current, goal in zip(self.setpoint, self.goal)
+        )
+
+    async def run(self):
+        while True:
+            if self.goal is not None and self.websocket is not None:
+                previous = self.setpoint
+                pan, tilt = self.next_setpoint()
+                self.setpoint = (pan, tilt)
+                rounded = (round(pan, ANGLE_PRECISION), round(tilt, ANGLE_PRECISION))
+                if previous is None or rounded != (
+                    round(previous[0], ANGLE_PRECISION),
+                    round(previous[1], ANGLE_PRECISION),
+                ):
+                    try:
+                        send_servo_angles(self.websocket, *rounded)
+                        self.sent_count += 1
+                        if self.goal_requested_at is not None:
+                            metrics.record(
+                                "recognition_to_servo_angles",
+                                time.time() - self.goal_requested_at,
+                            )
+                            self.goal_requested_at = None
+                        if self.on_send:
+                            self.on_send(*rounded)
+                    except Exception as e:
+                        log.error(f"error sending servo angles: {e}")
+            await asyncio.sleep(self.interval)
@@ -1,7 +1,11 @@
+import hashlib
 import os
 
+import numpy as np
 
 from basic_bot.commons import log, constants as c
+from commons import constants as d2c
+from commons.audio_mixer import mixer
 
 # these won't work in CI/CD pipeline where there is no sound device
 # hardware to play or record audio
@@ -12,9 +16,6 @@ else:
     log.info("Running in BB_ENV='test', stubbing out sounddevice and pydub")
 
     class SoundDeviceMock:
-        def play(self, *args, **kwargs):
-            pass
-
         def rec(self, *args, **kwargs):
             pass
 
@@ -43,15 +44,97 @@ OFF_MESSAGE_FILE = os.path.join(MEDIA_PATH, "woff_message.mp3")
 GOOD_MESSAGE_FILE = os.path.join(MEDIA_PATH, "good_message.mp3")
 
 
+SOUND_FILE_EXTENSIONS = (".mp3", ".wav")
+CHANNELS = 1
+
+
+class SoundBank:
+    """
+    Sounds decoded once into ready to play int16 buffers of shape
+    (frames, CHANNELS) at the audio mixer's sample rate, so playing one
+    is a memory copy instead of an ffmpeg decode.
+
+    Decoded buffers are also cached on disk in cache_dir, keyed by a hash
+    of the sound file's contents, the sample rate and the channel count,
+    so that restarts skip decoding too.  Changing a sound file changes its
+    hash; stale cache files are simply never read again.
+    """
+
+    def __init__(self, media_path=MEDIA_PATH, cache_dir=None, sample_rate=None):
+        self.media_path = media_path
+        self.cache_dir = cache_dir
+        self.sample_rate = sample_rate or mixer.sample_rate
+        # file path -> np.ndarray
+        self.sounds = {}
+
+    def load(self):
+        """Decode (or load from cache) every sound file in media_path."""
+        for file_name in sorted(os.listdir(self.media_path)):
+            if file_name.endswith(SOUND_FILE_EXTENSIONS):
+                self.get(os.path.join(self.media_path, file_name))
+        log.info(f"loaded {len(self.sounds)} sounds at {self.sample_rate}Hz")
+
+    def get(self, file_path):
+        """Returns the buffer for file_path, decoding it if not loaded."""
+        samples = self.sounds.get(file_path)
+        if samples is None:
+            samples = self.sounds[file_path] = self.load_file(file_path)
+        return samples
+
+    def load_file(self, file_path):
+        cache_path = self.cache_path(file_path) if self.cache_dir else None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                return np.load(cache_path)
+            except (OSError, ValueError) as e:
+                log.error(f"ignoring unreadable sound cache {cache_path}: {e}")
+
+        samples = self.decode(file_path)
+        if cache_path:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.save(cache_path, samples)
+            except OSError as e:
+                log.error(f"error caching {file_path}: {e}")
+        return samples
+
+    def cache_path(self, file_path):
+        with open(file_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:32]
+        return os.path.join(
+            self.cache_dir, f"{digest}_{self.sample_rate}_{CHANNELS}.npy"
+        )
+
+    def decode(self, file_path):
+        log.info(f"decoding {file_path}")
+        sound = (
+            pydub.AudioSegment.from_file(file_path)
+            .set_frame_rate(self.sample_rate)
+            .set_channels(CHANNELS)
+            .set_sample_width(2)
+        )
+        samples = np.array(sound.get_array_of_samples(), dtype=np.int16)
+        return samples.reshape(-1, CHANNELS)
+
+    def play(self, file_path, gain=1.0):
+        """
+        Plays file_path on the audio mixer, ducking any other sounds (e.g.
+        telepresence audio) while it plays.  Returns the mixer source.
+        """
+        return mixer.play(
+            self.get(file_path), gain=gain, ducks_others=True, name=file_path
+        )
+
+
+sound_bank = SoundBank(cache_dir=d2c.D2_SOUND_CACHE_DIR or None)
+
+
 def play_mp3_file(file_path):
-    # Play the MP3 file
     log.info(f"Playing {file_path}")
-    sound = pydub.AudioSegment.from_mp3(file_path)
-    sd.play(sound.get_array_of_samples(), FREQ)
 
-    # return sd object so that we can wait for it to finish
-    # ex.  play_mp3_file().wait()
-    return sd
+    # return the mixer source so that we can wait for it to finish or
+    # cancel it, ex.  play_mp3_file().wait()
+    return sound_bank.play(file_path)
 
 
 def play_off_message():
@@ -0,0 +1,136 @@
+"""
+Vectorized scoring of recognized objects for primary target selection.
+
+All detections in a recognition update are scored in one batch with NumPy.
+The score of each detection is
+
+    class_weight * (
+        area_weight * area / frame_area
+        + confidence_weight * confidence
+        + center_weight * (1 - center_distance / max_center_distance)
+        + persistence_weight * persistence
+    )
+
+where persistence is 1 for a detection with the same `track_id` as the
+previous primary target or, for untracked detections, its IoU with the
+previous primary target's bounding box.
+
+Bounding boxes are `[left, top, right, bottom]` in vision pixels.
+"""
+import numpy as np
+
+from basic_bot.commons import constants as c
+from commons import constants as d2c
+
+
+def parse_class_weights(class_weights_str):
+    """Parse "cat:1.0,dog:1.0" into {"cat": 1.0, "dog": 1.0}"""
+    class_weights = {}
+    for pair in class_weights_str.split(","):
+        if not pair.strip():
+            continue
+        label, weight = pair.split(":")
+        class_weights[label.strip()] = float(weight)
+    return class_weights
+
+
+def bounding_box_ious(boxes, box):
+    """IoU of each of an (n, 4) array of boxes with a single box."""
+    left = np.maximum(boxes[:, 0], box[0])
+    top = np.maximum(boxes[:, 1], box[1])
+    right = np.minimum(boxes[:, 2], box[2])
+    bottom = np.minimum(boxes[:, 3], box[3])
+    intersection = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    box_area = (box[2] - box[0]) * (box[3] - box[1])
+    union = areas + box_area - intersection
+    return np.divide(
+        intersection, union, out=np.zeros_like(intersection), where=union > 0
+    )
+
+
+class TargetScorer:
+    def __init__(
+        self,
+        class_weights=None,
+        area_weight=d2c.D2_TARGET_AREA_WEIGHT,
+        confidence_weight=d2c.D2_TARGET_CONFIDENCE_WEIGHT,
+        center_weight=d2c.D2_TARGET_CENTER_WEIGHT,
+        persistence_weight=d2c.D2_TARGET_PERSISTENCE_WEIGHT,
+        frame_size=(c.BB_VISION_WIDTH, c.BB_VISION_HEIGHT),
+    ):
+        self.class_weights = (
+            class_weights
+            if class_weights is not None
+            else parse_class_weights(d2c.D2_TARGET_CLASS_WEIGHTS)
+        )
+        self.area_weight = area_weight
+        self.confidence_weight = confidence_weight
+        self.center_weight = center_weight
+        self.persistence_weight = persistence_weight
+
+        width, height = frame_size
+        self.frame_area = float(width * height)
+        self.frame_center = np.array([width / 2, height / 2])
+        self.max_center_distance = float(np.hypot(width / 2, height / 2))
+
+    def score(self, recognitions, previous_target=None):
+        """
+        Returns an array with the score of each recognition.  Recognitions
+        that can never be a primary target score -inf.
+        """
+        count = len(recognitions)
+        if count == 0:
+            return np.empty(0)
+
+        class_weights = np.fromiter(
+            (self.class_weights.get(r["classification"], 0.0) for r in recognitions),
+            dtype=float,
+            count=count,
+        )
+        confidences = np.fromiter(
+            (r.get("confidence", 0.0) for r in recognitions), dtype=float, count=count
+        )
+        boxes = np.array([r["bounding_box"] for r in recognitions], dtype=float)
+
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        center_distances = np.hypot(*(centers - self.frame_center).T)
+
+        scores = (
+            self.area_weight * areas / self.frame_area
+            + self.confidence_weight * confidences
+            + self.center_weight * (1 - center_distances / self.max_center_distance)
+        )
+        if previous_target is not None and self.persistence_weight:
+            scores += self.persistence_weight * self.persistence(
+                recognitions, boxes, previous_target
+            )
+
+        scores *= class_weights
+        scores[class_weights <= 0] = -np.inf
+        return scores
+
+    def persistence(self, recognitions, boxes, previous_target):
+        track_id = previous_target.get("track_id")
+        if track_id is not None:
+            return np.fromiter(
+                (r.get("track_id") == track_id for r in recognitions),
+                dtype=float,
+                count=len(recognitions),
+            )
+        return bounding_box_ious(boxes, previous_target["bounding_box"])
+
+    def rank(self, recognitions, previous_target=None):
+        """
+        Returns (best, ranked) where best is the highest scoring recognition
+        or None and ranked is the list of eligible recognitions ordered from
+        highest to lowest score.
+        """
+        scores = self.score(recognitions, previous_target)
+        if len(scores) == 0:
+            return None, []
+
+        order = np.argsort(-scores, kind="stable")
+        ranked = [recognitions[i] for i in order if np.isfinite(scores[i])]
+        return (ranked[0] if ranked else None), ranked
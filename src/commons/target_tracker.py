@@ -0,0 +1,261 @@
+"""
+SORT style multi-object tracker that provides the primary target.
+
+Each recognition update, the tracker:
+
+1. predicts where each existing track should be now using a constant
+   velocity Kalman filter on the track's center and size
+2. associates detections with tracks of the same classification by IoU
+   using the Hungarian algorithm (scipy.optimize.linear_sum_assignment)
+3. corrects matched tracks, starts new tracks for unmatched detections and
+   drops tracks that have not been seen for more than `max_misses` updates
+4. picks the primary target from the tracks seen this update with the
+   TargetScorer.  Once a primary track is chosen, another track only takes
+   over if it outscores the current one by `switch_margin` for
+   `switch_frames` consecutive updates, or if the current one is dropped.
+   Until then, a primary track that was not seen this update stays the
+   primary target at its predicted position, so one missed detection
+   doesn't hand the primary target to a similar object.
+
+The primary target is a recognition dict extended with the track's
+persistent `track_id`, its `age` in seconds and its `velocity` ([vx, vy]
+in pixels per second):
+```json
+{
+    "classification": "cat",
+    "bounding_box": [1, 22, 200, 330],
+    "confidence": 0.99,
+    "track_id": 12,
+    "age": 3.2,
+    "velocity": [-40.5, 2.1]
+}
+```
+"""
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from commons import constants as d2c
+from commons.target_scoring import TargetScorer, bounding_box_ious
+
+# standard deviation of the measured center and size, in pixels
+MEASUREMENT_STD = 2.0
+# standard deviation of a target's acceleration, in pixels / s^2
+ACCELERATION_STD = 400.0
+# standard deviation of the change in a target's size, in pixels / s
+SIZE_CHANGE_STD = 50.0
+# standard deviation of the velocity of a newly seen target, in pixels / s
+INITIAL_VELOCITY_STD = 300.0
+
+# measurement matrix: we observe [cx, cy, w, h] of state [cx, cy, w, h, vx, vy]
+H = np.hstack([np.eye(4), np.zeros((4, 2))])
+R = np.eye(4) * MEASUREMENT_STD**2
+
+
+def box_to_measurement(bounding_box):
+    left, top, right, bottom = bounding_box
+    return np.array(
+        [(left + right) / 2, (top + bottom) / 2, right - left, bottom - top],
+        dtype=float,
+    )
+
+
+class Track:
+    def __init__(self, track_id, recognition, now):
+        self.track_id = track_id
+        self.classification = recognition["classification"]
+        self.recognition = recognition
+        self.created_at = now
+        self.updated_at = now
+        self.hits = 1
+        # number of updates since this track was last matched to a detection
+        self.misses = 0
+
+        self.x = np.zeros(6)
+        self.x[:4] = box_to_measurement(recognition["bounding_box"])
+        self.P = np.diag(
+            [MEASUREMENT_STD**2] * 4 + [INITIAL_VELOCITY_STD**2] * 2
+        )
+        self.predicted_x = self.x
+        self.predicted_P = self.P
+
+    def predict(self, now):
+        dt = max(now - self.updated_at, 0.0)
+        F = np.eye(6)
+        F[0, 4] = F[1, 5] = dt
+
+        Q = np.zeros((6, 6))
+        q = ACCELERATION_STD**2
+        for pos, vel in ((0, 4), (1, 5)):
+            Q[pos, pos] = q * dt**4 / 4
+            Q[pos, vel] = Q[vel, pos] = q * dt**3 / 2
+            Q[vel, vel] = q * dt**2
+        Q[2, 2] = Q[3, 3] = SIZE_CHANGE_STD**2 * dt
+
+        self.predicted_x = F @ self.x
+        self.predicted_P = F @ self.P @ F.T + Q
+
+    def predicted_box(self):
+        cx, cy, w, h = self.predicted_x[:4]
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+    def update(self, recognition, now):
+        z = box_to_measurement(recognition["bounding_box"])
+        y = z - H @ self.predicted_x
+        S = H @ self.predicted_P @ H.T + R
+        K = self.predicted_P @ H.T @ np.linalg.inv(S)
+        self.x = self.predicted_x + K @ y
+        self.P = (np.eye(6) - K @ H) @ self.predicted_P
+
+        self.recognition = recognition
+        self.updated_at = now
+        self.hits += 1
+        self.misses = 0
+
+    def miss(self):
+        self.misses += 1
+
+    def to_target(self, now):
+        target = {**self.recognition}
+        if self.misses:
+            # not seen this update; where the filter thinks it is now
+            target["bounding_box"] = [round(float(v)) for v in self.predicted_box()]
+        return {
+            **target,
+            "track_id": self.track_id,
+            "age": round(now - self.created_at, 2),
+            "velocity": [round(float(v), 1) for v in self.x[4:6]],
+        }
+
+
+class TargetTracker:
+    def __init__(
+        self,
+        scorer=None,
+        iou_threshold=d2c.D2_TRACKER_IOU_THRESHOLD,
+        max_misses=d2c.D2_TRACKER_MAX_MISSES,
+        min_hits=d2c.D2_TRACKER_MIN_HITS,
+        switch_margin=d2c.D2_TARGET_SWITCH_MARGIN,
+        switch_frames=d2c.D2_TARGET_SWITCH_FRAMES,
+    ):
+        self.scorer = scorer or TargetScorer()
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.min_hits = min_hits
+        self.switch_margin = switch_margin
+        self.switch_frames = switch_frames
+
+        self.tracks = []
+        self.next_track_id = 1
+        self.primary_track_id = None
+        # number of consecutive updates a challenger has outscored the primary
+        self.challenger_track_id = None
+        self.challenger_frames = 0
+        # number of times the primary track has changed to another track
+        self.switch_count = 0
+
+    def update(self, recognitions, now=None):
+        """
+        Update the tracks with a list of recognized objects and return the
+        primary target or None.
+        """
+        now = time.time() if now is None else now
+
+        for track in self.tracks:
+            track.predict(now)
+
+        unmatched = self.associate(recognitions, now)
+        for index in unmatched:
+            self.tracks.append(Track(self.next_track_id, recognitions[index], now))
+            self.next_track_id += 1
+
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        return self.select_primary(now)
+
+    def associate(self, recognitions, now):
+        """
+        Match recognitions to tracks, updating matched tracks.  Returns the
+        indexes of recognitions that did not match any track.
+        """
+        if not self.tracks or not recognitions:
+            for track in self.tracks:
+                track.miss()
+            return list(range(len(recognitions)))
+
+        boxes = np.array([r["bounding_box"] for r in recognitions], dtype=float)
+        ious = np.zeros((len(self.tracks), len(recognitions)))
+        for row, track in enumerate(self.tracks):
+            ious[row] = bounding_box_ious(boxes, track.predicted_box())
+            for col, recognition in enumerate(recognitions):
+                if recognition["classification"] != track.classification:
+                    ious[row, col] = 0
+
+        rows, cols = linear_sum_assignment(-ious)
+        matched_tracks = set()
+        matched_recognitions = set()
+        for row, col in zip(rows, cols):
+            if ious[row, col] >= self.iou_threshold:
+                self.tracks[row].update(recognitions[col], now)
+                matched_tracks.add(row)
+                matched_recognitions.add(col)
+
+        for row, track in enumerate(self.tracks):
+            if row not in matched_tracks:
+                track.miss()
+
+        return [i for i in range(len(recognitions)) if i not in matched_recognitions]
+
+    def select_primary(self, now):
+        # the primary track stays a candidate while it is missed, until it is
+        # dropped after max_misses updates
+        candidates = [
+            t
+            for t in self.tracks
+            if t.hits >= self.min_hits
+            and (t.misses == 0 or t.track_id == self.primary_track_id)
+        ]
+        targets = [t.to_target(now) for t in candidates]
+        # stickiness comes from the hysteresis below rather than from the
+        # scorer's persistence term
+        scores = self.scorer.score(targets)
+        eligible = [i for i in range(len(targets)) if np.isfinite(scores[i])]
+        if not eligible:
+            self.set_primary(None)
+            return None
+
+        best = max(eligible, key=lambda i: scores[i])
+        current = next(
+            (i for i in eligible if candidates[i].track_id == self.primary_track_id),
+            None,
+        )
+        if current is None or current == best:
+            self.challenger_track_id = None
+            self.challenger_frames = 0
+            self.set_primary(candidates[best].track_id)
+            return targets[best]
+
+        # hysteresis: only switch away from a primary target that is still
+        # in view once another target has clearly beaten it for a while
+        if scores[best] - scores[current] > self.switch_margin:
+            if self.challenger_track_id == candidates[best].track_id:
+                self.challenger_frames += 1
+            else:
+                self.challenger_track_id = candidates[best].track_id
+                self.challenger_frames = 1
+            if self.challenger_frames >= self.switch_frames:
+                self.challenger_track_id = None
+                self.challenger_frames = 0
+                self.set_primary(candidates[best].track_id)
+                return targets[best]
+        else:
+            self.challenger_track_id = None
+            self.challenger_frames = 0
+
+        return targets[current]
+
+    def set_primary(self, track_id):
+        if track_id != self.primary_track_id:
+            if self.primary_track_id is not None and track_id is not None:
+                self.switch_count += 1
+            self.primary_track_id = track_id
@@ -0,0 +1,62 @@
+"""
+One shot timers for time based behaviors.
+
+A Timer is scheduled with the event loop's `call_later`, which keeps due
+callbacks in a heap, so nothing is polled: a timer costs nothing until
+it is due and fires when it is due whether or not any hub messages are
+arriving.
+
+For deadlines that move often (e.g. "N seconds after the target was last
+seen") don't re-arm the timer on every change; let it fire at the old
+deadline and re-arm it then if the deadline has moved.  See
+BehaviorEngine.auto_center_due() in commons/behavior.py.
+"""
+import asyncio
+import time
+
+from basic_bot.commons import log
+
+
+class Timer:
+    def __init__(self, callback, name="timer"):
+        """
+        Args:
+            callback: function called, on the event loop, when the timer fires
+        """
+        self.callback = callback
+        self.name = name
+        self.handle = None
+        # time.time() the timer is due; None when not armed
+        self.due_at = None
+        self.fired_count = 0
+
+    def start(self, delay):
+        """(Re)arm the timer to fire in delay seconds."""
+        self.start_at(time.time() + delay)
+
+    def start_at(self, due_at):
+        """(Re)arm the timer to fire at time.time() == due_at."""
+        self.cancel()
+        self.due_at = due_at
+        self.handle = asyncio.get_running_loop().call_later(
+            max(0, due_at - time.time()), self.fire
+        )
+
+    def cancel(self):
+        if self.handle:
+            self.handle.cancel()
+        self.handle = None
+        self.due_at = None
+
+    @property
+    def pending(self):
+        return self.handle is not None
+
+    def fire(self):
+        self.handle = None
+        self.due_at = None
+        self.fired_count += 1
+        try:
+            self.callback()
+        except Exception as e:
+            log.error(f"{self.name} timer failed: {e!r}")
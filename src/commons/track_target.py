@@ -1,7 +1,30 @@
+"""
+Moves the pan / tilt servos to keep the primary target in view.
+
+Rather than chasing where the target was when the camera saw it, we lead
+the target.  Each recognized box is converted into the pan and tilt angles
+that would center the target using the servo_actual_angles at the time,
+which removes the camera's own motion.  The target's angular velocity is
+fit from the last few of those and we command the angles where the target
+will be once the recognition (vision latency) and the servo move (servo
+latency) have caught up.  Both latencies are measured while running.
+
+How far to move toward that predicted angle is decided by a PID controller
+per axis (see commons/pan_tilt_controller.py) so that the camera converges
+on the target's center in a few large moves.
+
+The resulting angles are a goal for the ServoScheduler (see
+commons/servo_scheduler.py) which owns sending servo_angles to the hub.
+"""
 import time
+from collections import deque
+
+import numpy as np
 
 from basic_bot.commons import log, constants as c
-from commons.messages import send_servo_angles
+from commons import constants as d2c
+from commons.metrics import metrics
+from commons.pan_tilt_controller import PanTiltController
 
 
 VIEW_CENTER = (c.BB_VISION_WIDTH / 2, c.BB_VISION_HEIGHT / 2)
@@ -9,11 +32,7 @@ VIEW_CENTER = (c.BB_VISION_WIDTH / 2, c.BB_VISION_HEIGHT / 2)
 # 640 pix / Raspberry Pi v2 cam  62 deg hz fov = 10.32
 PIXELS_PER_DEGREE_X = c.BB_VISION_WIDTH / c.BB_VISION_FOV
 PIXELS_PER_DEGREE_Y = c.BB_VISION_HEIGHT / (c.BB_VISION_FOV * 0.75)
-X_DEGREE_TOLERANCE = 1.5
-Y_DEGREE_TOLERANCE = 1.5
 
-# how many pixels from the edge of the frame we can be before we pan or tilt the camera
-EDGE_THRESHOLD_PIXELS = 10
 # how many degrees off the target position we can be
 TARGET_POSITION_THRESHOLD = 0.1
 
@@ -21,57 +40,186 @@ TARGET_POSITION_THRESHOLD = 0.1
 # the target is moving
 MIN_TRACK_TIME = TARGET_POSITION_THRESHOLD
 
+# how many of the most recent target positions to fit velocity from and
+# how old (seconds) they can be
+MOTION_HISTORY_SIZE = 5
+MOTION_HISTORY_MAX_AGE = 0.5
+
+# weight of each new sample in the latency moving averages
+LATENCY_SMOOTHING = 0.2
+
 last_track_request_time = time.time()
 
 
-async def track_target(websocket, hub_state, primary_target):
+class TargetMotionEstimator:
+    """
+    Fits the angular velocity (degrees / second) of a target from the pan
+    and tilt angles that centered it in recent frames.
+    """
+
+    def __init__(self, size=MOTION_HISTORY_SIZE, max_age=MOTION_HISTORY_MAX_AGE):
+        self.samples = deque(maxlen=size)
+        self.max_age = max_age
+        self.track_id = None
+
+    def add(self, t, pan, tilt, track_id=None):
+        if track_id != self.track_id:
+            self.samples.clear()
+            self.track_id = track_id
+        self.samples.append((t, pan, tilt))
+
+    def velocity(self, now):
+        samples = np.array([s for s in self.samples if now - s[0] <= self.max_age])
+        if len(samples) < 2:
+            return 0.0, 0.0
+        t = samples[:, 0] - samples[:, 0].mean()
+        variance = (t * t).sum()
+        if variance <= 0:
+            return 0.0, 0.0
+        pan_velocity = (t * samples[:, 1]).sum() / variance
+        tilt_velocity = (t * samples[:, 2]).sum() / variance
+        return float(pan_velocity), float(tilt_velocity)
+
+
+class LatencyEstimator:
+    """
+    Exponential moving averages of the servo latency (servo_angles sent to
+    servo_actual_angles reaching them) and the vision latency (approximated
+    by the interval between recognition updates).
+    """
+
+    def __init__(
+        self,
+        servo_latency=d2c.D2_SERVO_LATENCY_SECONDS,
+        vision_latency=d2c.D2_VISION_LATENCY_SECONDS,
+    ):
+        self.servo_latency = servo_latency
+        self.vision_latency = vision_latency
+        self.pending_command = None
+        self.last_recognition_at = None
+
+    def recognition_received(self, t):
+        if self.last_recognition_at is not None:
+            interval = t - self.last_recognition_at
+            # ignore gaps where nothing was being tracked
+            if interval < 1:
+                self.vision_latency += LATENCY_SMOOTHING * (
+                    interval - self.vision_latency
+                )
+        self.last_recognition_at = t
+
+    def servo_command_sent(self, t, pan, tilt):
+        self.pending_command = (t, pan, tilt)
+
+    def servo_actual_angles_received(self, t, actual_angles):
+        if self.pending_command is None:
+            return
+        sent_at, pan, tilt = self.pending_command
+        if (
+            abs(actual_angles.get("pan", pan) - pan) <= TARGET_POSITION_THRESHOLD
+            and abs(actual_angles.get("tilt", tilt) - tilt)
+            <= TARGET_POSITION_THRESHOLD
+        ):
+            self.servo_latency += LATENCY_SMOOTHING * (
+                (t - sent_at) - self.servo_latency
+            )
+            self.pending_command = None
+
+    def lead_time(self):
+        return min(self.servo_latency + self.vision_latency, d2c.D2_MAX_LEAD_SECONDS)
+
+
+motion_estimator = TargetMotionEstimator()
+latency_estimator = LatencyEstimator()
+controller = PanTiltController()
+
+
+def observe_servo_actual_angles(actual_angles):
+    """Called with each servo_actual_angles update from the hub."""
+    latency_estimator.servo_actual_angles_received(time.time(), actual_angles)
+
+
+def observe_servo_angles_sent(pan, tilt):
+    """Called by the ServoScheduler each time it sends servo_angles."""
+    latency_estimator.servo_command_sent(time.time(), pan, tilt)
+
+
+def angles_to_center(bounding_box, current_pan, current_tilt):
+    """
+    Returns the (pan, tilt) that would put the center of bounding_box in
+    the center of the view.  Targets right of / below center need smaller
+    pan / tilt angles.
+    """
+    [left, top, right, bottom] = bounding_box
+    center_x = (left + right) / 2
+    center_y = (top + bottom) / 2
+    pan = current_pan - (center_x - VIEW_CENTER[0]) / PIXELS_PER_DEGREE_X
+    tilt = current_tilt - (center_y - VIEW_CENTER[1]) / PIXELS_PER_DEGREE_Y
+    return pan, tilt
+
+
+async def track_target(servo_scheduler, hub_state, primary_target, received_at=None):
+    """
+    received_at is the time.time() that the recognition containing
+    primary_target was received; it is used to measure end to end latency.
+    """
     if primary_target is None:
         return
 
+    actual_angles = hub_state.state.get("servo_actual_angles")
+    if not actual_angles:
+        log.debug("no servo_actual_angles yet, can't track")
+        return
+
     global last_track_request_time
     current_time = time.time()
+    latency_estimator.recognition_received(current_time)
+
+    current_x = actual_angles["pan"]
+    current_y = actual_angles["tilt"]
+    target_pan, target_tilt = angles_to_center(
+        primary_target["bounding_box"], current_x, current_y
+    )
+    motion_estimator.add(
+        current_time, target_pan, target_tilt, primary_target.get("track_id")
+    )
+
     if current_time - last_track_request_time < MIN_TRACK_TIME:
         return
     last_track_request_time = current_time
 
-    [left, top, _, _] = primary_target["bounding_box"]
-    degrees_off_x = 0
-    degrees_off_y = 0
-
-    # if the top or left of bounding box is alreadY at least EDGE_THRESHOLD_PIXELS in the frame,
-    # we don't need to adjust the tilt or pan of the camera
-    if top < EDGE_THRESHOLD_PIXELS:
-        degrees_off_y = -Y_DEGREE_TOLERANCE - TARGET_POSITION_THRESHOLD
-    elif top > c.BB_VISION_HEIGHT / 4:
-        degrees_off_y = Y_DEGREE_TOLERANCE + TARGET_POSITION_THRESHOLD
-
-    if left < EDGE_THRESHOLD_PIXELS:
-        degrees_off_x = -X_DEGREE_TOLERANCE - TARGET_POSITION_THRESHOLD
-    elif left > c.BB_VISION_WIDTH / 4:
-        degrees_off_x = X_DEGREE_TOLERANCE + TARGET_POSITION_THRESHOLD
-
-    await send_relative_angles(websocket, hub_state, degrees_off_x, degrees_off_y)
+    # lead the target by where it will be when the servos get there
+    pan_velocity, tilt_velocity = motion_estimator.velocity(current_time)
+    lead_time = latency_estimator.lead_time()
+    predicted_pan = target_pan + pan_velocity * lead_time
+    predicted_tilt = target_tilt + tilt_velocity * lead_time
+
+    pan_step, tilt_step = controller.update(
+        predicted_pan - current_x,
+        predicted_tilt - current_y,
+        current_time,
+        primary_target.get("track_id"),
+    )
+    if received_at is not None:
+        metrics.record("recognition_to_tracking_decision", time.time() - received_at)
+    await send_relative_angles(
+        servo_scheduler, hub_state, -pan_step, -tilt_step, received_at
+    )
 
 
-async def send_relative_angles(websocket, hub_state, x_relative, y_relative):
-    # send the angles to the servo controller
+async def send_relative_angles(
+    servo_scheduler, hub_state, x_relative, y_relative, received_at=None
+):
+    # send the angles to the servo scheduler
     current_x = hub_state.state["servo_actual_angles"]["pan"]
     current_y = hub_state.state["servo_actual_angles"]["tilt"]
-    x_angle = (
-        current_x + (x_relative * -1)
-        if abs(x_relative) > X_DEGREE_TOLERANCE
-        else current_x
-    )
-    y_angle = (
-        current_y + (y_relative * -1)
-        if abs(y_relative) > Y_DEGREE_TOLERANCE
-        else current_y
-    )
-    if x_angle == current_x and y_angle == current_y:
+    if x_relative == 0 and y_relative == 0:
         log.debug("no change in servo angles")
         return
 
+    x_angle = current_x + (x_relative * -1)
+    y_angle = current_y + (y_relative * -1)
     log.debug(
         f"sending servo angles: ({current_x=}, {current_y=}) => ({x_angle=}, {y_angle=})"
     )
-    await send_servo_angles(websocket, x_angle, y_angle)
+    servo_scheduler.set_goal(x_angle, y_angle, requested_at=received_at)
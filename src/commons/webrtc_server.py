@@ -3,24 +3,155 @@ WebRTC signaling server for onboard_ui service.
 
 This module provides an aiohttp web server that handles WebRTC signaling
 between the webapp and onboard_ui service for browser-to-display video streaming.
+The browser's audio is played on the robot's speaker and the robot's
+microphone is sent back to the browser (see commons/microphone_track.py).
+
+Several browsers can be connected at once, up to D2_OUI_WEBRTC_MAX_SESSIONS.
+Each signaling websocket has its own WebRTCSession (peer connection and
+media tasks), which is torn down when the websocket closes.  One session
+at a time, chosen by D2_OUI_WEBRTC_ACTIVE_SESSION, is shown on the display
+and heard on the speaker; the other sessions' media is received and
+discarded.  The microphone is opened once and relayed to every session.
+
+Browsers whose offer includes `"robot_video": true` are also sent the
+robot's camera, encoded once for all of them (see commons/camera_track.py).
 """
 
 import asyncio
 import json
 import logging
-from typing import Optional
+from typing import Dict, Optional, Set
 
-import aiohttp
 from aiohttp import web, WSMsgType
 from aiohttp_cors import setup as cors_setup, ResourceOptions
 from aiortc import RTCPeerConnection, RTCSessionDescription
+from aiortc.contrib.media import MediaRelay
 
 from basic_bot.commons import log
-from commons.constants import D2_OUI_WEBRTC_HOST, D2_OUI_WEBRTC_PORT
+from commons.constants import (
+    D2_OUI_CAMERA_SOURCE,
+    D2_OUI_MIC_DEVICE,
+    D2_OUI_WEBRTC_ACTIVE_SESSION,
+    D2_OUI_WEBRTC_HOST,
+    D2_OUI_WEBRTC_MAX_SESSIONS,
+    D2_OUI_WEBRTC_PORT,
+)
 from commons.audio_stream_player import AudioStreamPlayer
+from commons.camera_track import CameraStream
+from commons.microphone_track import MicrophoneTrack
 
 logger = logging.getLogger(__name__)
 
+# pings browsers so that ones that vanished without closing their
+# websocket (e.g. a phone that lost wifi) are noticed and cleaned up
+HEARTBEAT_SECONDS = 30
+
+
+def restrict_video_codec(sdp, codec):
+    """
+    Returns the offer `sdp` with its video formats restricted to `codec`
+    (e.g. "H264") and its retransmission formats, so that it's the codec
+    negotiated for video in both directions.  Returned unchanged if the
+    browser doesn't offer the codec.
+    """
+    lines = sdp.splitlines()
+    keep = set()
+    video = False
+    for line in lines:
+        if line.startswith("m="):
+            video = line.startswith("m=video")
+        elif video and line.startswith("a=rtpmap:"):
+            payload_type, encoding = line[len("a=rtpmap:") :].split(" ", 1)
+            if encoding.upper().startswith(f"{codec.upper()}/"):
+                keep.add(payload_type)
+    if not keep:
+        return sdp
+    for line in lines:
+        # a=fmtp:<rtx payload type> apt=<payload type it retransmits>
+        if line.startswith("a=fmtp:") and "apt=" in line:
+            payload_type, params = line[len("a=fmtp:") :].split(" ", 1)
+            if params.split("apt=")[1].split(";")[0] in keep:
+                keep.add(payload_type)
+
+    restricted = []
+    video = False
+    for line in lines:
+        if line.startswith("m="):
+            video = line.startswith("m=video")
+            if video:
+                fields = line.split(" ")
+                line = " ".join(fields[:3] + [f for f in fields[3:] if f in keep])
+        elif video and line.startswith(("a=rtpmap:", "a=fmtp:", "a=rtcp-fb:")):
+            if line.split(":", 1)[1].split(" ", 1)[0] not in keep:
+                continue
+        restricted.append(line)
+    return "\r\n".join(restricted) + "\r\n"
+
+
+def has_unused_transceiver(peer_connection, kind):
+    """
+    Whether the browser's offer has a transceiver of `kind` (audio or
+    video) that a track can be sent on; tracks the browser didn't offer
+    to receive can't be added to the answer.
+    """
+    return any(
+        transceiver.kind == kind and transceiver.sender.track is None
+        for transceiver in peer_connection.getTransceivers()
+    )
+
+
+class WebRTCSession:
+    """
+    One connected browser: its signaling websocket, peer connection and the
+    tasks receiving its media.
+    """
+
+    def __init__(self, websocket, number):
+        """
+        Args:
+            websocket: the browser's signaling websocket
+            number: sessions are numbered in the order they connect
+        """
+        self.websocket = websocket
+        self.number = number
+        self.peer_connection: Optional[RTCPeerConnection] = None
+        # order of the last offer, for D2_OUI_WEBRTC_ACTIVE_SESSION
+        self.offer_number = 0
+        # this session's relay of the shared microphone track
+        self.microphone_track = None
+        # this session's view of the shared camera stream
+        self.camera_track = None
+        self.tasks: Set[asyncio.Task] = set()
+
+    def create_task(self, coro):
+        """Run coro until it finishes or the session is closed."""
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def close_peer_connection(self):
+        for task in list(self.tasks):
+            task.cancel()
+        if self.microphone_track:
+            self.microphone_track.stop()
+            self.microphone_track = None
+        if self.camera_track:
+            self.camera_track.stop()
+            self.camera_track = None
+        if self.peer_connection:
+            await self.peer_connection.close()
+            self.peer_connection = None
+
+    async def send_message(self, message):
+        """Send message to the browser."""
+        if not self.websocket.closed:
+            await self.websocket.send_str(json.dumps(message))
+
+    async def send_error(self, error_message):
+        """Send error message to the browser."""
+        await self.send_message({"type": "error", "message": error_message})
+
 
 class WebRTCSignalingServer:
     def __init__(self, video_callback=None):
@@ -29,12 +160,22 @@ class WebRTCSignalingServer:
 
         Args:
             video_callback: Function to call when new video frame is received
+                from the active session
         """
         self.app = web.Application()
         self.video_callback = video_callback
-        self.peer_connection: Optional[RTCPeerConnection] = None
-        self.websocket: Optional[aiohttp.ClientWebSocketResponse] = None
+        self.sessions: Dict[web.WebSocketResponse, WebRTCSession] = {}
+        self.active_session: Optional[WebRTCSession] = None
         self.audio_player = AudioStreamPlayer()
+        # opened for the first session and shared, via the relay, by all
+        self.microphone_track: Optional[MicrophoneTrack] = None
+        self.relay = MediaRelay()
+        # encodes only while a session is subscribed
+        self.camera_stream = CameraStream()
+
+        self.sessions_started = 0
+        self.sessions_rejected = 0
+        self.offers = 0
 
         # Setup CORS for cross-origin requests from webapp
         cors = cors_setup(
@@ -57,98 +198,214 @@ class WebRTCSignalingServer:
         for route in list(self.app.router.routes()):
             cors.add(route)
 
+    @property
+    def peer_connection(self) -> Optional[RTCPeerConnection]:
+        """The active session's peer connection."""
+        return self.active_session.peer_connection if self.active_session else None
+
+    @property
+    def websocket(self) -> Optional[web.WebSocketResponse]:
+        """The active session's signaling websocket."""
+        return self.active_session.websocket if self.active_session else None
+
     async def health_check(self, request):
         """Health check endpoint."""
         return web.json_response({"status": "ok", "service": "webrtc_signaling"})
 
     async def websocket_handler(self, request):
         """Handle WebSocket connections for WebRTC signaling."""
-        ws = web.WebSocketResponse()
+        ws = web.WebSocketResponse(heartbeat=HEARTBEAT_SECONDS)
         await ws.prepare(request)
 
-        self.websocket = ws
-        log.info("WebRTC signaling client connected")
-
-        async for msg in ws:
-            if msg.type == WSMsgType.TEXT:
-                try:
-                    data = json.loads(msg.data)
-                    await self.handle_signaling_message(data)
-                except Exception as e:
-                    log.error(f"Error processing WebRTC message: {e}")
-                    await self.send_error(f"Error processing message: {e}")
-            elif msg.type == WSMsgType.ERROR:
-                log.error(f"WebRTC WebSocket error: {ws.exception()}")
-                break
-
-        log.info("WebRTC signaling client disconnected")
-        self.websocket = None
-
-        # Clean up audio stream
-        self.audio_player.cleanup_audio_stream()
+        if len(self.sessions) >= D2_OUI_WEBRTC_MAX_SESSIONS:
+            self.sessions_rejected += 1
+            log.info(
+                f"Rejecting WebRTC signaling client, already "
+                f"{len(self.sessions)} sessions (D2_OUI_WEBRTC_MAX_SESSIONS)"
+            )
+            session = WebRTCSession(ws, 0)
+            await session.send_error("Too many connections to the robot")
+            await ws.close()
+            return ws
+
+        self.sessions_started += 1
+        session = WebRTCSession(ws, self.sessions_started)
+        self.sessions[ws] = session
+        log.info(
+            f"WebRTC signaling client connected, session {session.number} "
+            f"of {len(self.sessions)}"
+        )
 
-        # Clean up peer connection
-        if self.peer_connection:
-            await self.peer_connection.close()
-            self.peer_connection = None
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.TEXT:
+                    try:
+                        data = json.loads(msg.data)
+                        await self.handle_signaling_message(data, session)
+                    except Exception as e:
+                        log.error(f"Error processing WebRTC message: {e}")
+                        await session.send_error(f"Error processing message: {e}")
+                elif msg.type == WSMsgType.ERROR:
+                    log.error(f"WebRTC WebSocket error: {ws.exception()}")
+                    break
+        finally:
+            log.info(f"WebRTC signaling client disconnected, session {session.number}")
+            await self.close_session(session)
 
         return ws
 
-    async def handle_signaling_message(self, data):
-        """Process incoming WebRTC signaling messages."""
+    async def close_session(self, session):
+        """Tear down everything the session started."""
+        if self.sessions.pop(session.websocket, None) is None:
+            return
+        # hand the display and speaker over before the (slow) close
+        self.update_active_session()
+        if not self.sessions:
+            self.stop_microphone_track()
+        await session.close_peer_connection()
+        log.info(
+            f"WebRTC session {session.number} closed, "
+            f"{len(self.sessions)} sessions remaining"
+        )
+
+    def update_active_session(self):
+        """Choose the session shown and heard, per D2_OUI_WEBRTC_ACTIVE_SESSION."""
+        candidates = [s for s in self.sessions.values() if s.peer_connection]
+        active = None
+        if candidates:
+            if D2_OUI_WEBRTC_ACTIVE_SESSION == "first":
+                active = min(candidates, key=lambda s: s.offer_number)
+            else:
+                active = max(candidates, key=lambda s: s.offer_number)
+
+        if active is not self.active_session:
+            log.info(
+                "WebRTC active session: "
+                f"{active.number if active else None} "
+                f"(policy {D2_OUI_WEBRTC_ACTIVE_SESSION})"
+            )
+            # the new active session's audio restarts the stream
+            self.audio_player.cleanup_audio_stream()
+            self.active_session = active
+
+    async def handle_signaling_message(self, data, session=None):
+        """
+        Process incoming WebRTC signaling messages.
+
+        Args:
+            data: the decoded message
+            session: WebRTCSession the message came from; defaults to the
+                active session
+        """
+        session = session or self.active_session
         message_type = data.get("type")
 
         if message_type == "offer":
-            await self.handle_offer(data)
+            await self.handle_offer(session, data)
         elif message_type == "ice_candidate":
-            await self.handle_ice_candidate(data)
+            await self.handle_ice_candidate(session, data)
         else:
             log.debug(f"Unknown WebRTC message type: {message_type}")
 
-    async def handle_offer(self, data):
+    async def handle_offer(self, session, data):
         """Handle WebRTC offer from browser."""
         try:
+            # a new offer on the same websocket replaces its connection
+            await session.close_peer_connection()
+
             # Create new peer connection
-            self.peer_connection = RTCPeerConnection()
+            peer_connection = RTCPeerConnection()
+            session.peer_connection = peer_connection
 
             # Set up event handlers
-            @self.peer_connection.on("track")
+            @peer_connection.on("track")
             def on_track(track):
                 log.info(f"Received WebRTC track: {track.kind}")
                 if track.kind == "video" and self.video_callback:
-                    asyncio.create_task(self.process_video_track(track))
+                    session.create_task(self.process_video_track(session, track))
                 elif track.kind == "audio":
-                    asyncio.create_task(self.process_audio_track(track))
+                    session.create_task(self.process_audio_track(session, track))
 
-            @self.peer_connection.on("connectionstatechange")
+            @peer_connection.on("connectionstatechange")
             async def on_connectionstatechange():
                 log.info(
-                    f"WebRTC connection state: {self.peer_connection.connectionState}"
+                    f"WebRTC session {session.number} connection state: "
+                    f"{peer_connection.connectionState}"
                 )
 
             # Set remote description from offer
-            offer = RTCSessionDescription(sdp=data["sdp"], type=data["type"])
-            await self.peer_connection.setRemoteDescription(offer)
+            sdp = data["sdp"]
+            if data.get("robot_video"):
+                # the shared camera stream is H264, sent as is
+                sdp = restrict_video_codec(sdp, "H264")
+            offer = RTCSessionDescription(sdp=sdp, type=data["type"])
+            await peer_connection.setRemoteDescription(offer)
+
+            # send the robot's microphone on the browser's audio transceiver
+            self.add_microphone_track(session)
+            if data.get("robot_video"):
+                self.add_camera_track(session)
 
             # Create answer
-            answer = await self.peer_connection.createAnswer()
-            await self.peer_connection.setLocalDescription(answer)
+            answer = await peer_connection.createAnswer()
+            await peer_connection.setLocalDescription(answer)
+
+            self.offers += 1
+            session.offer_number = self.offers
+            self.update_active_session()
 
             # Send answer back to browser
-            await self.send_message(
-                {"type": "answer", "sdp": self.peer_connection.localDescription.sdp}
+            await session.send_message(
+                {"type": "answer", "sdp": peer_connection.localDescription.sdp}
             )
 
-            log.info("WebRTC answer sent to browser")
+            log.info(f"WebRTC answer sent to browser, session {session.number}")
 
         except Exception as e:
             log.error(f"Error handling WebRTC offer: {e}")
-            await self.send_error(f"Error processing offer: {e}")
+            if session:
+                await session.send_error(f"Error processing offer: {e}")
+
+    def add_microphone_track(self, session):
+        """Start sending the robot's microphone to the session's browser."""
+        if D2_OUI_MIC_DEVICE.lower() == "none" or not has_unused_transceiver(
+            session.peer_connection, "audio"
+        ):
+            return
+        try:
+            if self.microphone_track is None:
+                self.microphone_track = MicrophoneTrack(D2_OUI_MIC_DEVICE or None)
+            # unbuffered: a browser that falls behind skips audio rather
+            # than hearing it late
+            session.microphone_track = self.relay.subscribe(
+                self.microphone_track, buffered=False
+            )
+            session.peer_connection.addTrack(session.microphone_track)
+        except Exception as e:
+            # telepresence still works one way without it
+            log.error(f"Not sending robot microphone audio: {e}")
+
+    def add_camera_track(self, session):
+        """Start sending the robot's camera to the session's browser."""
+        if D2_OUI_CAMERA_SOURCE.lower() == "none" or not has_unused_transceiver(
+            session.peer_connection, "video"
+        ):
+            return
+        try:
+            session.camera_track = self.camera_stream.subscribe()
+            session.peer_connection.addTrack(session.camera_track)
+        except Exception as e:
+            log.error(f"Not sending robot camera video: {e}")
+
+    def stop_microphone_track(self):
+        if self.microphone_track:
+            self.microphone_track.stop()
+            self.microphone_track = None
 
-    async def handle_ice_candidate(self, data):
+    async def handle_ice_candidate(self, session, data):
         """Handle ICE candidate from browser."""
         try:
-            if self.peer_connection and data.get("candidate"):
+            if session and session.peer_connection and data.get("candidate"):
                 from aiortc import RTCIceCandidate
 
                 candidate = RTCIceCandidate(
@@ -163,52 +420,53 @@ class WebRTCSignalingServer:
                     sdpMLineIndex=data.get("sdpMLineIndex"),
                 )
 
-                await self.peer_connection.addIceCandidate(candidate)
+                await session.peer_connection.addIceCandidate(candidate)
                 log.debug("Added ICE candidate")
 
         except Exception as e:
             log.error(f"Error handling ICE candidate: {e}")
 
-    async def process_video_track(self, track):
+    async def process_video_track(self, session, track):
         """Process incoming video frames from WebRTC track."""
         try:
             while True:
                 frame = await track.recv()
-                if self.video_callback:
+                # other sessions' frames are received, so they don't queue
+                # up, and dropped
+                if self.video_callback and session is self.active_session:
                     self.video_callback(frame)
         except Exception as e:
             log.error(f"Error processing video track: {e}")
 
-    async def process_audio_track(self, track):
+    async def process_audio_track(self, session, track):
         """Process incoming audio frames from WebRTC track."""
         try:
-            log.info("Starting audio track processing")
-
-            # Start audio stream on first audio frame
-            first_frame = await track.recv()
-            await self.audio_player.setup_audio_stream(first_frame)
-
-            # Queue the first frame
-            self.audio_player.queue_audio_frame(first_frame)
+            log.info(f"Starting audio track processing, session {session.number}")
 
-            # Process remaining frames
             while True:
                 frame = await track.recv()
+                if session is not self.active_session:
+                    continue
+
+                # Start audio stream on the active session's first frame
+                if not self.audio_player.playing:
+                    await self.audio_player.setup_audio_stream(frame)
                 self.audio_player.queue_audio_frame(frame)
 
         except Exception as e:
             log.error(f"Error processing audio track: {e}")
         finally:
-            self.audio_player.cleanup_audio_stream()
-
-    async def send_message(self, message):
-        """Send message to WebSocket client."""
-        if self.websocket and not self.websocket.closed:
-            await self.websocket.send_str(json.dumps(message))
-
-    async def send_error(self, error_message):
-        """Send error message to WebSocket client."""
-        await self.send_message({"type": "error", "message": error_message})
+            if session is self.active_session:
+                self.audio_player.cleanup_audio_stream()
+
+    def get_stats(self):
+        active = self.active_session
+        return {
+            "sessions": len(self.sessions),
+            "active_session": active.number if active else None,
+            "sessions_started": self.sessions_started,
+            "sessions_rejected": self.sessions_rejected,
+        }
 
     async def start_server(self):
         """Start the WebRTC signaling server."""
@@ -229,10 +487,12 @@ class WebRTCSignalingServer:
 
     async def stop_server(self, runner):
         """Stop the WebRTC signaling server."""
-        # Clean up audio stream
+        for session in list(self.sessions.values()):
+            await self.close_session(session)
+        # Clean up audio streams
         self.audio_player.cleanup_audio_stream()
+        self.stop_microphone_track()
 
-        if self.peer_connection:
-            await self.peer_connection.close()
         await runner.cleanup()
+        self.camera_stream.close()
         log.info("WebRTC signaling server stopped")
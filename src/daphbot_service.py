@@ -18,122 +18,254 @@ central_hub state.  Example:
         "primary_target": {
             "classification": "cat",
             "bounding_box": [1, 22, 200, 330],
-            "confidence": 0.99
+            "confidence": 0.99,
+            "track_id": 12,
+            "age": 3.2,
+            "velocity": [-40.5, 2.1]
         }
     }
 }
 ```
+The primary target is tracked across recognition updates (see
+commons/target_tracker.py) so `track_id` stays the same for as long as
+the same object stays in view.
+
+Every D2_METRICS_PUBLISH_SECONDS this service also publishes the
+"daphbot_metrics" key with p50/p95/p99 latencies of the recognition hot
+path (receipt -> target selection -> primary_target / tracking decision ->
+servo_angles) and some counters.  See commons/metrics.py.
+
+While targets are in view, video is recorded by the vision service in
+one continuous session and the "recording_session" key is published with
+the session's start, end and classes seen.  See
+commons/recording_session.py.
 """
 import asyncio
-import threading
+import atexit
+import signal
+import sys
 import time
 
 from basic_bot.commons import log, constants as c, vision_client as vc
 from basic_bot.commons.hub_state import HubState
 from basic_bot.commons.hub_state_monitor import HubStateMonitor
 
-from commons.data import find_primary_target, is_pet
-from commons.dance import dance_thread
-from commons.messages import send_primary_target, send_servo_angles
-from commons.track_target import track_target
-
-AUTO_CENTER_TIMEOUT_SECONDS = 20
+from commons import constants as d2c, sound
+from commons.audio_mixer import mixer
+from commons.behavior import BehaviorEngine
+from commons.detection_voter import DetectionVoter
+from commons.hub_recording import HubTrafficRecorder
+from commons.mailbox import LatestMailbox
+from commons.messages import (
+    hub_outbox,
+    primary_target_stats,
+    send_daphbot_metrics,
+    send_primary_target,
+    send_recording_session,
+)
+from commons.metrics import metrics
+from commons.recording_session import RecordingSessionManager
+from commons.servo_scheduler import ServoScheduler
+from commons.target_tracker import TargetTracker
+from commons.track_target import (
+    observe_servo_actual_angles,
+    observe_servo_angles_sent,
+)
 
 # HubState is a class that manages the process local copy of the state.
 # Each service runs as a process and  has its own partial or full instance
 # of HubState.
 hub_state = HubState({"primary_target": None})
 
-# this is set to True when the robot is dancing and False otherwise
-pet_is_detected = False
-last_target_at = 0
-
-
-def handle_dance_complete(websocket):
-    global pet_is_detected
-    pet_is_detected = False
-    # after doing the dance, we may have missed some state updates
-    # so we process a state update using the current state
-    handle_state_update(websocket, "state", hub_state.state)
-
-
-def handle_state_update(websocket, _msg_type, msg_data):
-    global pet_is_detected
-    global last_target_at
-
-    in_manual_mode = hub_state.state.get("daphbot_mode") == "manual"
-
-    primary_target = find_primary_target(msg_data)
-    asyncio.create_task(send_primary_target(websocket, primary_target))
-
-    # if we are not currently dancing
-    if not pet_is_detected and not in_manual_mode:
-        if primary_target:
-            last_target_at = time.time()
-            log.debug(f"handle_state_update: {primary_target=}")
-            asyncio.create_task(track_target(websocket, hub_state, primary_target))
-            record_video()
-            pet_is_detected = is_pet(primary_target)
-            if pet_is_detected:
-                # we don't want to hold up the websocket receiving (this) thread
-                # in HubStateMonitor so we start a new thread to do the dance
-                # otherwise the message queue will back up
-                threading.Thread(
-                    target=lambda: dance_thread(
-                        lambda: handle_dance_complete(websocket)
-                    )
-                ).start()
-        else:
-            # if we haven't seen a primary target in a while, center the camera
-            if time.time() - last_target_at > AUTO_CENTER_TIMEOUT_SECONDS:
-                log.info("no primary target detected, centering servo angles")
-                asyncio.create_task(send_servo_angles(websocket, 90, 90))
+# all servo moves requested by behaviors go through the scheduler which
+# rate limits, clamps and dedups what is sent to central hub
+servo_scheduler = ServoScheduler(hub_state, on_send=observe_servo_angles_sent)
+
+
+# Recognition updates arrive from vision at up to 24fps.  Only the newest
+# one is kept for the consumer task below; if the hub or servo side stalls,
+# stale recognitions are dropped (and counted) instead of piling up tasks.
+recognition_mailbox = LatestMailbox()
+recognition_task = None
+
+# tracks recognized objects across updates and provides the primary target
+target_tracker = TargetTracker()
+# requires pets to be seen in several recent updates before reacting
+detection_voter = DetectionVoter()
+
+
+# optionally record the traffic we receive for offline replay
+# (see sbin/replay_hub_traffic.py)
+RECORDED_KEYS = ["recognition", "servo_actual_angles", "daphbot_mode"]
+hub_traffic_recorder = (
+    HubTrafficRecorder(d2c.D2_DAPHBOT_RECORD_FILE, RECORDED_KEYS)
+    if d2c.D2_DAPHBOT_RECORD_FILE
+    else None
+)
+
+
+def handle_state_update(websocket, msg_type, msg_data):
+    global recognition_task
+
+    if hub_traffic_recorder:
+        hub_traffic_recorder.record(msg_type, msg_data)
+
+    if "servo_actual_angles" in msg_data:
+        # used to measure servo latency for predictive tracking
+        observe_servo_actual_angles(msg_data["servo_actual_angles"])
+
+    if "recognition" not in msg_data:
+        return
+
+    recognition_mailbox.put((websocket, msg_data, time.time()))
+    if recognition_task is None or recognition_task.done():
+        recognition_task = asyncio.create_task(process_recognitions())
+
+
+async def process_recognitions():
+    while True:
+        websocket, msg_data, received_at = await recognition_mailbox.get()
+        try:
+            started_at = time.time()
+            metrics.record("mailbox_wait", started_at - received_at)
+
+            recognitions = msg_data["recognition"]
+            primary_target = target_tracker.update(recognitions)
+            confirmed_labels = detection_voter.update(recognitions)
+            metrics.record("target_selection", time.time() - started_at)
+
+            send_primary_target(websocket, primary_target)
+            metrics.record("recognition_to_primary_target", time.time() - received_at)
+
+            # the behavior engine never blocks this task; dances, tracking
+            # and centering all run as their own tasks on the event loop
+            behavior.handle_target(
+                websocket, primary_target, confirmed_labels, received_at
+            )
+        except Exception as e:
+            log.error(f"error processing recognition: {e}")
+
+
+metrics_task = None
+hub_websocket = None
+
+
+async def publish_metrics(websocket):
+    while True:
+        await asyncio.sleep(d2c.D2_METRICS_PUBLISH_SECONDS)
+        try:
+            send_daphbot_metrics(
+                websocket,
+                {
+                    "latency": metrics.snapshot(reset=True),
+                    "recognition_mailbox": recognition_mailbox.get_stats(),
+                    "servo_angles_sent": servo_scheduler.sent_count,
+                    "primary_target": dict(primary_target_stats),
+                    "hub_outbox": hub_outbox.get_stats(),
+                    "target_switches": target_tracker.switch_count,
+                    "behavior_state": behavior.state.value,
+                    "recording": recording_sessions.get_stats(),
+                    "audio_mixer": mixer.get_stats(),
+                },
+            )
+        except Exception as e:
+            log.error(f"error publishing daphbot_metrics: {e}")
 
 
 def handle_connect(websocket):
+    global metrics_task, hub_websocket
+
     # if we disconnect and reconnect we need to resend the current state
     log.info("connected to central hub")
-    asyncio.create_task(send_primary_target(websocket, None, force=True))
-
+    hub_websocket = websocket
+    servo_scheduler.websocket = websocket
+    # votes from before the disconnect are stale
+    detection_voter.reset()
+    behavior.start()
+    send_primary_target(websocket, None, force=True)
 
-RECORDED_VIDEO_DURATION = 10
-DURATION_PADDING = 1
-last_video_recorded_at = 0
+    if metrics_task:
+        metrics_task.cancel()
+    metrics_task = asyncio.create_task(publish_metrics(websocket))
 
 
-def record_video():
-    global last_video_recorded_at
-
+def request_video_recording(duration):
     # we are not running the vision service during integration tests
     # of daphbot_service so we don't want to try and send the request
     if c.BB_ENV == "test":
         return
+    vc.send_record_video_request(duration)
 
-    current_time = time.time()
-    if (
-        current_time - last_video_recorded_at
-        < RECORDED_VIDEO_DURATION + DURATION_PADDING
-    ):
-        return
-    last_video_recorded_at = current_time
-    vc.send_record_video_request(RECORDED_VIDEO_DURATION)
 
+def publish_recording_session(session):
+    if hub_websocket:
+        send_recording_session(hub_websocket, session)
+
+
+# one continuous recording, of back to back segments, for as long as
+# targets stay in view
+recording_sessions = RecordingSessionManager(
+    request_video_recording,
+    # integration tests and sbin/replay_hub_traffic.py (BB_ENV=test) don't
+    # record video, so there are no real sessions to keep
+    sessions_file=None if c.BB_ENV == "test" else d2c.D2_RECORDING_SESSIONS_FILE,
+    on_change=publish_recording_session,
+)
 
-# HubStateMonitor will open a websocket connection to the central hub
-# and start a thread to listen for state changes.  The monitor will call,
-# on the callback function with the new state before applying the changes to
-# the local state.
-hub_monitor = HubStateMonitor(
+behavior = BehaviorEngine(
     hub_state,
-    # identity of the service
-    "daphbot_service",
-    # keys to subscribe to
-    ["recognition", "daphbot_mode", "servo_config", "servo_actual_angles"],
-    # callback function to call when a message is received
-    # Note that when started using bb_start, any standard output or error
-    # will be captured and logged to the ./logs directory.
-    on_state_update=handle_state_update,
-    on_connect=handle_connect,
+    servo_scheduler,
+    on_target_acquired=recording_sessions.target_seen,
+    detection_voter=detection_voter,
 )
-hub_monitor.start()
-hub_monitor.thread.join()
+
+
+def close_hub_traffic_recorder():
+    # without the gzip end marker written by close(), a recording can only
+    # be read up to its last flush
+    if hub_traffic_recorder:
+        hub_traffic_recorder.close()
+
+
+def main():
+    # decode the reaction sounds now so that playing them is instant;
+    # there is no sound device when testing
+    if c.BB_ENV != "test":
+        sound.sound_bank.load()
+
+    # HubStateMonitor will open a websocket connection to the central hub
+    # and start a thread to listen for state changes.  The monitor will call,
+    # on the callback function with the new state before applying the changes to
+    # the local state.
+    hub_monitor = HubStateMonitor(
+        hub_state,
+        # identity of the service
+        "daphbot_service",
+        # keys to subscribe to
+        ["recognition", "daphbot_mode", "servo_config", "servo_actual_angles"],
+        # callback function to call when a message is received
+        # Note that when started using bb_start, any standard output or error
+        # will be captured and logged to the ./logs directory.
+        on_state_update=handle_state_update,
+        on_connect=handle_connect,
+    )
+    hub_monitor.start()
+
+    atexit.register(close_hub_traffic_recorder)
+
+    def stop_handler(signum, frame):
+        log.info(f"Caught signal {signum}. Stopping...")
+        # closed here because python doesn't run atexit handlers on signals
+        close_hub_traffic_recorder()
+        hub_monitor.stop()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop_handler)
+    signal.signal(signal.SIGINT, stop_handler)
+
+    hub_monitor.thread.join()
+
+
+# main() is not run when imported, e.g. by sbin/replay_hub_traffic.py
+if __name__ == "__main__":
+    main()
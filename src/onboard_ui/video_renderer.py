@@ -4,9 +4,24 @@ Video renderer for displaying WebRTC video frames in pygame.
 This module handles converting WebRTC video frames to pygame surfaces
 and rendering them to the onboard display, replacing the eye animation
 when in manual mode.
+
+Frames arrive faster than the display is redrawn, and while the display
+isn't showing video at all.  handle_video_frame() only keeps a reference
+to the newest decoded frame.  While video is shown (rendered in the last
+VISIBLE_SECONDS), the newest frame is converted (scaled, cropped and made
+into a pygame surface) as soon as one of CONVERT_WORKERS worker threads
+is free.  Conversion is off the event loop, which also runs render() and
+aiortc's network I/O; cv2 and numpy release the GIL, so it runs in
+parallel on the Pi's other cores.  A worker hands its surface to
+render() through a single slot, which only ever holds the newest
+converted frame.  Frames replaced before a worker is free, or that
+arrive while video isn't shown, are never converted.
 """
 
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pygame
 import numpy as np
 from typing import Optional
@@ -25,6 +40,11 @@ VIDEO_AREA_HEIGHT = 600
 VIDEO_X = (DISPLAY_WIDTH - VIDEO_AREA_WIDTH) // 2
 VIDEO_Y = (DISPLAY_HEIGHT - VIDEO_AREA_HEIGHT) // 2
 
+# frames converted at once, off the event loop
+CONVERT_WORKERS = 2
+# video is shown if it was rendered this recently
+VISIBLE_SECONDS = 0.5
+
 
 class VideoRenderer:
     """Renders WebRTC video frames to pygame display."""
@@ -38,11 +58,31 @@ class VideoRenderer:
         """
         self.screen = screen
         self.current_frame: Optional[pygame.Surface] = None
+        # newest frame received, not yet being converted
+        self.pending_frame: Optional[VideoFrame] = None
         self.last_frame_time = 0
+        self.last_render_time = 0.0
 
-        # Total frames processed
+        self.executor = ThreadPoolExecutor(
+            max_workers=CONVERT_WORKERS, thread_name_prefix="video_convert"
+        )
+        # guards the converted slot, conversions and conversion stats,
+        # which worker threads update
+        self.lock = threading.Lock()
+        self.conversions = 0
+        # newest converted surface, waiting for render(), and the number of
+        # the frame it's from
+        self.converted: Optional[pygame.Surface] = None
+        self.converted_number = 0
+        self.received_number = 0
+
+        # Total frames received
         self.frame_count = 0
-        # times spent in handle_video_frame per frame of frame_dump_interval length
+        # frames converted to a surface, and replaced before they were
+        # (a conversion finishing after a newer frame's is also skipped)
+        self.converted_frame_count = 0
+        self.skipped_frame_count = 0
+        # times spent converting per frame of frame_dump_interval length
         self.frame_handling_times = []
         # Log every 30 frames
         self.frame_dump_interval = 30
@@ -53,11 +93,43 @@ class VideoRenderer:
 
     def handle_video_frame(self, frame: VideoFrame):
         """
-        Process incoming WebRTC video frame and convert to pygame surface.
+        Keep the newest WebRTC video frame, and start converting it if video
+        is shown.
 
         Args:
             frame: Video frame from WebRTC stream
         """
+        if self.pending_frame is not None:
+            with self.lock:
+                self.skipped_frame_count += 1
+        self.pending_frame = frame
+        self.frame_count += 1
+        self.received_number += 1
+        self.last_frame_time = time.time()
+        if self.last_frame_time - self.last_render_time < VISIBLE_SECONDS:
+            self.start_conversion()
+
+    def start_conversion(self):
+        """Convert the pending frame on a worker thread, if one is free."""
+        if self.pending_frame is None:
+            return
+        with self.lock:
+            if self.conversions >= CONVERT_WORKERS:
+                return
+            self.conversions += 1
+        frame = self.pending_frame
+        self.pending_frame = None
+        self.executor.submit(self.convert_frame, frame, self.received_number)
+
+    def take_converted_frame(self):
+        """Make the newest converted frame, if there is one, current."""
+        with self.lock:
+            if self.converted is not None:
+                self.current_frame = self.converted
+                self.converted = None
+
+    def convert_frame(self, frame: VideoFrame, number: int):
+        """On a worker thread: convert frame and hand it to render()."""
         try:
             start_time = time.time()
             # Convert frame to numpy array
@@ -100,35 +172,45 @@ class VideoRenderer:
             # Create pygame surface
             # Transpose array to match pygame's (width, height, channels) format
             rgb_img = np.transpose(rgb_img, (1, 0, 2))  # type: ignore
-            self.current_frame = pygame.surfarray.make_surface(rgb_img)
-
-            self.frame_count += 1
-            self.last_frame_time = time.time()
-            self.frame_handling_times.append(self.last_frame_time - start_time)
-
-            if (
-                bb_constants.BB_LOG_DEBUG
-                and self.frame_count % self.frame_dump_interval == 0
-            ):  # Log every 30 frames
-                total_time = time.time() - (
-                    self.frame_dump_start_time or self.last_frame_time
+            surface = pygame.surfarray.make_surface(rgb_img)
+
+            converted_time = time.time()
+            with self.lock:
+                if number > self.converted_number:
+                    self.converted = surface
+                    self.converted_number = number
+                else:
+                    # a newer frame finished converting first
+                    self.skipped_frame_count += 1
+                self.converted_frame_count += 1
+                self.frame_handling_times.append(converted_time - start_time)
+                handling_times = None
+                if len(self.frame_handling_times) >= self.frame_dump_interval:
+                    handling_times = self.frame_handling_times
+                    self.frame_handling_times = []
+
+            if bb_constants.BB_LOG_DEBUG and handling_times:  # Log every 30 frames
+                total_time = converted_time - (
+                    self.frame_dump_start_time or converted_time
                 )
-                total_handling_time = sum(self.frame_handling_times)
-                self.frame_handling_times = []
-                self.frame_dump_start_time = self.last_frame_time
-                self.rendered_frame_count
+                total_handling_time = sum(handling_times)
+                self.frame_dump_start_time = converted_time
 
                 log.debug(
-                    f"Stats for last {self.frame_dump_interval} frames:\n"
-                    f"    total frames handled: {self.frame_count};\n"
+                    f"Stats for last {self.frame_dump_interval} converted frames:\n"
+                    f"    total frames received: {self.frame_count};\n"
+                    f"    total frames skipped: {self.skipped_frame_count};\n"
                     f"    total frames rendered: {self.rendered_frame_count};\n"
                     f"    total time for {self.frame_dump_interval} frames: {total_time:.4f}s;\n"
-                    f"    total time in handle_video_frame: {total_handling_time:.4f}s;\n"
-                    f"    avg handling time per frame: {total_handling_time / self.frame_dump_interval:.4f}s;\n"
+                    f"    total time converting: {total_handling_time:.4f}s;\n"
+                    f"    avg conversion time per frame: {total_handling_time / self.frame_dump_interval:.4f}s;\n"
                 )
 
         except Exception as e:
             log.error(f"Error processing video frame: {e}")
+        finally:
+            with self.lock:
+                self.conversions -= 1
 
     def render(self, t):
         """
@@ -138,6 +220,9 @@ class VideoRenderer:
             t: Current time
         """
         self.rendered_frame_count += 1
+        self.last_render_time = t
+        self.take_converted_frame()
+        self.start_conversion()
         if self.current_frame is not None:
             # Calculate position to center the video
             frame_rect = self.current_frame.get_rect()
@@ -183,7 +268,7 @@ class VideoRenderer:
         Returns:
             bool: True if frame is recent, False otherwise
         """
-        if not self.current_frame:
+        if not self.current_frame and self.pending_frame is None:
             return False
         return (time.time() - self.last_frame_time) < max_age_seconds
 
@@ -191,8 +276,12 @@ class VideoRenderer:
         """Get video frame statistics for debugging."""
         return {
             "frame_count": self.frame_count,
+            "converted_frame_count": self.converted_frame_count,
+            "skipped_frame_count": self.skipped_frame_count,
             "last_frame_time": self.last_frame_time,
-            "has_current_frame": self.current_frame is not None,
+            "has_current_frame": (
+                self.current_frame is not None or self.pending_frame is not None
+            ),
             "frame_age": (
                 time.time() - self.last_frame_time if self.last_frame_time > 0 else None
             ),
@@ -10,6 +10,11 @@ This service also subscribes to the "primary_target" key in hub_state
 provided by daphbot_service.  This is used for expressive behavior
 in the robot's eyes and background
 
+Every D2_METRICS_PUBLISH_SECONDS this service publishes the
+"onboard_ui_metrics" key with telepresence audio counters (underruns,
+overruns, buffer fill, drift correction), the audio mixer's and robot
+microphone's counters, connected WebRTC sessions, robot camera encoding
+counters and audio latency percentiles.  See commons/metrics.py.
 """
 
 import asyncio
@@ -25,7 +30,10 @@ from basic_bot.commons.hub_state import HubState
 from basic_bot.commons.hub_state_monitor import HubStateMonitor
 
 from commons.pygame_utils import translate_touch_event
-from commons.constants import D2_OUI_RENDER_FPS
+from commons.constants import D2_METRICS_PUBLISH_SECONDS, D2_OUI_RENDER_FPS
+from commons.audio_mixer import mixer
+from commons.messages import send_onboard_ui_metrics
+from commons.metrics import metrics
 from onboard_ui.renderables.renderables import Renderables
 
 from onboard_ui.background import Background
@@ -46,8 +54,45 @@ hub_state = HubState(
         }
     }
 )
+metrics_task = None
+
+
+async def publish_metrics(websocket):
+    while True:
+        await asyncio.sleep(D2_METRICS_PUBLISH_SECONDS)
+        try:
+            send_onboard_ui_metrics(
+                websocket,
+                {
+                    "latency": metrics.snapshot(reset=True),
+                    "audio_mixer": mixer.get_stats(),
+                    "telepresence_audio": webrtc_server.audio_player.get_stats(),
+                    "webrtc": webrtc_server.get_stats(),
+                    "camera": webrtc_server.camera_stream.get_stats(),
+                    "microphone": (
+                        webrtc_server.microphone_track.get_stats()
+                        if webrtc_server.microphone_track
+                        else None
+                    ),
+                },
+            )
+        except Exception as e:
+            log.error(f"error publishing onboard_ui_metrics: {e}")
+
+
+def handle_connect(websocket):
+    """Called by the hub state monitor, on its event loop, on (re)connect."""
+    global metrics_task
+    if metrics_task:
+        metrics_task.cancel()
+    metrics_task = asyncio.create_task(publish_metrics(websocket))
+
+
 hub_state_monitor = HubStateMonitor(
-    hub_state, "onboard_ui", ["system_stats", "primary_target", "daphbot_mode"]
+    hub_state,
+    "onboard_ui",
+    ["system_stats", "primary_target", "daphbot_mode"],
+    on_connect=handle_connect,
 )
 hub_state_monitor.start()
 
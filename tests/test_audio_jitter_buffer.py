@@ -0,0 +1,94 @@
+"""
+Unit tests for the drift compensating jitter buffer.
+"""
+
+import unittest
+
+import sys
+import os
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.audio_jitter_buffer import JitterBuffer
+from commons.audio_ring_buffer import AudioRingBuffer
+
+RATE = 48000
+FRAME = 960  # 20ms WebRTC frames
+BLOCK = 1024  # mixer callback
+
+
+def run_drift(drift, seconds, max_correction=None):
+    """
+    Plays `seconds` of a stream whose clock runs `drift` fast relative to
+    the output device's, on a virtual clock.  Returns the jitter buffer
+    and its smoothed fill level every 10 seconds.
+    """
+    ring = AudioRingBuffer(RATE // 4, 2, prefill=BLOCK + RATE // 50)
+    jitter_buffer = JitterBuffer(ring, RATE, max_correction=max_correction)
+    out = np.zeros((BLOCK, 2), dtype=np.int16)
+    frame = np.ones((FRAME, 2), dtype=np.int16)
+
+    next_write = next_read = 0.0
+    fills = []
+    while next_read < seconds:
+        if next_write <= next_read:
+            jitter_buffer.write(frame)
+            next_write += FRAME / RATE / (1 + drift)
+        else:
+            ring.read_into(out)
+            next_read += BLOCK / RATE
+            if next_read // 10 > len(fills):
+                fills.append(jitter_buffer.fill)
+    return jitter_buffer, fills
+
+
+class TestJitterBuffer(unittest.TestCase):
+    """Test varispeed continuity and drift compensation."""
+
+    def test_varispeed_is_continuous(self):
+        """Resampling a ramp across frames gives an evenly spaced ramp."""
+        jitter_buffer = JitterBuffer(AudioRingBuffer(10000, 1), RATE)
+        jitter_buffer.ratio = 1.25
+        values = np.arange(0, 4000, 4, dtype=np.int16)[:, None]
+        out = np.concatenate(
+            [
+                jitter_buffer.varispeed(values[start : start + 100])
+                for start in range(0, len(values), 100)
+            ]
+        )
+        self.assertEqual(list(out[:3, 0]), [0, 5, 10])
+        np.testing.assert_array_equal(np.diff(out[:, 0]), 5)
+        self.assertEqual(len(out), 800)
+
+    def test_no_drift_is_bit_exact(self):
+        """With no correction needed, samples pass through untouched."""
+        ring = AudioRingBuffer(1000, 2)
+        jitter_buffer = JitterBuffer(ring, RATE)
+        samples = np.arange(200, dtype=np.int16).reshape(-1, 2)
+        jitter_buffer.write(samples)
+        out = np.zeros((100, 2), dtype=np.int16)
+        ring.read_into(out)
+        np.testing.assert_array_equal(out, samples)
+
+    def test_compensates_drift(self):
+        """Latency stays near the target with clocks 500ppm apart."""
+        for drift in (0.0005, -0.0005):
+            jitter_buffer, fills = run_drift(drift, 300)
+            errors = np.array(fills[6:]) - jitter_buffer.target
+            # settles within 20ms of the target, and stays there
+            self.assertLess(max(abs(errors)), RATE * 0.02, drift)
+            self.assertLess(np.ptp(errors), RATE * 0.005, drift)
+            stats = jitter_buffer.get_stats()
+            self.assertEqual(stats["overruns"], 0)
+            self.assertLessEqual(stats["underruns"], 1)
+
+        # without compensation, latency grows by 150ms
+        jitter_buffer, fills = run_drift(0.0005, 300, max_correction=0)
+        self.assertGreater(fills[-1] - fills[0], RATE * 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+Unit tests for the audio mixer.
+"""
+
+import unittest
+import asyncio
+import threading
+from unittest.mock import patch
+
+import sys
+import os
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.audio_mixer import AudioMixer, MixerSource
+
+
+class ConstantSource(MixerSource):
+    """Plays a constant value forever."""
+
+    def __init__(self, value, **kwargs):
+        super().__init__(**kwargs)
+        self.value = value
+
+    def read(self, frames):
+        return np.full((frames, 1), self.value, dtype=np.int16)
+
+
+class TestAudioMixer(unittest.TestCase):
+    """Test mixing, gain, ducking and cancel by calling the callback."""
+
+    def setUp(self):
+        self.mixer = AudioMixer(sample_rate=48000, blocksize=4, duck_gain=0.5)
+
+    def render(self, frames=4):
+        outdata = np.zeros((frames, 2), dtype=np.int16)
+        self.mixer.callback(outdata, frames, None, None)
+        return outdata
+
+    def test_sums_and_clips(self):
+        """Sources are summed, mono to both channels, and clipped."""
+        self.mixer.add(ConstantSource(1000))
+        self.mixer.add(ConstantSource(234, gain=0.5))
+        np.testing.assert_array_equal(self.render(), np.full((4, 2), 1117))
+
+        self.mixer.add(ConstantSource(32000))
+        np.testing.assert_array_equal(self.render(), np.full((4, 2), 32767))
+
+    def test_buffer_plays_once(self):
+        """A buffer plays across blocks, pads with silence, then finishes."""
+        samples = np.arange(1, 7, dtype=np.int16).reshape(-1, 1)
+        source = self.mixer.play(samples)
+        self.assertEqual(list(self.render()[:, 0]), [1, 2, 3, 4])
+        self.assertEqual(list(self.render()[:, 1]), [5, 6, 0, 0])
+        self.assertTrue(source.wait(0))
+        self.assertEqual(self.mixer.sources, [])
+        self.assertEqual(list(self.render()[:, 0]), [0, 0, 0, 0])
+
+    def test_wait_async(self):
+        """Waits on the event loop for the audio thread to finish a source."""
+        samples = np.ones((6, 1), dtype=np.int16)
+
+        async def run_test():
+            source = self.mixer.play(samples)
+            self.assertFalse(await source.wait_async(timeout=0.01))
+            threading.Timer(0.01, lambda: [self.render(), self.render()]).start()
+            return await source.wait_async(timeout=1)
+
+        self.assertTrue(asyncio.run(run_test()))
+
+    def test_play_without_stream(self):
+        """A buffer that can't be played, with no output stream, finishes."""
+        with patch.object(self.mixer, "start"):
+            source = self.mixer.play(np.ones((6, 1), dtype=np.int16))
+        self.assertTrue(source.wait(0))
+        self.assertEqual(self.mixer.sources, [])
+
+    def test_ducking_ramps(self):
+        """A ducking source attenuates the others, ramping the change."""
+        music = self.mixer.add(ConstantSource(1000))
+        self.render()
+        cue = self.mixer.play(np.zeros((8, 1), dtype=np.int16), ducks_others=True)
+        ramp = self.render()[:, 0]
+        self.assertEqual(ramp[0], 1000)
+        self.assertEqual(ramp[-1], 500)
+        self.assertTrue(all(np.diff(ramp) <= 0))
+        self.assertEqual(list(self.render()[:, 0]), [500] * 4)
+        self.assertTrue(cue.finished.is_set())
+        # back to full gain once the cue is done
+        self.assertEqual(self.render()[-1, 0], 1000)
+        self.assertEqual(music.applied_gain, 1.0)
+
+    def test_cancel_fades_out(self):
+        """A cancelled source fades out over one block and is removed."""
+        source = self.mixer.add(ConstantSource(1000))
+        self.render()
+        source.cancel()
+        fade = self.render()[:, 0]
+        self.assertEqual((fade[0], fade[-1]), (1000, 0))
+        self.assertTrue(source.wait(0))
+        self.assertEqual(self.mixer.sources, [])
+
+    def test_cancel_silent_source(self):
+        """A cancelled source with nothing to play is removed right away."""
+
+        class SilentSource(MixerSource):
+            def read(self, frames):
+                return None
+
+        source = self.mixer.add(SilentSource())
+        self.render()
+        source.cancel()
+        self.render()
+        self.assertEqual(self.mixer.sources, [])
+
+    def test_failing_source_is_removed(self):
+        """An exception from a source doesn't break the other sources."""
+
+        class FailingSource(MixerSource):
+            def read(self, frames):
+                raise ValueError("oops")
+
+        self.mixer.add(FailingSource())
+        self.mixer.add(ConstantSource(10))
+        np.testing.assert_array_equal(self.render(), np.full((4, 2), 10))
+        self.assertEqual(len(self.mixer.sources), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Unit tests for the streamed audio ring buffer.
+"""
+
+import unittest
+
+import sys
+import os
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.audio_ring_buffer import AudioRingBuffer
+
+
+def ramp(start, frames, channels=2):
+    """frames of consecutive values, the same on every channel"""
+    values = np.arange(start, start + frames, dtype=np.int16)
+    return np.repeat(values[:, None], channels, axis=1)
+
+
+class TestAudioRingBuffer(unittest.TestCase):
+    """Test sample accurate reads, wrap around, underruns and overruns."""
+
+    def test_reads_across_writes_and_wrap(self):
+        """Reads get exactly the samples written, whatever the sizes."""
+        ring = AudioRingBuffer(10, 2)
+        out = np.zeros((4, 2), dtype=np.int16)
+        written = read = 0
+        for size in [5, 2, 7, 3] * 5:
+            written += ring.write(ramp(written, size))
+            while ring.available() >= len(out):
+                self.assertEqual(ring.read_into(out), 4)
+                np.testing.assert_array_equal(out, ramp(read, 4))
+                read += 4
+        self.assertEqual(written, 85)
+        self.assertEqual(ring.get_stats()["underruns"], 0)
+        self.assertEqual(ring.get_stats()["overruns"], 0)
+
+    def test_prefill_and_underrun(self):
+        """Reading waits for prefill, and again after an underrun."""
+        ring = AudioRingBuffer(16, 1, prefill=6)
+        out = np.zeros((4, 1), dtype=np.int16)
+        ring.write(ramp(1, 4, 1))
+        self.assertEqual(ring.read_into(out), 0)
+        self.assertEqual(list(out[:, 0]), [0, 0, 0, 0])
+        ring.write(ramp(5, 4, 1))
+        self.assertEqual(ring.read_into(out), 4)
+        self.assertEqual(list(out[:, 0]), [1, 2, 3, 4])
+        self.assertEqual(ring.get_stats()["underruns"], 0)
+
+        # short read pads with silence and counts an underrun
+        ring.write(ramp(9, 2, 1))
+        self.assertEqual(ring.read_into(out), 4)
+        self.assertEqual(ring.read_into(out), 2)
+        self.assertEqual(list(out[:, 0]), [9, 10, 0, 0])
+        self.assertEqual(ring.underruns, 1)
+        # then waits for prefill again
+        ring.write(ramp(11, 4, 1))
+        self.assertEqual(ring.read_into(out), 0)
+        ring.write(ramp(15, 2, 1))
+        self.assertEqual(ring.read_into(out), 4)
+        self.assertEqual(list(out[:, 0]), [11, 12, 13, 14])
+
+    def test_overrun_drops_newest(self):
+        """Frames that don't fit are dropped and counted."""
+        ring = AudioRingBuffer(8, 1)
+        self.assertEqual(ring.write(ramp(0, 6, 1)), 6)
+        self.assertEqual(ring.write(ramp(6, 6, 1)), 2)
+        stats = ring.get_stats()
+        self.assertEqual((stats["overruns"], stats["overrun_frames"]), (1, 4))
+        out = np.zeros((8, 1), dtype=np.int16)
+        ring.read_into(out)
+        self.assertEqual(list(out[:, 0]), list(range(8)))
+
+
+if __name__ == "__main__":
+    unittest.main()
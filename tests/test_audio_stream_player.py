@@ -0,0 +1,105 @@
+"""
+Unit tests for playing WebRTC audio through the mixer.
+"""
+
+import unittest
+import asyncio
+
+import sys
+import os
+
+import av
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.audio_mixer import AudioMixer
+from commons.audio_stream_player import AudioStreamPlayer
+from commons.metrics import metrics
+
+
+def audio_frame(values, layout="stereo", sample_rate=48000):
+    """av.AudioFrame of packed int16 with values on every channel"""
+    channels = 2 if layout == "stereo" else 1
+    samples = np.repeat(np.asarray(values, dtype=np.int16)[:, None], channels, axis=1)
+    frame = av.AudioFrame.from_ndarray(
+        samples.reshape(1, -1), format="s16", layout=layout
+    )
+    frame.sample_rate = sample_rate
+    return frame
+
+
+class TestAudioStreamPlayer(unittest.TestCase):
+    """Test WebRTC frames play continuously through the mixer."""
+
+    def setUp(self):
+        self.mixer = AudioMixer(sample_rate=48000, blocksize=1024)
+        self.player = AudioStreamPlayer(self.mixer)
+
+    def play(self, frames):
+        asyncio.run(self.player.setup_audio_stream(frames[0]))
+        played = []
+        outdata = np.zeros((1024, 2), dtype=np.int16)
+        for frame in frames:
+            self.player.queue_audio_frame(frame)
+            self.mixer.callback(outdata, 1024, None, None)
+            played.append(outdata.copy())
+        return np.concatenate(played)
+
+    def test_frames_play_without_gaps(self):
+        frames = [audio_frame(np.arange(i * 960, (i + 1) * 960)) for i in range(10)]
+        played = self.play(frames)[:, 0]
+
+        # silence while prefilling, then every sample in order
+        start = np.argmax(played != 0) - 1
+        self.assertGreater(start, 0)
+        np.testing.assert_array_equal(
+            played[start:], np.arange(len(played) - start, dtype=np.int16)
+        )
+        self.assertEqual(self.player.get_stats()["underruns"], 0)
+        self.assertEqual(self.player.get_stats()["overruns"], 0)
+
+        self.player.cleanup_audio_stream()
+        self.mixer.callback(np.zeros((1024, 2), dtype=np.int16), 1024, None, None)
+        self.assertEqual(self.mixer.sources, [])
+
+    def test_converts_rate_and_layout(self):
+        """Mono 44.1kHz frames are played as stereo at the mixer's rate."""
+        frames = [audio_frame(np.full(882, 1000), "mono", 44100) for _ in range(20)]
+        played = self.play(frames)
+        self.assertTrue(np.array_equal(played[:, 0], played[:, 1]))
+        stats = self.player.get_stats()
+        # 20 x 20ms at 48kHz, less what the resampler holds back
+        buffered = stats["buffered"] + len(played) - np.argmax(played[:, 0] != 0)
+        self.assertAlmostEqual(buffered, 20 * 960, delta=100)
+        # mono is spread over both channels at -3dB
+        self.assertAlmostEqual(played[-1, 0], 707, delta=2)
+
+    def test_metrics(self):
+        """Frames, errors, frame intervals and playout latency are recorded."""
+        now = [0.0]
+        self.player = AudioStreamPlayer(self.mixer, clock=lambda: now[0])
+        metrics.snapshot(reset=True)
+        frames = [audio_frame(np.ones(960)) for _ in range(10)]
+        asyncio.run(self.player.setup_audio_stream(frames[0]))
+        outdata = np.zeros((1024, 2), dtype=np.int16)
+        for frame in frames:
+            self.player.queue_audio_frame(frame)
+            self.mixer.callback(outdata, 1024, None, None)
+            now[0] += 0.02
+        self.player.queue_audio_frame("not a frame")
+
+        stats = self.player.get_stats()
+        self.assertEqual(stats["frames_received"], 11)
+        self.assertEqual(stats["frame_errors"], 1)
+        self.assertGreaterEqual(stats["max_buffered"], stats["target"])
+        snapshot = metrics.snapshot(reset=True)
+        self.assertEqual(snapshot["audio_frame_interval"]["count"], 10)
+        self.assertAlmostEqual(snapshot["audio_frame_interval"]["p50_ms"], 20, delta=3)
+        self.assertGreater(snapshot["audio_playout_latency"]["count"], 0)
+        self.assertEqual(snapshot["audio_mix"]["count"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
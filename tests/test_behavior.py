@@ -0,0 +1,167 @@
+"""
+Unit tests for the daphbot_service behavior engine.
+"""
+
+import unittest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from basic_bot.commons.hub_state import HubState
+from commons.behavior import BehaviorEngine, BehaviorState
+
+CAT = {"classification": "cat", "confidence": 0.9, "bounding_box": [0, 0, 10, 10]}
+PERSON = {
+    "classification": "person",
+    "confidence": 0.9,
+    "bounding_box": [0, 0, 10, 10],
+}
+
+
+class TestBehaviorEngine(unittest.TestCase):
+    """Test behavior engine state transitions."""
+
+    def setUp(self):
+        self.hub_state = HubState(
+            {"servo_actual_angles": {"pan": 90, "tilt": 90}, "daphbot_mode": "auto"}
+        )
+        self.servo_scheduler = MagicMock()
+        self.detection_voter = MagicMock()
+        self.engine = BehaviorEngine(
+            self.hub_state, self.servo_scheduler, detection_voter=self.detection_voter
+        )
+
+    @patch("commons.behavior.track_target", new_callable=AsyncMock)
+    def test_pet_starts_single_dance(self, _mock_track_target):
+        """A burst of pet detections starts exactly one dance task."""
+
+        async def run_test():
+            self.engine.handle_target(None, CAT)
+            dance_task = self.engine.dance_task
+            for _ in range(10):
+                self.engine.handle_target(None, CAT)
+            self.assertIs(self.engine.dance_task, dance_task)
+            self.assertEqual(self.engine.state, BehaviorState.REACTING)
+            await dance_task
+            self.assertEqual(self.engine.state, BehaviorState.COOLDOWN)
+            self.engine.stop()
+
+        asyncio.run(run_test())
+
+    @patch("commons.behavior.track_target", new_callable=AsyncMock)
+    def test_unconfirmed_pet_is_tracked(self, mock_track_target):
+        """A pet that the detection voter hasn't confirmed doesn't dance."""
+
+        async def run_test():
+            self.engine.handle_target(None, CAT, confirmed_labels=set())
+            self.assertEqual(self.engine.state, BehaviorState.TRACKING)
+            await self.engine.track_task
+            self.engine.handle_target(None, CAT, confirmed_labels={"cat"})
+            self.assertEqual(self.engine.state, BehaviorState.REACTING)
+            self.engine.stop()
+
+        asyncio.run(run_test())
+        mock_track_target.assert_called_once()
+
+    @patch("commons.behavior.track_target", new_callable=AsyncMock)
+    def test_person_is_tracked(self, mock_track_target):
+        """A non-pet target is tracked without dancing."""
+
+        async def run_test():
+            self.engine.handle_target(None, PERSON)
+            self.assertEqual(self.engine.state, BehaviorState.TRACKING)
+            self.assertIsNone(self.engine.dance_task)
+            await self.engine.track_task
+
+        asyncio.run(run_test())
+        mock_track_target.assert_called_once()
+
+    @patch("commons.behavior.track_target", new_callable=AsyncMock)
+    def test_manual_mode_cancels_behaviors(self, _mock_track_target):
+        """Switching to manual mode cancels the dance and goes idle."""
+
+        async def run_test():
+            self.engine.handle_target(None, CAT)
+            dance_task = self.engine.dance_task
+            self.hub_state.state["daphbot_mode"] = "manual"
+            self.engine.handle_target(None, CAT)
+            self.assertEqual(self.engine.state, BehaviorState.IDLE)
+            with self.assertRaises(asyncio.CancelledError):
+                await dance_task
+            self.servo_scheduler.reset.assert_called_once()
+            self.detection_voter.reset.assert_called()
+
+        asyncio.run(run_test())
+
+    @patch("commons.behavior.AUTO_CENTER_TIMEOUT_SECONDS", 0.05)
+    @patch("commons.behavior.track_target", new_callable=AsyncMock)
+    def test_auto_center(self, _mock_track_target):
+        """Losing the target re-centers the camera without any messages."""
+
+        async def run_test():
+            self.engine.handle_target(None, PERSON)
+            await asyncio.sleep(0.03)
+            # seeing the target again pushes back the deadline
+            self.engine.handle_target(None, PERSON)
+            await asyncio.sleep(0.03)
+            self.assertEqual(self.engine.state, BehaviorState.TRACKING)
+            # vision stops publishing entirely
+            await asyncio.sleep(0.04)
+            self.assertEqual(self.engine.state, BehaviorState.IDLE)
+
+        asyncio.run(run_test())
+        self.servo_scheduler.set_goal.assert_called_once_with(90, 90)
+        self.assertEqual(self.engine.auto_center_timer.fired_count, 2)
+
+    @patch("commons.behavior.COOLDOWN_SECONDS", 0.01)
+    @patch("commons.behavior.track_target", new_callable=AsyncMock)
+    def test_cooldown_ends_on_time(self, mock_track_target):
+        """The cooldown ends and tracking resumes on the last target."""
+
+        async def run_test():
+            self.engine.handle_target(None, CAT)
+            await self.engine.dance_task
+            self.engine.handle_target(None, PERSON)
+            self.assertEqual(self.engine.state, BehaviorState.COOLDOWN)
+            await asyncio.sleep(0.02)
+            self.assertEqual(self.engine.state, BehaviorState.TRACKING)
+            self.engine.stop()
+
+        asyncio.run(run_test())
+        mock_track_target.assert_called()
+
+    @patch("commons.behavior.PATROL_DWELL_SECONDS", 0.01)
+    @patch("commons.behavior.track_target", new_callable=AsyncMock)
+    def test_patrol(self, _mock_track_target):
+        """An idle engine patrols and a target interrupts the patrol."""
+        engine = BehaviorEngine(
+            self.hub_state, self.servo_scheduler, patrol_interval=0.02
+        )
+
+        async def run_test():
+            engine.start()
+            await asyncio.sleep(0.03)
+            self.assertEqual(engine.state, BehaviorState.PATROLLING)
+            await engine.patrol_task
+            await engine.center_task
+            self.assertEqual(engine.state, BehaviorState.IDLE)
+            await asyncio.sleep(0.03)
+            self.assertEqual(engine.state, BehaviorState.PATROLLING)
+            engine.handle_target(None, PERSON)
+            self.assertEqual(engine.state, BehaviorState.TRACKING)
+            await asyncio.sleep(0)
+            self.assertTrue(engine.patrol_task.cancelled())
+            engine.stop()
+
+        asyncio.run(run_test())
+        goals = [c.args for c in self.servo_scheduler.set_goal.call_args_list]
+        self.assertEqual(goals[:3], [(45, 90), (135, 90), (90, 90)])
+
+
+if __name__ == "__main__":
+    unittest.main()
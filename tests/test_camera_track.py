@@ -0,0 +1,125 @@
+"""
+Unit tests for the shared robot camera stream.
+"""
+
+import unittest
+import asyncio
+import tempfile
+from types import SimpleNamespace
+
+import sys
+import os
+
+import av
+from aiortc.mediastreams import MediaStreamError
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.camera_track import (
+    CameraStream,
+    CameraTrack,
+    ContainerSource,
+    SyntheticSource,
+)
+
+
+def packet(number, is_keyframe=False):
+    return SimpleNamespace(number=number, is_keyframe=is_keyframe)
+
+
+class TestCameraTrack(unittest.TestCase):
+    """Test that viewers start, and catch up, at keyframes."""
+
+    def setUp(self):
+        self.stream = CameraStream(source="synthetic", width=160, height=120, fps=15)
+
+    def test_starts_at_keyframe(self):
+        async def run_test():
+            track = CameraTrack(self.stream, max_queued=10)
+            for number, is_keyframe in enumerate([False, False, True, False]):
+                track.put(packet(number, is_keyframe))
+            return [(await track.recv()).number for _ in range(2)]
+
+        self.assertEqual(asyncio.run(run_test()), [2, 3])
+        self.assertEqual(self.stream.skipped_packets, 2)
+
+    def test_skips_to_keyframe_when_behind(self):
+        async def run_test():
+            track = CameraTrack(self.stream, max_queued=3)
+            track.put(packet(0, is_keyframe=True))
+            for number in range(1, 5):
+                track.put(packet(number))
+            self.assertTrue(self.stream.keyframe_requested)
+            track.put(packet(5, is_keyframe=True))
+            return await track.recv()
+
+        self.assertEqual(asyncio.run(run_test()).number, 5)
+        # 0 - 2 were queued, 3 and 4 weren't keyframes
+        self.assertEqual(self.stream.skipped_packets, 5)
+
+    def test_stop_ends_recv(self):
+        async def run_test():
+            track = CameraTrack(self.stream, max_queued=10)
+            recv = asyncio.create_task(track.recv())
+            await asyncio.sleep(0.01)
+            track.stop()
+            with self.assertRaises(MediaStreamError):
+                await asyncio.wait_for(recv, 1)
+
+        asyncio.run(run_test())
+
+    def test_encodes_while_subscribed(self):
+        async def run_test():
+            first = self.stream.subscribe()
+            second = self.stream.subscribe()
+            packets = [await first.recv(), await second.recv()]
+            self.assertIs(packets[0], packets[1])
+            self.assertTrue(packets[0].is_keyframe)
+            first.stop()
+            self.assertIsNotNone(self.stream.task)
+            second.stop()
+            self.assertIsNone(self.stream.task)
+
+        asyncio.run(run_test())
+
+
+class TestCameraStream(unittest.TestCase):
+    """Test scaling, encoding and sources."""
+
+    def test_encode(self):
+        """Frames are scaled and encoded, with keyframes on request."""
+        stream = CameraStream(source="synthetic", width=160, height=120, fps=15)
+        source = SyntheticSource(640, 480)
+        packets = []
+        for i in range(10):
+            if i == 5:
+                stream.request_keyframe()
+            packets += stream.encode(source.read(), i * 6000)
+        self.assertEqual([i for i, p in enumerate(packets) if p.is_keyframe], [0, 5])
+        self.assertEqual((stream.codec.width, stream.codec.height), (160, 120))
+        self.assertEqual(packets[1].pts, 6000)
+        self.assertEqual(stream.get_stats()["frames_encoded"], 10)
+
+    def test_file_source_loops(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "camera.mp4")
+            with av.open(path, "w") as container:
+                video = container.add_stream("mpeg4", rate=15)
+                video.width, video.height = 64, 48
+                source = SyntheticSource(64, 48)
+                for _ in range(3):
+                    for p in video.encode(source.read().reformat(format="yuv420p")):
+                        container.mux(p)
+                for p in video.encode():
+                    container.mux(p)
+
+            source = ContainerSource(path)
+            frames = [source.read() for _ in range(7)]
+            source.close()
+        self.assertFalse(source.live)
+        self.assertEqual([f.width for f in frames], [64] * 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,15 @@
+import os
 import time
 import basic_bot.test_helpers.central_hub as hub
 import basic_bot.test_helpers.start_stop as sst
 
 
 def setup_module():
+    # drop targets as soon as they're not recognized, rather than keeping
+    # the primary target at its predicted position for a few updates, so
+    # that each update below changes the primary target
+    os.environ["D2_TRACKER_MAX_MISSES"] = "0"
+
     # start the central hub and any other services needed to test your service
     sst.start_service("central_hub", "python -m basic_bot.services.central_hub")
     sst.start_service("daphbot_service", "python src/daphbot_service.py")
@@ -47,6 +53,18 @@ PERSON_RECOGNIZED = {
 }
 
 
+def assert_primary_target(updated_state, recognized_object):
+    assert updated_state["type"] == "stateUpdate"
+    primary_target = updated_state["data"]["primary_target"]
+    # the tracker adds track_id, age and velocity to the recognized object
+    assert {
+        k: v for k, v in primary_target.items() if k in recognized_object
+    } == recognized_object
+    assert isinstance(primary_target["track_id"], int)
+    assert primary_target["age"] >= 0
+    assert len(primary_target["velocity"]) == 2
+
+
 class TestDaphbotService:
     def test_daphbot_service(self):
         ws_mock_vision = hub.connect("test_daphbot_service:mock_vision_service")
@@ -68,10 +86,7 @@ class TestDaphbotService:
         hub.send_update_state(ws_mock_vision, PET_RECOGNIZED)
 
         updated_state = hub.recv(ws_mock_vision)
-        assert updated_state == {
-            "type": "stateUpdate",
-            "data": {"primary_target": PET_RECOGNIZED["recognition"][0]},
-        }
+        assert_primary_target(updated_state, PET_RECOGNIZED["recognition"][0])
 
         time.sleep(0.5)
         # then send a recognition without any pets to prevent
@@ -79,10 +94,7 @@ class TestDaphbotService:
         hub.send_update_state(ws_mock_vision, PERSON_RECOGNIZED)
 
         updated_state = hub.recv(ws_mock_vision)
-        assert updated_state == {
-            "type": "stateUpdate",
-            "data": {"primary_target": PERSON_RECOGNIZED["recognition"][0]},
-        }
+        assert_primary_target(updated_state, PERSON_RECOGNIZED["recognition"][0])
 
         time.sleep(0.5)
 
@@ -0,0 +1,69 @@
+"""
+Unit tests for temporal detection voting.
+"""
+
+import unittest
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.detection_voter import DetectionVoter
+
+CAT = {"classification": "cat", "confidence": 0.8, "bounding_box": [0, 0, 10, 10]}
+PERSON = {
+    "classification": "person",
+    "confidence": 0.9,
+    "bounding_box": [0, 0, 10, 10],
+}
+
+
+class TestDetectionVoter(unittest.TestCase):
+    def test_n_of_m(self):
+        voter = DetectionVoter(
+            labels=["cat", "dog"], votes=3, window_frames=5, integral_threshold=0
+        )
+        frames = [[CAT], [], [CAT], [PERSON], [CAT], [], [], [CAT], []]
+        confirmed = [
+            bool(voter.update(frame, now=i * 0.1)) for i, frame in enumerate(frames)
+        ]
+        # the 3rd cat in 5 frames confirms, then the 1st cat falls out of
+        # the window
+        self.assertEqual(
+            confirmed, [False, False, False, False, True, False, False, False, False]
+        )
+
+    def test_single_frame_false_positive(self):
+        voter = DetectionVoter(labels=["cat"], votes=2, window_frames=3)
+        self.assertEqual(voter.update([CAT], now=0), set())
+        for i in range(1, 10):
+            self.assertEqual(voter.update([PERSON], now=i * 0.1), set())
+
+    def test_confidence_integral(self):
+        voter = DetectionVoter(
+            labels=["cat"],
+            votes=100,
+            window_frames=100,
+            integral_threshold=0.4,
+            integral_window=1.0,
+        )
+        confirmed = set()
+        for i in range(10):
+            confirmed = voter.update([CAT], now=i * 0.1)
+            if confirmed:
+                break
+        # 0.8 confidence * 0.1s per frame: 5 frames after the first
+        self.assertEqual(confirmed, {"cat"})
+        self.assertEqual(i, 5)
+
+        # the integral decays once the cat is gone
+        for j in range(i + 1, i + 12):
+            confirmed = voter.update([], now=j * 0.1)
+        self.assertEqual(confirmed, set())
+        self.assertAlmostEqual(voter.integrals[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
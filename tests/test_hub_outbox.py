@@ -0,0 +1,138 @@
+"""
+Unit tests for the single writer hub outbox.
+"""
+
+import unittest
+import asyncio
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.hub_outbox import HubOutbox, QUEUE
+
+
+class TestHubOutbox(unittest.TestCase):
+    """Test merging, drop policies and backpressure."""
+
+    def setUp(self):
+        self.sent = []
+        self.send_delay = 0
+
+    async def send(self, websocket, data):
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        self.sent.append((websocket, data))
+
+    def test_merges_same_tick_updates(self):
+        """Updates put in the same tick go in one message."""
+        outbox = HubOutbox(send=self.send)
+
+        async def run_test():
+            outbox.put("ws", "primary_target", {"classification": "cat"})
+            outbox.put("ws", "servo_angles", {"pan": 90, "tilt": 90})
+            await asyncio.sleep(0.01)
+            outbox.put("ws", "servo_angles", {"pan": 91, "tilt": 90})
+            await asyncio.sleep(0.01)
+
+        asyncio.run(run_test())
+        self.assertEqual(
+            self.sent,
+            [
+                (
+                    "ws",
+                    {
+                        "primary_target": {"classification": "cat"},
+                        "servo_angles": {"pan": 90, "tilt": 90},
+                    },
+                ),
+                ("ws", {"servo_angles": {"pan": 91, "tilt": 90}}),
+            ],
+        )
+        self.assertEqual(outbox.get_stats()["messages_sent"], 2)
+        self.assertEqual(outbox.get_stats()["updates_sent"], 3)
+
+    def test_max_delay_waits_for_next_update(self):
+        """Keys with a max delay ride along with the next urgent update."""
+        outbox = HubOutbox(send=self.send, max_delays={"primary_target": 0.05})
+
+        async def run_test():
+            outbox.put("ws", "primary_target", {"classification": "cat"})
+            await asyncio.sleep(0.01)
+            self.assertEqual(self.sent, [])
+            outbox.put("ws", "servo_angles", {"pan": 90, "tilt": 90})
+            await asyncio.sleep(0.01)
+            self.assertEqual(len(self.sent), 1)
+            # with nothing to ride along with, it is sent at max delay
+            outbox.put("ws", "primary_target", None)
+            await asyncio.sleep(0.03)
+            self.assertEqual(len(self.sent), 1)
+            await asyncio.sleep(0.04)
+
+        asyncio.run(run_test())
+        self.assertEqual(
+            [data for _ws, data in self.sent],
+            [
+                {
+                    "primary_target": {"classification": "cat"},
+                    "servo_angles": {"pan": 90, "tilt": 90},
+                },
+                {"primary_target": None},
+            ],
+        )
+
+    def test_latest_wins_while_hub_is_slow(self):
+        """While a send is in flight, LATEST keys coalesce."""
+        outbox = HubOutbox(send=self.send)
+        self.send_delay = 0.02
+
+        async def run_test():
+            for pan in range(10):
+                outbox.put("ws", "servo_angles", {"pan": pan, "tilt": 90})
+                await asyncio.sleep(0.005)
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run_test())
+        pans = [data["servo_angles"]["pan"] for _ws, data in self.sent]
+        self.assertLess(len(pans), 10)
+        self.assertEqual(pans[-1], 9)
+        self.assertEqual(pans, sorted(pans))
+        stats = outbox.get_stats()
+        self.assertEqual(stats["dropped"]["servo_angles"], 10 - len(pans))
+        self.assertEqual(stats["depth"], 0)
+
+    def test_queue_policy(self):
+        """QUEUE keys send every value in order, dropping the oldest."""
+        outbox = HubOutbox(send=self.send, policies={"event": QUEUE}, max_queue=3)
+
+        async def run_test():
+            for i in range(5):
+                outbox.put("ws", "event", i)
+            outbox.put("ws", "state", "a")
+            self.assertEqual(outbox.get_stats()["max_depth"], 4)
+            await asyncio.sleep(0.01)
+
+        asyncio.run(run_test())
+        self.assertEqual(
+            [data for _ws, data in self.sent],
+            [{"state": "a", "event": 2}, {"event": 3}, {"event": 4}],
+        )
+        self.assertEqual(outbox.get_stats()["dropped"], {"event": 2})
+
+    def test_reconnect_discards_pending(self):
+        """Updates pending for an old websocket aren't sent on the new one."""
+        outbox = HubOutbox(send=self.send)
+
+        async def run_test():
+            outbox.put("old", "servo_angles", {"pan": 1, "tilt": 1})
+            outbox.put("new", "primary_target", None)
+            await asyncio.sleep(0.01)
+
+        asyncio.run(run_test())
+        self.assertEqual(self.sent, [("new", {"primary_target": None})])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Unit tests for recording and reading hub traffic.
+"""
+
+import unittest
+import tempfile
+from unittest.mock import patch
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons import hub_recording
+from commons.hub_recording import HubTrafficRecorder, read_hub_traffic
+
+RECOGNITION = [
+    {"classification": "cat", "confidence": 0.9, "bounding_box": [0, 0, 10, 10]}
+]
+
+
+class TestHubRecording(unittest.TestCase):
+    """Test the hub traffic recording round trip."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, "traffic.jsonl.gz")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_round_trip(self):
+        """Recorded keys are read back in order; other keys are dropped."""
+        recorder = HubTrafficRecorder(self.path, ["recognition", "daphbot_mode"])
+        recorder.record("state", {"recognition": RECOGNITION, "system_stats": {}})
+        recorder.record("stateUpdate", {"system_stats": {"cpu": 1}})
+        recorder.record("stateUpdate", {"daphbot_mode": "manual"})
+        recorder.close()
+
+        header, messages = read_hub_traffic(self.path)
+        self.assertEqual(header["keys"], ["recognition", "daphbot_mode"])
+        messages = list(messages)
+        self.assertEqual(
+            [(msg_type, data) for _t, msg_type, data in messages],
+            [
+                ("state", {"recognition": RECOGNITION}),
+                ("stateUpdate", {"daphbot_mode": "manual"}),
+            ],
+        )
+        self.assertLessEqual(messages[0][0], messages[1][0])
+
+    def test_read_unclosed_recording(self):
+        """A recording that was never closed is read up to its last flush."""
+        recorder = HubTrafficRecorder(self.path, ["daphbot_mode"])
+        for _ in range(hub_recording.FLUSH_INTERVAL + 50):
+            recorder.record("stateUpdate", {"daphbot_mode": "auto"})
+        # like a killed service: copy what's on disk without closing
+        with open(self.path, "rb") as file:
+            unclosed = file.read()
+        recorder.close()
+        with open(self.path, "wb") as file:
+            file.write(unclosed)
+
+        _header, messages = read_hub_traffic(self.path)
+        self.assertEqual(len(list(messages)), hub_recording.FLUSH_INTERVAL)
+
+    def test_flushes_after_seconds(self):
+        """A slow trickle of messages is flushed on time, not just count."""
+        recorder = HubTrafficRecorder(self.path, ["daphbot_mode"])
+        with patch.object(recorder.file, "flush") as flush:
+            recorder.record("stateUpdate", {"daphbot_mode": "auto"})
+            flush.assert_not_called()
+            recorder.flushed_at -= hub_recording.FLUSH_SECONDS
+            recorder.record("stateUpdate", {"daphbot_mode": "manual"})
+            flush.assert_called_once()
+        recorder.close()
+        recorder.close()
+        recorder.record("stateUpdate", {"daphbot_mode": "auto"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""
+Unit tests for the latest-wins mailbox.
+"""
+
+import unittest
+import asyncio
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.mailbox import LatestMailbox
+
+
+class TestLatestMailbox(unittest.TestCase):
+    """Test coalescing behavior of LatestMailbox."""
+
+    def test_latest_item_wins(self):
+        """Unconsumed items are replaced and counted as dropped."""
+        mailbox = LatestMailbox()
+
+        async def run_test():
+            for i in range(5):
+                mailbox.put(i)
+            return await mailbox.get()
+
+        self.assertEqual(asyncio.run(run_test()), 4)
+        self.assertEqual(mailbox.get_stats(), {"received": 5, "dropped": 4})
+
+    def test_get_waits_for_put(self):
+        """get() blocks until an item is put."""
+        mailbox = LatestMailbox()
+
+        async def run_test():
+            getter = asyncio.create_task(mailbox.get())
+            await asyncio.sleep(0.01)
+            self.assertFalse(getter.done())
+            mailbox.put("recognition")
+            return await getter
+
+        self.assertEqual(asyncio.run(run_test()), "recognition")
+        self.assertEqual(mailbox.dropped_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
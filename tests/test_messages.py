@@ -0,0 +1,94 @@
+"""
+Unit tests for primary_target publishing.
+"""
+
+import unittest
+from unittest.mock import patch
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons import messages
+
+CAT = {
+    "classification": "cat",
+    "confidence": 0.9,
+    "bounding_box": [100, 100, 200, 200],
+    "track_id": 1,
+    "age": 0.5,
+    "velocity": [0, 0],
+}
+
+
+def moved(target, **changes):
+    return {**target, **changes}
+
+
+@patch("commons.constants.D2_PRIMARY_TARGET_BBOX_QUANTUM", 4.0)
+@patch("commons.constants.D2_PRIMARY_TARGET_CONFIDENCE_DELTA", 0.1)
+@patch("commons.constants.D2_PRIMARY_TARGET_MAX_STALENESS_SECONDS", 1.0)
+class TestSendPrimaryTarget(unittest.TestCase):
+    """Test that only meaningful primary_target changes are published."""
+
+    def setUp(self):
+        messages.last_primary_target_sent = None
+        messages.last_primary_target_sent_at = 0.0
+
+    def send(self, primary_target, **kwargs):
+        with patch.object(messages.hub_outbox, "put") as mock_put:
+            messages.send_primary_target(None, primary_target, **kwargs)
+        return mock_put.called
+
+    def test_jitter_is_suppressed(self):
+        """Pixel jitter, age and velocity alone are not published."""
+        self.assertTrue(self.send(CAT))
+        self.assertFalse(
+            self.send(
+                moved(
+                    CAT,
+                    bounding_box=[102, 99, 203, 201],
+                    confidence=0.85,
+                    age=0.6,
+                    velocity=[3, 1],
+                )
+            )
+        )
+
+    def test_meaningful_changes_are_sent(self):
+        """Moves, confidence changes and new objects are published."""
+        self.assertTrue(self.send(CAT))
+        self.assertTrue(self.send(moved(CAT, bounding_box=[104, 100, 204, 200])))
+        self.assertTrue(self.send(moved(CAT, confidence=0.75)))
+        self.assertTrue(self.send(moved(CAT, confidence=0.75, track_id=2)))
+        self.assertTrue(self.send(None))
+        self.assertFalse(self.send(None))
+
+    def test_confidence_is_optional(self):
+        """Recognitions without a confidence are compared as 0."""
+        no_confidence = {k: v for k, v in CAT.items() if k != "confidence"}
+        self.assertTrue(self.send(no_confidence))
+        self.assertFalse(self.send(no_confidence))
+        self.assertTrue(self.send(CAT))
+
+    def test_small_moves_accumulate(self):
+        """Slow drift is published once it adds up to the quantum."""
+        self.assertTrue(self.send(CAT))
+        sent = []
+        for x in range(101, 110):
+            sent.append(self.send(moved(CAT, bounding_box=[x, 100, 200, 200])))
+        self.assertEqual(sent.count(True), 2)
+
+    def test_heartbeat(self):
+        """An unchanged target is re-published after max staleness."""
+        self.assertTrue(self.send(CAT))
+        self.assertFalse(self.send(CAT))
+        messages.last_primary_target_sent_at -= 1.0
+        self.assertTrue(self.send(CAT))
+        self.assertTrue(self.send(CAT, force=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
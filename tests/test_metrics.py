@@ -0,0 +1,71 @@
+"""
+Unit tests for fixed memory latency histograms.
+"""
+
+import unittest
+from unittest.mock import patch
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.metrics import LatencyHistogram, Metrics
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        # 1ms .. 100ms
+        for i in range(1, 101):
+            histogram.record(i / 1000)
+        self.assertEqual(histogram.count, 100)
+        # buckets are ~12% wide
+        self.assertAlmostEqual(histogram.percentile(50), 0.050, delta=0.006)
+        self.assertAlmostEqual(histogram.percentile(95), 0.095, delta=0.012)
+        self.assertEqual(histogram.percentile(100), 0.1)
+
+    def test_fixed_memory(self):
+        histogram = LatencyHistogram()
+        size = histogram.counts.size
+        for i in range(10000):
+            histogram.record(i * 0.001)
+        self.assertEqual(histogram.counts.size, size)
+        self.assertEqual(histogram.percentile(100), histogram.max)
+
+    def test_empty(self):
+        self.assertEqual(
+            LatencyHistogram().snapshot(),
+            {"count": 0, "p50_ms": 0, "p95_ms": 0, "p99_ms": 0, "max_ms": 0},
+        )
+
+
+class TestMetrics(unittest.TestCase):
+    def test_snapshot_reset(self):
+        metrics = Metrics()
+        metrics.record("selection", 0.002)
+        metrics.record("selection", 0.004)
+        snapshot = metrics.snapshot(reset=True)
+        self.assertEqual(snapshot["selection"]["count"], 2)
+        self.assertEqual(snapshot["selection"]["max_ms"], 4.0)
+        self.assertEqual(metrics.snapshot()["selection"]["count"], 0)
+
+    def test_record_during_snapshot(self):
+        """A histogram created, e.g. by the audio thread, mid snapshot."""
+        metrics = Metrics()
+        metrics.record("selection", 0.002)
+        summarize = LatencyHistogram.snapshot
+
+        def snapshot_and_record(histogram):
+            metrics.record("audio_mix", 0.001)
+            return summarize(histogram)
+
+        with patch.object(LatencyHistogram, "snapshot", snapshot_and_record):
+            snapshot = metrics.snapshot(reset=True)
+        self.assertEqual(list(snapshot), ["selection"])
+        self.assertEqual(metrics.snapshot()["audio_mix"]["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
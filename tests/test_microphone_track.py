@@ -0,0 +1,97 @@
+"""
+Unit tests for the robot microphone track.
+"""
+
+import unittest
+import asyncio
+import threading
+
+import sys
+import os
+
+import numpy as np
+from aiortc.mediastreams import MediaStreamError
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.microphone_track import MicrophoneTrack, FRAME_POOL_SIZE
+
+PACKET = 960
+
+
+def block(value, frames=PACKET):
+    return np.full((frames, 1), value, dtype=np.int16)
+
+
+class TestMicrophoneTrack(unittest.TestCase):
+    """Test capture through the ring buffer to reused av frames."""
+
+    def setUp(self):
+        self.track = MicrophoneTrack()
+
+    def test_recv_waits_for_audio_thread(self):
+        """recv() waits, without blocking the loop, for the callback."""
+
+        async def run_test():
+            def capture():
+                # half a packet, then the rest, like a smaller device block
+                self.track.callback(block(1, PACKET // 2), PACKET // 2, None, None)
+                self.track.callback(block(2, PACKET // 2), PACKET // 2, None, None)
+
+            recv = asyncio.create_task(self.track.recv())
+            await asyncio.sleep(0.01)
+            self.assertFalse(recv.done())
+            threading.Thread(target=capture).start()
+            return await asyncio.wait_for(recv, 1)
+
+        frame = asyncio.run(run_test())
+        samples = frame.to_ndarray()[0]
+        self.assertEqual(len(samples), PACKET)
+        self.assertEqual((samples[0], samples[-1]), (1, 2))
+        self.assertEqual((frame.pts, frame.sample_rate), (0, 48000))
+
+    def test_frames_are_reused(self):
+        """Frames come from a pool, with pts advancing per packet."""
+
+        async def run_test():
+            frames = []
+            for i in range(FRAME_POOL_SIZE + 1):
+                self.track.callback(block(i), PACKET, None, None)
+                frame = await self.track.recv()
+                frames.append((frame, frame.pts, frame.to_ndarray()[0, 0]))
+            return frames
+
+        frames = asyncio.run(run_test())
+        count = FRAME_POOL_SIZE + 1
+        self.assertEqual([pts for _f, pts, _v in frames], [i * 960 for i in range(count)])
+        self.assertEqual([value for _f, _p, value in frames], list(range(count)))
+        self.assertIs(frames[0][0], frames[-1][0])
+        self.assertEqual(len({id(f) for f, _p, _v in frames}), FRAME_POOL_SIZE)
+
+    def test_skips_audio_when_behind(self):
+        """Audio older than the max latency is skipped, not sent late."""
+
+        async def run_test():
+            for i in range(10):
+                self.track.callback(block(i), PACKET, None, None)
+            return await self.track.recv()
+
+        frame = asyncio.run(run_test())
+        # 100ms (5 packets) of the 200ms captured are kept
+        self.assertEqual(frame.to_ndarray()[0, 0], 5)
+        self.assertEqual(self.track.get_stats()["skipped_frames"], 5 * PACKET)
+
+    def test_stop_ends_recv(self):
+        async def run_test():
+            recv = asyncio.create_task(self.track.recv())
+            await asyncio.sleep(0.01)
+            self.track.stop()
+            with self.assertRaises(MediaStreamError):
+                await asyncio.wait_for(recv, 1)
+
+        asyncio.run(run_test())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Unit tests for the pan / tilt PID controller.
+"""
+
+import unittest
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.pan_tilt_controller import PIDController, PanTiltController
+
+
+def make_pid(**kwargs):
+    params = dict(
+        kp=0.5, ki=0.0, kd=0.0, deadband=1.0, integral_limit=5.0, output_limit=10.0
+    )
+    params.update(kwargs)
+    return PIDController(**params)
+
+
+class TestPIDController(unittest.TestCase):
+    def test_deadband(self):
+        pid = make_pid(ki=1.0)
+        self.assertEqual(pid.update(0.9, 0.1), 0.0)
+        self.assertEqual(pid.integral, 0.0)
+
+    def test_proportional(self):
+        self.assertAlmostEqual(make_pid().update(8.0, 0.1), 4.0)
+
+    def test_output_limit(self):
+        self.assertEqual(make_pid().update(100.0, 0.1), 10.0)
+        self.assertEqual(make_pid().update(-100.0, 0.1), -10.0)
+
+    def test_anti_windup(self):
+        """The integral does not grow while saturated and is clamped."""
+        pid = make_pid(kp=0.0, ki=1.0, output_limit=100.0)
+        for _ in range(100):
+            pid.update(10.0, 0.1)
+        self.assertEqual(pid.integral, 5.0)
+
+        saturated = make_pid(ki=1.0)
+        for _ in range(10):
+            saturated.update(100.0, 0.1)
+        self.assertEqual(saturated.integral, 0.0)
+
+    def test_converges(self):
+        """A static target is centered in a few moves."""
+        pid = make_pid(kp=0.9)
+        error = 20.0
+        moves = 0
+        while True:
+            step = pid.update(error, 0.1)
+            if step == 0:
+                break
+            error -= step
+            moves += 1
+        self.assertLessEqual(moves, 3)
+        self.assertLessEqual(abs(error), 1.0)
+
+
+class TestPanTiltController(unittest.TestCase):
+    def test_new_track_resets(self):
+        controller = PanTiltController(
+            kp=0.0, ki=1.0, kd=0.0, deadband=0.0, integral_limit=5.0, output_limit=10.0
+        )
+        controller.update(5.0, 5.0, 0.0, track_id=1)
+        controller.update(5.0, 5.0, 1.0, track_id=1)
+        self.assertEqual(controller.pan.integral, 5.0)
+        controller.update(5.0, 5.0, 2.0, track_id=2)
+        self.assertEqual(controller.pan.integral, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
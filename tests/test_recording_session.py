@@ -0,0 +1,125 @@
+"""
+Unit tests for video recording sessions.
+"""
+
+import unittest
+import asyncio
+import json
+import tempfile
+import time
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.recording_session import RecordingSessionManager
+
+CAT = {"classification": "cat", "confidence": 0.9, "bounding_box": [0, 0, 10, 10]}
+PERSON = {
+    "classification": "person",
+    "confidence": 0.9,
+    "bounding_box": [0, 0, 10, 10],
+}
+
+
+class TestRecordingSessionManager(unittest.TestCase):
+    """Test opening, chaining and closing recording sessions."""
+
+    def setUp(self):
+        self.requests = []
+        self.changes = []
+
+    def send_request(self, duration):
+        self.requests.append((time.time(), duration))
+
+    def create_manager(self, **kwargs):
+        return RecordingSessionManager(
+            self.send_request,
+            segment_seconds=kwargs.pop("segment_seconds", 0.05),
+            tail_seconds=kwargs.pop("tail_seconds", 0.02),
+            on_change=self.changes.append,
+            **kwargs,
+        )
+
+    def test_single_sighting(self):
+        """One sighting records one segment and closes the session."""
+        manager = self.create_manager()
+
+        async def run_test():
+            manager.target_seen(CAT)
+            await manager.task
+
+        asyncio.run(run_test())
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.requests[0][1], 0.05)
+        session = self.changes[-1]
+        self.assertEqual(session["classes"], ["cat"])
+        self.assertEqual(session["segments"], 1)
+        self.assertAlmostEqual(
+            session["ended_at"] - session["started_at"], 0.05, delta=0.02
+        )
+        self.assertIsNone(manager.session)
+
+    def test_chains_segments_while_in_view(self):
+        """A target that stays in view gets back to back segments."""
+        manager = self.create_manager()
+
+        async def run_test():
+            manager.target_seen(CAT)
+            task = manager.task
+            for _ in range(12):
+                await asyncio.sleep(0.01)
+                manager.target_seen(PERSON)
+            self.assertIs(manager.task, task)
+            await task
+
+        asyncio.run(run_test())
+        self.assertGreaterEqual(len(self.requests), 3)
+        gaps = [b[0] - a[0] for a, b in zip(self.requests, self.requests[1:])]
+        for gap in gaps:
+            self.assertAlmostEqual(gap, 0.05, delta=0.02)
+        session = self.changes[-1]
+        self.assertEqual(session["classes"], ["cat", "person"])
+        self.assertEqual(session["segments"], len(self.requests))
+        self.assertEqual(manager.get_stats()["sessions"], 1)
+
+    def test_max_session(self):
+        """Sessions are closed at max_session_seconds."""
+        manager = self.create_manager(max_session_seconds=0.1)
+
+        async def run_test():
+            manager.target_seen(CAT)
+            task = manager.task
+            while not task.done():
+                await asyncio.sleep(0.01)
+                manager.target_seen(CAT)
+            self.assertEqual(manager.get_stats()["sessions"], 2)
+            await manager.task
+
+        asyncio.run(run_test())
+        closed = [session for session in self.changes if session["ended_at"]]
+        self.assertEqual(closed[0]["segments"], 2)
+
+    def test_saves_closed_sessions(self):
+        """Closed sessions are appended to the sessions file."""
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, "logs", "sessions.jsonl")
+            manager = self.create_manager(sessions_file=path)
+
+            async def run_test():
+                for _ in range(2):
+                    manager.target_seen(CAT)
+                    await manager.task
+
+            asyncio.run(run_test())
+            with open(path) as f:
+                sessions = [json.loads(line) for line in f]
+        self.assertEqual(len(sessions), 2)
+        self.assertEqual(sessions[0]["classes"], ["cat"])
+        self.assertIsNotNone(sessions[0]["ended_at"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Unit tests for the servo command scheduler.
+"""
+
+import unittest
+import asyncio
+from unittest.mock import patch
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from basic_bot.commons.hub_state import HubState
+from commons.servo_scheduler import ServoScheduler
+
+SERVO_CONFIG = {
+    "servos": [
+        {"name": "pan", "channel": 0, "motor_range": 180},
+        {"name": "tilt", "channel": 1, "motor_range": 180, "min_angle": 65},
+    ]
+}
+
+
+class TestServoScheduler(unittest.TestCase):
+    def setUp(self):
+        self.hub_state = HubState(
+            {
+                "servo_config": SERVO_CONFIG,
+                "servo_actual_angles": {"pan": 90, "tilt": 90},
+            }
+        )
+        self.sent = []
+        # 100Hz, 10 degrees per tick
+        self.scheduler = ServoScheduler(
+            self.hub_state,
+            control_hz=100,
+            max_slew_dps=1000,
+            on_send=lambda pan, tilt: self.sent.append((pan, tilt)),
+        )
+        self.scheduler.websocket = "websocket"
+
+    def run_ticks(self, ticks):
+        async def run_test():
+            await asyncio.sleep(ticks / 100)
+            self.scheduler.task.cancel()
+
+        return run_test()
+
+    def test_clamps_to_servo_config(self):
+        self.assertEqual(self.scheduler.clamp("tilt", 10), 65)
+        self.assertEqual(self.scheduler.clamp("pan", 200), 180)
+        self.assertEqual(self.scheduler.clamp("unknown", -5), 0)
+
+    @patch("commons.servo_scheduler.send_servo_angles")
+    def test_slew_limited_and_deduped(self, mock_send_servo_angles):
+        async def run_test():
+            # many behaviors requesting the same goal
+            for _ in range(10):
+                self.scheduler.set_goal(120, 60)
+            await self.run_ticks(10)
+
+        asyncio.run(run_test())
+        self.assertEqual(self.sent, [(100, 80), (110, 70), (120, 65)])
+        self.assertEqual(mock_send_servo_angles.call_count, 3)
+        self.assertEqual(self.scheduler.sent_count, 3)
+
+    @patch("commons.servo_scheduler.send_servo_angles")
+    def test_reset(self, mock_send_servo_angles):
+        async def run_test():
+            self.scheduler.set_goal(90, 90)
+            await asyncio.sleep(0.03)
+            self.scheduler.reset()
+            self.hub_state.state["servo_actual_angles"] = {"pan": 0, "tilt": 90}
+            self.scheduler.set_goal(5, 90)
+            await self.run_ticks(5)
+
+        asyncio.run(run_test())
+        self.assertEqual(self.sent, [(90, 90), (5, 90)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Unit tests for the preloaded sound bank.
+"""
+
+import unittest
+import tempfile
+from unittest.mock import patch
+
+import sys
+import os
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.sound import SoundBank
+
+SAMPLES = np.arange(6, dtype=np.int16).reshape(-1, 1)
+
+
+class TestSoundBank(unittest.TestCase):
+    """Test preloading and the on disk cache."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.media_path = os.path.join(self.tempdir.name, "media")
+        self.cache_dir = os.path.join(self.tempdir.name, "cache")
+        os.makedirs(self.media_path)
+        self.write_sound("woof.mp3", b"woof")
+        self.write_sound("notes.txt", b"not a sound")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write_sound(self, file_name, data):
+        with open(os.path.join(self.media_path, file_name), "wb") as f:
+            f.write(data)
+
+    def create_bank(self):
+        return SoundBank(self.media_path, self.cache_dir, sample_rate=48000)
+
+    @patch.object(SoundBank, "decode", return_value=SAMPLES)
+    def test_load_decodes_once(self, mock_decode):
+        """Every sound is decoded at load and never again."""
+        bank = self.create_bank()
+        bank.load()
+        woof = os.path.join(self.media_path, "woof.mp3")
+        self.assertEqual(list(bank.sounds), [woof])
+        np.testing.assert_array_equal(bank.get(woof), SAMPLES)
+        bank.get(woof)
+        mock_decode.assert_called_once_with(woof)
+
+    @patch.object(SoundBank, "decode", return_value=SAMPLES)
+    def test_restart_uses_cache(self, mock_decode):
+        """A new bank loads cached buffers instead of decoding."""
+        self.create_bank().load()
+        bank = self.create_bank()
+        bank.load()
+        self.assertEqual(mock_decode.call_count, 1)
+        woof = bank.get(os.path.join(self.media_path, "woof.mp3"))
+        self.assertEqual(woof.dtype, np.int16)
+        np.testing.assert_array_equal(woof, SAMPLES)
+
+    @patch.object(SoundBank, "decode", return_value=SAMPLES)
+    def test_changed_file_is_decoded(self, mock_decode):
+        """Changing a sound file, or the sample rate, misses the cache."""
+        self.create_bank().load()
+        self.write_sound("woof.mp3", b"woof woof")
+        self.create_bank().load()
+        SoundBank(self.media_path, self.cache_dir, sample_rate=44100).load()
+        self.assertEqual(mock_decode.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
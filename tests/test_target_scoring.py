@@ -0,0 +1,87 @@
+"""
+Unit tests for vectorized primary target scoring.
+"""
+
+import unittest
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.data import find_primary_target
+from commons.target_scoring import TargetScorer, parse_class_weights
+
+
+def recog(classification, bounding_box, confidence=0.9, **kwargs):
+    return {
+        "classification": classification,
+        "bounding_box": bounding_box,
+        "confidence": confidence,
+        **kwargs,
+    }
+
+
+class TestTargetScorer(unittest.TestCase):
+    """Test TargetScorer ranking."""
+
+    def setUp(self):
+        self.scorer = TargetScorer(
+            class_weights={"cat": 1.0, "dog": 1.0, "person": 0.8},
+            area_weight=1.0,
+            confidence_weight=0.2,
+            center_weight=0.1,
+            persistence_weight=0.3,
+            frame_size=(640, 480),
+        )
+
+    def test_parse_class_weights(self):
+        self.assertEqual(
+            parse_class_weights("cat:1.0, dog:0.5,"), {"cat": 1.0, "dog": 0.5}
+        )
+
+    def test_largest_area_wins(self):
+        """Area uses the [left, top, right, bottom] layout."""
+        small = recog("cat", [0, 0, 100, 100])
+        # wide and short; area is 400 * 50 = 20000 > 100 * 100
+        wide = recog("cat", [0, 0, 400, 50])
+        best, ranked = self.scorer.rank([small, wide])
+        self.assertIs(best, wide)
+        self.assertEqual(ranked, [wide, small])
+
+    def test_ignored_classes_are_not_ranked(self):
+        chair = recog("chair", [0, 0, 640, 480])
+        dog = recog("dog", [10, 10, 20, 20])
+        best, ranked = self.scorer.rank([chair, dog])
+        self.assertIs(best, dog)
+        self.assertEqual(ranked, [dog])
+
+    def test_no_eligible_targets(self):
+        self.assertEqual(self.scorer.rank([]), (None, []))
+        self.assertEqual(
+            self.scorer.rank([recog("chair", [0, 0, 10, 10])]), (None, [])
+        )
+
+    def test_persistence_prefers_previous_target(self):
+        """Similar sized targets don't flip-flop."""
+        left = recog("cat", [100, 100, 200, 200])
+        right = recog("cat", [400, 100, 502, 200])
+        best, _ = self.scorer.rank([left, right], previous_target=left)
+        self.assertIs(best, left)
+
+    def test_persistence_by_track_id(self):
+        first = recog("cat", [100, 100, 200, 200], track_id=1)
+        second = recog("cat", [400, 100, 502, 200], track_id=2)
+        best, _ = self.scorer.rank([first, second], previous_target={"track_id": 2})
+        self.assertIs(best, second)
+
+    def test_find_primary_target(self):
+        cat = recog("cat", [0, 0, 0, 0])
+        self.assertIs(find_primary_target({"recognition": [cat]}), cat)
+        self.assertIsNone(find_primary_target({"recognition": []}))
+        self.assertIsNone(find_primary_target({"daphbot_mode": "auto"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
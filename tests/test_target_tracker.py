@@ -0,0 +1,136 @@
+"""
+Unit tests for the multi-object target tracker.
+"""
+
+import unittest
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.target_scoring import TargetScorer
+from commons.target_tracker import TargetTracker
+
+
+def recog(classification, bounding_box, confidence=0.9):
+    return {
+        "classification": classification,
+        "bounding_box": bounding_box,
+        "confidence": confidence,
+    }
+
+
+class TestTargetTracker(unittest.TestCase):
+    """Test track association and primary target hysteresis."""
+
+    def setUp(self):
+        self.tracker = TargetTracker(
+            scorer=TargetScorer(
+                class_weights={"cat": 1.0, "dog": 1.0, "person": 0.8},
+                frame_size=(640, 480),
+            ),
+            iou_threshold=0.3,
+            max_misses=5,
+            min_hits=1,
+            switch_margin=0.1,
+            switch_frames=3,
+        )
+
+    def test_track_id_persists_while_moving(self):
+        """A moving target keeps its track_id and gets a velocity."""
+        ids = []
+        target = None
+        for frame in range(10):
+            x = 100 + frame * 5
+            target = self.tracker.update(
+                [recog("cat", [x, 100, x + 100, 200])], now=frame * 0.1
+            )
+            ids.append(target["track_id"])
+        self.assertEqual(set(ids), {1})
+        self.assertAlmostEqual(target["age"], 0.9)
+        # moving 5 pixels every 0.1s to the right
+        self.assertGreater(target["velocity"][0], 30)
+        self.assertAlmostEqual(target["velocity"][1], 0, delta=5)
+
+    def test_no_flip_flop_between_similar_targets(self):
+        """Similar sized targets don't steal the primary target."""
+        first = recog("cat", [100, 100, 200, 200])
+        second = recog("cat", [400, 100, 502, 202])
+        primary_ids = set()
+        for frame in range(10):
+            target = self.tracker.update([second, first], now=frame * 0.1)
+            primary_ids.add(target["track_id"])
+        self.assertEqual(len(primary_ids), 1)
+        self.assertEqual(self.tracker.switch_count, 0)
+
+    def test_switch_after_hysteresis(self):
+        """A much better target takes over after switch_frames updates."""
+        small = recog("cat", [100, 100, 150, 150])
+        self.tracker.update([small], now=0)
+        big = recog("dog", [300, 100, 600, 450])
+
+        target = self.tracker.update([small, big], now=0.1)
+        self.assertEqual(target["classification"], "cat")
+        target = self.tracker.update([small, big], now=0.2)
+        self.assertEqual(target["classification"], "cat")
+        target = self.tracker.update([small, big], now=0.3)
+        self.assertEqual(target["classification"], "dog")
+        self.assertEqual(self.tracker.switch_count, 1)
+
+    def test_primary_survives_missed_detection(self):
+        """A missed primary target isn't replaced by a similar target."""
+        first = recog("cat", [100, 100, 200, 200])
+        second = recog("cat", [400, 100, 502, 202])
+        for frame in range(3):
+            target = self.tracker.update([first, second], now=frame * 0.1)
+        primary_id = target["track_id"]
+        missed = second if target["bounding_box"] == first["bounding_box"] else first
+
+        target = self.tracker.update([missed], now=0.3)
+        self.assertEqual(target["track_id"], primary_id)
+        for frame in range(4, 10):
+            target = self.tracker.update([first, second], now=frame * 0.1)
+            self.assertEqual(target["track_id"], primary_id)
+        self.assertEqual(self.tracker.switch_count, 0)
+
+    def test_missed_primary_is_predicted(self):
+        """A missed primary target is where its track predicts it to be."""
+        for frame in range(5):
+            x = 100 + frame * 10
+            self.tracker.update([recog("cat", [x, 100, x + 100, 200])], now=frame * 0.1)
+        target = self.tracker.update([], now=0.5)
+        self.assertGreater(target["bounding_box"][0], 140)
+        self.assertEqual(target["track_id"], 1)
+
+    def test_lost_target(self):
+        """No target once a missed target's track expires."""
+        self.tracker.update([recog("cat", [100, 100, 200, 200])], now=0)
+        for frame in range(1, 6):
+            self.assertIsNotNone(self.tracker.update([], now=frame * 0.1))
+        self.assertIsNone(self.tracker.update([], now=0.6))
+        self.assertEqual(self.tracker.tracks, [])
+
+    def test_switch_when_primary_dropped(self):
+        """Another target takes over as soon as the primary is dropped."""
+        first = recog("cat", [100, 100, 200, 200])
+        second = recog("cat", [400, 100, 502, 202])
+        target = self.tracker.update([first], now=0)
+        for frame in range(1, 7):
+            target = self.tracker.update([second], now=frame * 0.1)
+            expected = first if frame <= 5 else second
+            self.assertEqual(target["classification"], expected["classification"])
+            self.assertEqual(target["track_id"], 1 if frame <= 5 else 2)
+
+    def test_classes_are_not_associated(self):
+        """A person in the same place as a cat is a different track."""
+        self.tracker.update([recog("cat", [0, 0, 0, 0])], now=0)
+        self.tracker.update([recog("person", [0, 0, 0, 0])], now=0.1)
+        tracks = {t.classification: t for t in self.tracker.tracks}
+        self.assertEqual(set(tracks), {"cat", "person"})
+        self.assertEqual((tracks["cat"].misses, tracks["person"].hits), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Unit tests for event loop timers.
+"""
+
+import unittest
+import asyncio
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from commons.timers import Timer
+
+
+class TestTimer(unittest.TestCase):
+    """Test arming, re-arming and cancelling timers."""
+
+    def test_rearm_replaces_and_cancel(self):
+        fired = []
+        timer = Timer(lambda: fired.append(True))
+
+        async def run_test():
+            timer.start(0.01)
+            timer.start(0.03)
+            await asyncio.sleep(0.02)
+            self.assertEqual(fired, [])
+            self.assertTrue(timer.pending)
+            await asyncio.sleep(0.02)
+            self.assertEqual(fired, [True])
+            self.assertFalse(timer.pending)
+
+            timer.start(0.01)
+            timer.cancel()
+            await asyncio.sleep(0.02)
+
+        asyncio.run(run_test())
+        self.assertEqual(timer.fired_count, 1)
+
+    def test_callback_errors_are_contained(self):
+        def fail():
+            raise ValueError("oops")
+
+        timer = Timer(fail)
+
+        async def run_test():
+            timer.start_at(0)
+            await asyncio.sleep(0.01)
+
+        asyncio.run(run_test())
+        self.assertEqual(timer.fired_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
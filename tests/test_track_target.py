@@ -0,0 +1,89 @@
+"""
+Unit tests for predictive target tracking.
+"""
+
+import unittest
+import asyncio
+from unittest.mock import MagicMock
+
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from basic_bot.commons.hub_state import HubState
+from commons import track_target as tt
+
+
+def centered_box(x_offset=0, y_offset=0, size=100):
+    cx = tt.VIEW_CENTER[0] + x_offset
+    cy = tt.VIEW_CENTER[1] + y_offset
+    return [cx - size / 2, cy - size / 2, cx + size / 2, cy + size / 2]
+
+
+class TestAnglesToCenter(unittest.TestCase):
+    def test_centered_target(self):
+        self.assertEqual(tt.angles_to_center(centered_box(), 90, 90), (90, 90))
+
+    def test_target_right_and_below(self):
+        box = centered_box(tt.PIXELS_PER_DEGREE_X * 10, tt.PIXELS_PER_DEGREE_Y * 5)
+        pan, tilt = tt.angles_to_center(box, 90, 90)
+        self.assertAlmostEqual(pan, 80)
+        self.assertAlmostEqual(tilt, 85)
+
+
+class TestTargetMotionEstimator(unittest.TestCase):
+    def test_velocity(self):
+        estimator = tt.TargetMotionEstimator()
+        for i in range(5):
+            estimator.add(i * 0.1, 90 + i * 2, 90, track_id=1)
+        pan_velocity, tilt_velocity = estimator.velocity(0.4)
+        self.assertAlmostEqual(pan_velocity, 20)
+        self.assertAlmostEqual(tilt_velocity, 0)
+
+    def test_new_track_resets_history(self):
+        estimator = tt.TargetMotionEstimator()
+        estimator.add(0, 90, 90, track_id=1)
+        estimator.add(0.1, 100, 90, track_id=2)
+        self.assertEqual(estimator.velocity(0.1), (0.0, 0.0))
+
+
+class TestLatencyEstimator(unittest.TestCase):
+    def test_servo_latency(self):
+        estimator = tt.LatencyEstimator(servo_latency=0.1, vision_latency=0.1)
+        estimator.servo_command_sent(10, 80, 90)
+        estimator.servo_actual_angles_received(10.1, {"pan": 85, "tilt": 90})
+        self.assertEqual(estimator.servo_latency, 0.1)
+        estimator.servo_actual_angles_received(10.6, {"pan": 80, "tilt": 90})
+        self.assertAlmostEqual(estimator.servo_latency, 0.1 + 0.2 * 0.5)
+        self.assertIsNone(estimator.pending_command)
+
+
+class TestTrackTarget(unittest.TestCase):
+    def setUp(self):
+        self.hub_state = HubState({"servo_actual_angles": {"pan": 90, "tilt": 90}})
+        tt.motion_estimator = tt.TargetMotionEstimator()
+        tt.latency_estimator = tt.LatencyEstimator()
+        tt.controller = tt.PanTiltController(
+            kp=1.0, ki=0.0, kd=0.0, deadband=1.5, integral_limit=10, output_limit=30
+        )
+        tt.last_track_request_time = 0
+        self.servo_scheduler = MagicMock()
+
+    def test_centered_target_does_not_move(self):
+        target = {"bounding_box": centered_box(), "track_id": 1}
+        asyncio.run(tt.track_target(self.servo_scheduler, self.hub_state, target))
+        self.servo_scheduler.set_goal.assert_not_called()
+
+    def test_moves_to_center_in_one_step(self):
+        box = centered_box(tt.PIXELS_PER_DEGREE_X * 10, -tt.PIXELS_PER_DEGREE_Y * 5)
+        target = {"bounding_box": box, "track_id": 1}
+        asyncio.run(tt.track_target(self.servo_scheduler, self.hub_state, target))
+        pan, tilt = self.servo_scheduler.set_goal.call_args[0]
+        self.assertAlmostEqual(pan, 80)
+        self.assertAlmostEqual(tilt, 95)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,8 +8,23 @@ without requiring actual camera hardware or full WebRTC connections.
 
 import unittest
 import asyncio
+import json
+import threading
+import time
 from unittest.mock import patch, MagicMock, AsyncMock
 
+import numpy as np
+import pygame
+from av import VideoFrame
+
+from aiohttp.test_utils import TestClient, TestServer
+from aiortc import (
+    AudioStreamTrack,
+    RTCPeerConnection,
+    RTCSessionDescription,
+    VideoStreamTrack,
+)
+
 import sys
 import os
 
@@ -17,8 +32,9 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
 from commons.constants import D2_OUI_WEBRTC_PORT, D2_OUI_WEBRTC_HOST
-from commons.webrtc_server import WebRTCSignalingServer
-from onboard_ui.video_renderer import VideoRenderer
+from commons.camera_track import CameraStream
+from commons.webrtc_server import WebRTCSignalingServer, restrict_video_codec
+from onboard_ui.video_renderer import CONVERT_WORKERS, VideoRenderer
 
 
 class TestWebRTCConstants(unittest.TestCase):
@@ -89,6 +105,196 @@ class TestWebRTCSignalingServer(unittest.TestCase):
         self.assertIsNone(self.server.peer_connection)
 
 
+class Browser:
+    """A browser's side of telepresence: signaling websocket and peer."""
+
+    async def connect(self, client, audio=True):
+        self.ws = await client.ws_connect("/webrtc")
+        self.pc = RTCPeerConnection()
+        self.pc.addTrack(VideoStreamTrack())
+        if audio:
+            self.pc.addTrack(AudioStreamTrack())
+        await self.pc.setLocalDescription(await self.pc.createOffer())
+        await self.ws.send_str(
+            json.dumps({"type": "offer", "sdp": self.pc.localDescription.sdp})
+        )
+        answer = json.loads((await self.ws.receive()).data)
+        await self.pc.setRemoteDescription(
+            RTCSessionDescription(sdp=answer["sdp"], type="answer")
+        )
+        return self
+
+    async def close(self):
+        await self.ws.close()
+        await self.pc.close()
+
+
+async def wait_until(condition, timeout=10):
+    started_at = time.time()
+    while not condition():
+        if time.time() - started_at > timeout:
+            raise AssertionError("timed out")
+        await asyncio.sleep(0.05)
+
+
+class TestWebRTCSessions(unittest.TestCase):
+    """Test several browsers connected at once over loopback."""
+
+    def setUp(self):
+        self.video_callback = MagicMock()
+        self.server = WebRTCSignalingServer(video_callback=self.video_callback)
+
+    def run_with_client(self, test):
+        async def run_test():
+            async with TestClient(TestServer(self.server.app)) as client:
+                await test(client)
+
+        asyncio.run(run_test())
+
+    def test_latest_session_is_active(self):
+        """The latest browser is shown; closing it tears it down."""
+
+        async def test(client):
+            first = await Browser().connect(client)
+            second = await Browser().connect(client)
+            sessions = list(self.server.sessions.values())
+            self.assertEqual(self.server.active_session, sessions[1])
+            self.assertEqual(self.server.peer_connection, sessions[1].peer_connection)
+
+            # the active session's video reaches the display
+            await wait_until(lambda: self.video_callback.call_count > 0)
+            second_pc = sessions[1].peer_connection
+            await second.close()
+            await wait_until(lambda: second_pc.connectionState == "closed")
+            self.assertEqual(len(self.server.sessions), 1)
+            self.assertEqual(self.server.active_session, sessions[0])
+            self.assertEqual(sessions[1].tasks, set())
+
+            await first.close()
+            await wait_until(lambda: not self.server.sessions)
+            self.assertIsNone(self.server.active_session)
+            self.assertIsNone(self.server.microphone_track)
+
+        self.run_with_client(test)
+
+    def test_video_only_offer(self):
+        """A browser that offers no audio gets an answer without the mic."""
+
+        async def test(client):
+            browser = await Browser().connect(client, audio=False)
+            session = self.server.active_session
+            self.assertIsNone(session.microphone_track)
+            self.assertEqual(
+                [t.kind for t in session.peer_connection.getTransceivers()],
+                ["video"],
+            )
+            await wait_until(lambda: self.video_callback.call_count > 0)
+            await browser.close()
+
+        self.run_with_client(test)
+
+    @patch("commons.webrtc_server.D2_OUI_WEBRTC_ACTIVE_SESSION", "first")
+    def test_first_session_is_active(self):
+        async def test(client):
+            first = await Browser().connect(client)
+            second = await Browser().connect(client)
+            sessions = list(self.server.sessions.values())
+            self.assertEqual(self.server.active_session, sessions[0])
+            await first.close()
+            await wait_until(lambda: len(self.server.sessions) == 1)
+            self.assertEqual(self.server.active_session, sessions[1])
+            await second.close()
+
+        self.run_with_client(test)
+
+    def test_robot_video_encoded_once(self):
+        """Browsers watching the robot camera share one encode."""
+        self.server.camera_stream = CameraStream(
+            source="synthetic", width=160, height=120, fps=15
+        )
+        received = []
+
+        async def watch(client):
+            ws = await client.ws_connect("/webrtc")
+            pc = RTCPeerConnection()
+            pc.addTransceiver("video", direction="recvonly")
+
+            @pc.on("track")
+            def on_track(track):
+                async def receive():
+                    frame = await track.recv()
+                    received.append(frame.width)
+
+                asyncio.ensure_future(receive())
+
+            await pc.setLocalDescription(await pc.createOffer())
+            offer = {"type": "offer", "sdp": pc.localDescription.sdp}
+            await ws.send_str(json.dumps({**offer, "robot_video": True}))
+            answer = json.loads((await ws.receive()).data)
+            await pc.setRemoteDescription(
+                RTCSessionDescription(sdp=answer["sdp"], type="answer")
+            )
+            return ws, pc
+
+        async def test(client):
+            viewers = [await watch(client), await watch(client)]
+            await wait_until(lambda: len(received) == 2)
+            self.assertEqual(received, [160, 160])
+            stats = self.server.camera_stream.get_stats()
+            self.assertEqual(stats["viewers"], 2)
+            for ws, pc in viewers:
+                await ws.close()
+                await pc.close()
+            await wait_until(lambda: self.server.camera_stream.task is None)
+
+        self.run_with_client(test)
+
+    @patch("commons.webrtc_server.D2_OUI_WEBRTC_MAX_SESSIONS", 1)
+    def test_max_sessions(self):
+        """Browsers beyond the limit are sent an error and disconnected."""
+
+        async def test(client):
+            first = await Browser().connect(client)
+            ws = await client.ws_connect("/webrtc")
+            message = json.loads((await ws.receive()).data)
+            self.assertEqual(message["type"], "error")
+            await ws.receive()
+            self.assertTrue(ws.closed)
+            self.assertEqual(self.server.get_stats()["sessions_rejected"], 1)
+            self.assertEqual(len(self.server.sessions), 1)
+            await first.close()
+
+        self.run_with_client(test)
+
+
+class TestRestrictVideoCodec(unittest.TestCase):
+    def test_restricts_video_formats(self):
+        sdp = "\r\n".join(
+            [
+                "v=0",
+                "m=audio 9 UDP/TLS/RTP/SAVPF 111",
+                "a=rtpmap:111 opus/48000/2",
+                "m=video 9 UDP/TLS/RTP/SAVPF 96 97 102 103",
+                "a=rtpmap:96 VP8/90000",
+                "a=rtcp-fb:96 nack",
+                "a=rtpmap:97 rtx/90000",
+                "a=fmtp:97 apt=96",
+                "a=rtpmap:102 H264/90000",
+                "a=fmtp:102 level-asymmetry-allowed=1;packetization-mode=1",
+                "a=rtpmap:103 rtx/90000",
+                "a=fmtp:103 apt=102",
+                "",
+            ]
+        )
+        restricted = restrict_video_codec(sdp, "H264").splitlines()
+        self.assertIn("m=video 9 UDP/TLS/RTP/SAVPF 102 103", restricted)
+        self.assertIn("a=rtpmap:111 opus/48000/2", restricted)
+        self.assertFalse([line for line in restricted if ":96 " in line])
+        self.assertFalse([line for line in restricted if ":97 " in line])
+        # unchanged when the browser doesn't offer the codec
+        self.assertEqual(restrict_video_codec(sdp, "AV1"), sdp)
+
+
 class TestVideoRenderer(unittest.TestCase):
     """Test video renderer functionality."""
 
@@ -147,9 +353,74 @@ class TestVideoRenderer(unittest.TestCase):
         # Should not crash when frame processing fails
         try:
             self.renderer.handle_video_frame(mock_frame)
+            self.renderer.convert_frame(mock_frame, 1)
         except Exception:
             self.fail("handle_video_frame should handle errors gracefully")
 
+    def frame(self, value):
+        return VideoFrame.from_ndarray(
+            np.full((48, 64, 3), value, dtype=np.uint8), format="bgr24"
+        )
+
+    def wait_for_conversions(self):
+        started_at = time.time()
+        while self.renderer.conversions:
+            self.assertLess(time.time() - started_at, 5)
+            time.sleep(0.01)
+
+    def test_only_shown_frames_are_converted(self):
+        """Frames replaced before they're converted never are."""
+        screen = pygame.Surface((1080, 1080))
+        self.renderer.screen = screen
+        for value in (10, 20, 30):
+            self.renderer.handle_video_frame(self.frame(value))
+        # video isn't shown yet
+        self.assertEqual(self.renderer.conversions, 0)
+        self.assertTrue(self.renderer.has_recent_frame())
+
+        self.renderer.render(time.time())
+        self.wait_for_conversions()
+        self.renderer.render(time.time())
+        stats = self.renderer.get_frame_stats()
+        self.assertEqual(stats["frame_count"], 3)
+        self.assertEqual(stats["converted_frame_count"], 1)
+        self.assertEqual(stats["skipped_frame_count"], 2)
+        self.assertEqual(self.renderer.current_frame.get_size(), (1080, 1080))
+        self.assertEqual(screen.get_at((540, 540))[:3], (30, 30, 30))
+
+        # while shown, frames are converted as they arrive
+        self.renderer.handle_video_frame(self.frame(40))
+        self.assertIsNone(self.renderer.pending_frame)
+        self.wait_for_conversions()
+        self.renderer.render(time.time())
+        self.assertEqual(screen.get_at((540, 540))[:3], (40, 40, 40))
+
+    def test_conversions_are_bounded(self):
+        """Busy workers leave only the newest frame waiting."""
+        release = threading.Event()
+
+        def slow_cvtColor(img, code):
+            release.wait(5)
+            return img[:, :, ::-1]
+
+        self.renderer.last_render_time = time.time()
+        with patch("cv2.cvtColor", side_effect=slow_cvtColor):
+            for value in range(10):
+                self.renderer.handle_video_frame(self.frame(value))
+            self.assertEqual(self.renderer.conversions, CONVERT_WORKERS)
+            self.assertEqual(self.renderer.pending_frame.to_ndarray()[0, 0, 0], 9)
+            release.set()
+            self.wait_for_conversions()
+        self.assertEqual(self.renderer.converted_number, CONVERT_WORKERS)
+
+    def test_newest_conversion_wins(self):
+        """A conversion that finishes after a newer frame's is dropped."""
+        self.renderer.convert_frame(self.frame(20), 2)
+        self.renderer.convert_frame(self.frame(10), 1)
+        self.renderer.take_converted_frame()
+        self.assertEqual(self.renderer.current_frame.get_at((0, 0))[:3], (20, 20, 20))
+        self.assertEqual(self.renderer.skipped_frame_count, 1)
+
 
 class TestWebRTCIntegration(unittest.TestCase):
     """Integration tests for WebRTC components."""
@@ -24,6 +24,8 @@ export const WebRTCStream: React.FC<WebRTCStreamProps> = ({ isActive }) => {
     const peerConnectionRef = useRef<RTCPeerConnection | null>(null);
     const websocketRef = useRef<WebSocket | null>(null);
     const localStreamRef = useRef<MediaStream | null>(null);
+    // plays the robot's microphone
+    const remoteAudioRef = useRef<HTMLAudioElement | null>(null);
 
     const webrtcSignalingUrl = `ws://${hubHost}:5201/webrtc`;
 
@@ -51,6 +53,13 @@ export const WebRTCStream: React.FC<WebRTCStreamProps> = ({ isActive }) => {
         // Stop local media tracks
         cleanupMediaTracks();
 
+        // Stop playing the robot's audio
+        if (remoteAudioRef.current) {
+            remoteAudioRef.current.pause();
+            remoteAudioRef.current.srcObject = null;
+            remoteAudioRef.current = null;
+        }
+
         setConnectionState("disconnected");
     }, [cleanupMediaTracks]);
 
@@ -103,6 +112,19 @@ export const WebRTCStream: React.FC<WebRTCStreamProps> = ({ isActive }) => {
             }
         };
 
+        pc.ontrack = (event) => {
+            console.log("WebRTC: Received robot track:", event.track.kind);
+            if (event.track.kind === "audio") {
+                const audio = remoteAudioRef.current ?? new Audio();
+                audio.srcObject =
+                    event.streams[0] ?? new MediaStream([event.track]);
+                audio.play().catch((error) => {
+                    console.error("WebRTC: Error playing robot audio:", error);
+                });
+                remoteAudioRef.current = audio;
+            }
+        };
+
         pc.onicecandidate = (event) => {
             if (event.candidate && websocketRef.current) {
                 websocketRef.current.send(
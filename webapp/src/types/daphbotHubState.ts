@@ -17,16 +17,144 @@ export enum BehaviorMode {
     Manual = "manual",
 }
 
+/**
+ * Primary target published by the daphbot service.  The tracker adds a
+ * persistent track_id, the track's age in seconds and its velocity in
+ * vision pixels per second to the recognized object.
+ */
+export interface IPrimaryTarget extends IRecognizedObject {
+    track_id: number;
+    age: number;
+    velocity: [number, number];
+}
+
+/**
+ * Latency percentiles, in milliseconds, of one stage of a service's
+ * hot path, e.g. daphbot_service's recognition or telepresence audio.
+ */
+export interface ILatencyStats {
+    count: number;
+    p50_ms: number;
+    p95_ms: number;
+    p99_ms: number;
+    max_ms: number;
+}
+
+/**
+ * Metrics periodically published by the daphbot service
+ */
+export interface IDaphbotMetrics {
+    latency: Record<string, ILatencyStats>;
+    recognition_mailbox: { received: number; dropped: number };
+    servo_angles_sent: number;
+    primary_target: { sent: number; suppressed: number };
+    hub_outbox: {
+        depth: number;
+        max_depth: number;
+        messages_sent: number;
+        updates_sent: number;
+        dropped: Record<string, number>;
+    };
+    target_switches: number;
+    behavior_state: string;
+    recording: { sessions: number; segments: number };
+    audio_mixer: IAudioMixerStats;
+}
+
+/**
+ * Counters of a service's audio mixer (one output stream that plays all
+ * of the service's sounds)
+ */
+export interface IAudioMixerStats {
+    sources: number;
+    sources_played: number;
+    callbacks: number;
+    status_errors: number;
+    source_errors: number;
+}
+
+/**
+ * Telepresence audio playback counters.  Buffer sizes are in frames
+ * (samples per channel); empty until the first audio stream starts.
+ */
+export interface ITelepresenceAudioStats {
+    frames_received?: number;
+    frame_errors?: number;
+    max_buffered?: number;
+    buffered?: number;
+    underruns?: number;
+    overruns?: number;
+    overrun_frames?: number;
+    target?: number;
+    fill?: number | null;
+    correction?: number;
+}
+
+/**
+ * Metrics periodically published by the onboard UI service
+ */
+export interface IOnboardUiMetrics {
+    latency: Record<string, ILatencyStats>;
+    audio_mixer: IAudioMixerStats;
+    telepresence_audio: ITelepresenceAudioStats;
+    /** robot microphone sent to the browser; null when not sending */
+    microphone: {
+        packets_sent: number;
+        skipped_frames: number;
+        status_errors: number;
+        overruns: number;
+    } | null;
+    webrtc: {
+        /** browsers connected to the onboard_ui signaling server */
+        sessions: number;
+        /** session shown on the display and heard on the speaker */
+        active_session: number | null;
+        sessions_started: number;
+        /** connections refused by D2_OUI_WEBRTC_MAX_SESSIONS */
+        sessions_rejected: number;
+    };
+    /** robot camera video, encoded once for every browser watching */
+    camera: {
+        viewers: number;
+        frames_encoded: number;
+        bytes_encoded: number;
+        keyframes: number;
+        source_errors: number;
+        /** by viewers that fell behind or were waiting for a keyframe */
+        skipped_packets: number;
+    };
+}
+
+/**
+ * Video recording session published by the daphbot service.  Times are
+ * seconds since the epoch; ended_at is null while the session is open.
+ */
+export interface IRecordingSession {
+    started_at: number;
+    ended_at: number | null;
+    classes: string[];
+    segments: number;
+}
+
 /**
  * Extended hub state interface for daphbot-due.
  * Adds daphbot-specific fields to the base IHubState.
  */
 export interface IDaphbotHubState extends IHubState {
     /** Current primary target being tracked (provided by daphbot service) */
-    primary_target?: IRecognizedObject | null;
+    primary_target?: IPrimaryTarget | null;
 
     /** Current behavior mode (published by daphbot webapp, consumed by daphbot service) */
     daphbot_mode: BehaviorMode;
+
+    /** Hot path latency and counters (provided by daphbot service) */
+    daphbot_metrics?: IDaphbotMetrics;
+
+    /** Audio latency and counters (provided by onboard ui service) */
+    onboard_ui_metrics?: IOnboardUiMetrics;
+
+    /** Current or last video recording session (provided by daphbot service) */
+    recording_session?: IRecordingSession;
 }
 
 /**